@@ -1,49 +1,328 @@
-import operator
+import os
 import pickle
 import time
-from functools import reduce
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
-from django.db.models import Count
+import django
+from django.db import connections, transaction
+from django.db.models import Count, Sum, Min
 
-from .config import RESULTS_RUN_TIMES_DIR, RESULTS_DIAGNOSIS_PROBABILITIES_DIR
-from .models import System, Observation, Diagnosis, UncertainObservation, IO
-from .utils import mean, num_to_booleans
+from .config import RESULTS_RUN_TIMES_DIR, RESULTS_DIAGNOSIS_PROBABILITIES_DIR, SHARED_UNCERTAIN_SEARCH, \
+    DIAGNOSIS_ENGINE, PARSING_WORKERS, DIAGNOSIS_WORKERS, PARALLEL_DIAGNOSIS_MIN_GATES, SINGLE_GATE_FAULTY_PROB, \
+    SAMPLES_PER_OBSERVATION, MAX_FAULTY_COMPONENTS
+from .consts import BFS_ENGINE
+from .engines import uncertain_engines
+from .engines.best_first import find_top_diagnoses
+from .engines.sampling import estimate_diagnoses_probs as estimate_observations_diagnoses_probs
+from .models import System, Observation, Diagnosis, DiagnosisProgress, UncertainObservation, Gate
+from .profiling import profiled
+from .tracing import tracer
+from .utils import mean
 
 
+@profiled
 def parse_system(filepath):
     System.parse(filepath)
 
 
+@profiled
 def parse_observations(filepath):
     Observation.parse(filepath)
 
 
-def find_diagnosis():
+@profiled
+def parse_files(systems_filepaths=(), observations_filepaths=(), workers=PARSING_WORKERS):
+    """ Parses many .sys and .obs files, reading each file in a separate process of a pool.
+    The processes only read the files into plain data, and all the DB inserts are done by this process,
+    first of all the systems and then of all the observations (which refer to the systems).
+
+    Args:
+        systems_filepaths: .sys files paths
+        observations_filepaths: .obs files paths
+        workers: amount of processes that read the files (None for the amount of CPUs)
+    """
+    # the workers set up django to be able to use the models (when the processes are spawned rather than forked)
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+        # all the files are submitted at once, so the observations are read while the systems are inserted
+        parsed_systems = executor.map(System.read_file, systems_filepaths)
+        parsed_observations = executor.map(Observation.read_file, observations_filepaths)
+        for parsed_system in parsed_systems:
+            System.create_parsed(*parsed_system)
+        for parsed_file_observations in parsed_observations:
+            Observation.create_parsed(parsed_file_observations)
+
+
+@profiled
+def find_diagnosis(engine=DIAGNOSIS_ENGINE, workers=DIAGNOSIS_WORKERS, top_n=None, resume=False):
     """ Looks for diagnoses of all the uncertain observations of all the systems and saves them in the DB.
     Meanwhile, calculates the run time of the algorithm on each observation and stores the results in files.
+    The progress is saved per observation (see DiagnosisProgress), so an interrupted run can be resumed.
+
+    Args:
+        engine: name of the diagnosis engine to search with (BFS_ENGINE or one of engines.engines)
+        workers: amount of processes that diagnose the observations in parallel (1 to diagnose in this process).
+                 Either way, all the results are saved by this process, in the same order.
+                 (The systems with fewer than PARALLEL_DIAGNOSIS_MIN_GATES gates are always diagnosed in this process.)
+        top_n: if provided, the uncertain observations of each system are diagnosed level by level
+               (see UncertainObservation.flip_masks_levels), until the rest of them can not change
+               the n most probable diagnoses of the system
+        resume: whether to diagnose only the observations that were not completed by the previous runs
+                (an interrupted run, or observations that were added since), after deleting their partial diagnoses.
+                Otherwise, all the previous diagnoses and run times of the systems are deleted first.
+                (A top_n run that stops early leaves its observations incomplete, so a later run with resume
+                diagnoses them again from scratch.)
+    """
+    systems = System.objects.annotate(size=Count('gates')).order_by('size')
+
+    def diagnose_level_in_process(observations, flip_masks):
+        for obs in observations:
+            uncertain_diagnoses, run_times = diagnose_observation(
+                obs, [UncertainObservation.of(obs, flip_mask) for flip_mask in flip_masks], engine
+            )
+            yield obs, diagnoses_pks(uncertain_diagnoses), run_times
+
+    if workers == 1 or not systems.filter(size__gte=PARALLEL_DIAGNOSIS_MIN_GATES).exists():
+        save_diagnoses_results(
+            (system, diagnose_system(system, pending_observations(system, resume), diagnose_level_in_process, top_n))
+            for system in systems
+        )
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_diagnosis_worker) as executor:
+        def diagnose_level_in_pool(observations, flip_masks):
+            # all the observations are submitted at once, and their results are saved as soon as they are ready
+            futures = [
+                (obs, executor.submit(diagnose_observation_by_pk, obs.pk, flip_masks, engine)) for obs in observations
+            ]
+            return ((obs, *observation_results(obs, *future.result())) for obs, future in futures)
+
+        systems_results = (
+            (system, diagnose_system(
+                system, pending_observations(system, resume),
+                diagnose_level_in_pool if system.size >= PARALLEL_DIAGNOSIS_MIN_GATES else diagnose_level_in_process,
+                top_n
+            ))
+            for system in systems
+        )
+        if top_n is None:
+            # the observations of all the systems are submitted at once
+            systems_results = list(systems_results)
+        save_diagnoses_results(systems_results)
+
+
+def pending_observations(system: System, resume=False) -> list[Observation]:
+    """ Returns the observations of the system to diagnose, and deletes the diagnoses that they will replace:
+    the partial diagnoses and the run times of the observations that were not completed (when resuming),
+    or all the diagnoses, progress and run times of the system (otherwise).
+    """
+    if resume:
+        Diagnosis.objects.filter(observation__system=system, observation__diagnosis_progress__isnull=True).delete()
+    else:
+        Diagnosis.objects.filter(observation__system=system).delete()
+        DiagnosisProgress.objects.filter(observation__system=system).delete()
+        open(f'{RESULTS_RUN_TIMES_DIR}/{system.name}.txt', 'w').close()
+    observations = list(system_observations(system).filter(diagnosis_progress__isnull=True))
+    if resume:
+        # the run times of the former searches of the observations that are diagnosed again
+        remove_run_times(system, {obs.pk for obs in observations})
+    return observations
+
+
+def diagnose_system(system: System, observations: list[Observation], diagnose_level, top_n=None):
+    """ Diagnoses the uncertain observations of the given observations of the system.
+
+    Args:
+        diagnose_level: function of (observations, flip masks) that returns (observation, *results of
+                        diagnose_observation, with the diagnoses as gate pks, see diagnoses_pks) for each of the
+                        observations, with the uncertain observations of the flip masks
+                        (without top_n, it is called right away)
+        top_n: if provided, the uncertain observations are diagnosed level by level (by descending probability),
+               and the search stops when the rest of them can not change the n most probable diagnoses
+
+    Returns:
+        Iterator. (observation, *results of diagnose_observation, whether the observation is completed)
+        for the observations of the system
+    """
+    if top_n is None:
+        return (
+            (obs, uncertain_diagnoses, run_times, True)
+            for obs, uncertain_diagnoses, run_times in diagnose_level(observations, system_flip_masks(system))
+        )
+    return diagnose_system_levels(system, observations, diagnose_level, top_n)
+
+
+def diagnose_system_levels(system: System, observations: list[Observation], diagnose_level, top_n):
+    """ The same as diagnose_system with top_n, where the observations are completed only after the last level:
+    after an early stop their uncertain observations are not all diagnosed, so a run with resume diagnoses them again
+    """
+    outputs_num = len(system.compiled.output_names)
+    levels = UncertainObservation.flip_masks_levels(outputs_num)
+    for level_i, (_, level_flip_masks) in enumerate(levels if observations else []):
+        for obs, uncertain_diagnoses, run_times in diagnose_level(observations, list(level_flip_masks)):
+            yield obs, uncertain_diagnoses, run_times, False
+        # a diagnosis has at least one gate, so it can gain at most SINGLE_GATE_FAULTY_PROB of the probability of
+        # each of the uncertain observations that are not diagnosed yet
+        unexplored_obs_mass = UncertainObservation.levels_mass(levels[level_i + 1:], outputs_num)
+        unexplored_mass = len(observations) * SINGLE_GATE_FAULTY_PROB * unexplored_obs_mass
+        if top_diagnoses_settled(system.name, top_n, unexplored_mass):
+            print(f'{system.name}: the top {top_n} diagnoses are settled after {level_i + 1} levels')
+            return
+
+    for obs in observations:
+        yield obs, {}, [], True
+
+
+def system_observations(system: System):
+    """ Returns the observations of the system with their system and IOs, so diagnosing them makes no more queries
+    per observation
+    """
+    return Observation.objects.filter(system=system).select_related('system').prefetch_related('inputs', 'outputs')
+
+
+def system_flip_masks(system: System) -> list[int]:
+    """ Returns the flip masks of the uncertain observations of every observation of the system
+    (in the order of create_uncertain_observations)
+    """
+    return [
+        flip_mask
+        for _, flip_masks in UncertainObservation.flip_masks_levels(outputs_num=len(system.compiled.output_names))
+        for flip_mask in flip_masks
+    ]
+
+
+def top_diagnoses_settled(system_name, n, unexplored_mass) -> bool:
+    """ Checks whether the n most probable diagnoses of the system (found so far) can not change,
+    when any diagnosis can still gain at most the given probability.
+    """
+    probs = list(diagnoses_probs(system_name, n + 1).values())
+    if len(probs) < n:
+        # a diagnosis that is not found yet may still be in the top n
+        return unexplored_mass == 0
+    next_prob = probs[n] if len(probs) > n else 0
+    return probs[n - 1] >= next_prob + unexplored_mass
+
+
+def diagnose_observation(obs: Observation, uncertain_observations: list[UncertainObservation], engine):
+    """ Looks for the diagnoses of all the uncertain observations of the observation.
+
+    Returns:
+        (dict[UncertainObservation: tuple[list[Gate]]], list[tuple[str, float]]).
+        Tuple of (the diagnoses of each uncertain observation, (observation name, run time) of every search)
+    """
+    if SHARED_UNCERTAIN_SEARCH and engine == BFS_ENGINE:
+        # a single search for all the uncertain observations
+        start = time.time()
+        uncertain_diagnoses = obs.find_uncertain_diagnoses(uncertain_observations)
+        end = time.time()
+        return uncertain_diagnoses, [(obs.obs_name, end - start)]
+    if SHARED_UNCERTAIN_SEARCH and engine in uncertain_engines:
+        start = time.time()
+        outputs_diagnoses = uncertain_engines[engine](
+            obs, [uncertain_obs.output_vector for uncertain_obs in uncertain_observations], MAX_FAULTY_COMPONENTS
+        )
+        uncertain_diagnoses = obs.gates_of_many({
+            uncertain_obs: outputs_diagnoses[uncertain_obs.output_vector] for uncertain_obs in uncertain_observations
+        })
+        end = time.time()
+        return uncertain_diagnoses, [(obs.obs_name, end - start)]
+
+    uncertain_diagnoses, run_times = {}, []
+    for uncertain_obs in uncertain_observations:
+        start = time.time()
+        uncertain_diagnoses[uncertain_obs] = uncertain_obs.diagnose(engine)
+        end = time.time()
+        run_times.append((uncertain_obs.obs_name, end - start))
+    return uncertain_diagnoses, run_times
+
+
+def init_diagnosis_worker():
+    """ Prepares a process of the pool to diagnose observations """
+    # set up django to be able to use the models (when the processes are spawned rather than forked),
+    # and drop the DB connections that a forked process inherits, so it opens its own ones
+    django.setup()
+    connections.close_all()
+
+
+def diagnose_observation_by_pk(obs_pk, flip_masks: list[int], engine):
+    """ The same as diagnose_observation, for a worker process that gets the observation by its pk
+    and the uncertain observations by their flip masks (see UncertainObservation).
+
+    Returns:
+        (dict[int: list[list[int]]], list[tuple[str, float]]). The same as diagnose_observation, where the diagnoses
+        are keyed by the flip masks of the uncertain observations, and are lists of gate pks (see diagnoses_pks)
+    """
+    obs = Observation.objects.select_related('system').get(pk=obs_pk)
+    uncertain_observations = [UncertainObservation.of(obs, flip_mask) for flip_mask in flip_masks]
+    uncertain_diagnoses, run_times = diagnose_observation(obs, uncertain_observations, engine)
+    return {
+        uncertain_obs.flip_mask: diagnoses for uncertain_obs, diagnoses in diagnoses_pks(uncertain_diagnoses).items()
+    }, run_times
+
+
+def observation_results(obs: Observation, masks_diagnoses: dict[int: list[list[int]]], run_times):
+    """ Converts the results of diagnose_observation_by_pk to results keyed by the uncertain observations """
+    return {
+        UncertainObservation.of(obs, flip_mask): diagnoses for flip_mask, diagnoses in masks_diagnoses.items()
+    }, run_times
+
+
+def diagnoses_pks(uncertain_diagnoses: dict) -> dict:
+    """ Converts the diagnoses (each as a list of Gates) to lists of gate pks, which is all that saving them needs
+    (see Diagnosis.save_uncertain_diagnoses_pks), so the results of the workers are pickled without the Gates
+
+    Args:
+        uncertain_diagnoses: dict[Any: tuple[list[Gate]]]. Diagnoses by any keys
+
+    Returns:
+        dict[Any: list[list[int]]]. The diagnoses by the same keys
+    """
+    return {
+        key: [[gate.pk for gate in diagnosis] for diagnosis in diagnoses]
+        for key, diagnoses in uncertain_diagnoses.items()
+    }
+
+
+def save_diagnoses_results(systems_results):
+    """ Saves the diagnoses of the observations of the systems in the DB, and stores the run times
+    and the diagnoses probabilities of every system in files.
+
+    Args:
+        systems_results: (System, results of diagnose_system) per system, with the systems ordered by their size
     """
     system_obs_run_times = {}
-    for system in System.objects.annotate(size=Count('gates')).order_by('size'):
+    for system, observations_results in systems_results:
         print(f'Start running on system {system.name}')
 
-        # find diagnoses from all uncertain observations of the system
-        obs_run_times = []
-        for obs in Observation.objects.filter(system=system):
-            for uncertain_obs in create_uncertain_observations(observation=obs):
-                start = time.time()
-                diagnoses = uncertain_obs.find_diagnoses()
-                end = time.time()
-                run_time = end - start
-                obs_run_times.append(run_time)
-                # save each observation BFS run time in file
-                with open(f'{RESULTS_RUN_TIMES_DIR}/{system.name}.txt', 'a') as txt:
-                    txt.write(f'{run_time}\n')
-                print(f'system {system.name}, observation {uncertain_obs.obs_name}, run time: {run_time}')
-                # save all the diagnoses gotten form BFS on observation to DB
-                Diagnosis.save_diagnoses(uncertain_observation=uncertain_obs, diagnoses=diagnoses)
-
-        save_txt_results(system.name)
+        obs_run_time = defaultdict(float)  # key: observation pk, value: the run time of its searches so far
+        for obs, uncertain_diagnoses, run_times, completed in observations_results:
+            obs_run_time[obs.pk] += sum(run_time for _, run_time in run_times)
+            # the run times are saved before the progress, so the run times of an observation that was not completed
+            # are removed when resuming (see pending_observations)
+            for search_name, run_time in run_times:
+                save_run_time(system, obs, search_name, run_time)
+            # save all the diagnoses gotten from the uncertain observations to DB at once,
+            # with the progress of the observation
+            save_start = time.perf_counter()
+            with transaction.atomic():
+                Diagnosis.save_uncertain_diagnoses_pks(uncertain_diagnoses)
+                if completed:
+                    DiagnosisProgress.objects.create(observation=obs, run_time=obs_run_time[obs.pk])
+            if tracer.enabled:
+                tracer.emit('save', system=system.name, uncertain_observations=len(uncertain_diagnoses),
+                            diagnoses=sum(map(len, uncertain_diagnoses.values())),
+                            persistence_seconds=time.perf_counter() - save_start)
 
+        if obs_run_time:
+            save_txt_results(system.name)
+        else:
+            print(f'{system.name}: no observations to diagnose')
+
+        # the run times of the system so far (including those of the previous runs, when resuming),
+        # so the systems that were completed by the previous runs are kept in the pickle
+        obs_run_times = read_run_times(system)
+        if not obs_run_times:
+            continue
         system_size = len(system.gates.all())
         if system_size not in system_obs_run_times:
             system_obs_run_times[system_size] = []
@@ -61,6 +340,54 @@ def find_diagnosis():
         )
 
 
+def save_run_time(system: System, obs: Observation, search_name, run_time):
+    """ Saves the run time of a diagnosis search on an observation in the system run times file,
+    as a line of the observation pk and the run time
+
+    Args:
+        search_name: name of the searched observation (the observation, or one of its uncertain observations)
+    """
+    with open(f'{RESULTS_RUN_TIMES_DIR}/{system.name}.txt', 'a') as txt:
+        txt.write(f'{obs.pk} {run_time}\n')
+    print(f'system {system.name}, observation {search_name}, run time: {run_time}')
+    tracer.emit('search', system=system.name, observation=search_name, seconds=run_time)
+    return run_time
+
+
+def read_run_times(system: System) -> list[float]:
+    """ Returns the run times in the system run times file (see save_run_time), if it exists """
+    return [run_time for _, run_time in read_observations_run_times(system)]
+
+
+def read_observations_run_times(system: System) -> list[tuple[int, float]]:
+    """ Returns (observation pk, run time) per line of the system run times file (see save_run_time), if it exists.
+    The lines of the files of older versions have only the run time, and their observation pk is None.
+    """
+    if not os.path.isfile(f'{RESULTS_RUN_TIMES_DIR}/{system.name}.txt'):
+        return []
+    observations_run_times = []
+    with open(f'{RESULTS_RUN_TIMES_DIR}/{system.name}.txt') as txt:
+        for line in txt:
+            if line.strip():
+                *obs_pk, run_time = line.split()
+                observations_run_times.append((int(obs_pk[0]) if obs_pk else None, float(run_time)))
+    return observations_run_times
+
+
+def remove_run_times(system: System, observations_pks: set[int]):
+    """ Rewrites the system run times file (see save_run_time) without the run times of the given observations """
+    observations_run_times = read_observations_run_times(system)
+    if not any(obs_pk in observations_pks for obs_pk, _ in observations_run_times):
+        return
+    with open(f'{RESULTS_RUN_TIMES_DIR}/{system.name}.txt', 'w') as txt:
+        for obs_pk, run_time in observations_run_times:
+            if obs_pk is None:
+                txt.write(f'{run_time}\n')
+            elif obs_pk not in observations_pks:
+                txt.write(f'{obs_pk} {run_time}\n')
+
+
+@profiled
 def top_diagnoses(system_name, n=None) -> list[tuple[list[str], float]]:
     """ Returns the n most probable diagnoses of the given system where each diagnosis represented as a list of gates.
     If no n provided, returns all the diagnoses in descending probability order.
@@ -70,50 +397,115 @@ def top_diagnoses(system_name, n=None) -> list[tuple[list[str], float]]:
                     (['gate14', 'gate21'], 0.127),
                     (['gate11', 'gate17', 'gate21'], 0.0008)]
     """
-    all_system_diagnoses = Diagnosis.objects.filter(uncertain_observation__system__name=system_name)
-    n = all_system_diagnoses.count() if n is None else n
+    system_diagnoses_prob = diagnoses_probs(system_name, n)
+    gates = Gate.objects.in_bulk({
+        gate_pk for gates_key in system_diagnoses_prob for gate_pk in Diagnosis.gates_pks_of(gates_key)
+    })
+    return [
+        ([gates[gate_pk].name for gate_pk in Diagnosis.gates_pks_of(gates_key)], p)
+        for gates_key, p in system_diagnoses_prob.items()
+    ]
 
-    system_diagnoses_prob = diagnoses_probs(system_name)
 
-    return list(map(
-        lambda diag_prob: (diag_prob[0].invalid_gates_names(), diag_prob[1]),
-        sorted(system_diagnoses_prob.items(), key=operator.itemgetter(1), reverse=True)[:n]
-    ))
+@profiled
+def search_top_diagnoses(system_name, n) -> list[tuple[list[str], float]]:
+    """ Returns the n most probable diagnoses of the given system, as top_diagnoses does, without diagnosing
+    the uncertain observations in advance (and without any DB writes): a best-first search explores the
+    (uncertain observation, candidate) pairs in descending probability, only until the n best are settled
+    (see engines/best_first.py).
+    """
+    system = System.objects.get(name=system_name)
+    circuit = system.compiled
+    outputs_num = len(circuit.output_names)
+    flips_priors = {
+        flips_num: UncertainObservation.prior(flips_num, outputs_num)
+        for flips_num, _ in UncertainObservation.flip_masks_levels(outputs_num)
+    }
+    top = find_top_diagnoses(list(system_observations(system)), flips_priors, n)
+    gates = Gate.objects.in_bulk(circuit.gate_keys)
+    return [
+        ([gates[gate_pk].name for gate_pk in sorted(circuit.gate_keys[gate_i] for gate_i in diagnosis)], p)
+        for diagnosis, p in top
+    ]
 
 
-def create_uncertain_observations(observation: Observation):
-    obs_outputs = observation.outputs.order_by('name')
-    output_combinations_num = 2 ** len(obs_outputs)
-    for combination_i in range(output_combinations_num):
-        bool_values = num_to_booleans(num=combination_i, length=len(obs_outputs))
-        # create new uncertain observation object
-        uncertain_obs = UncertainObservation.objects.create(
-            system=observation.system,
-            obs_name=UncertainObservation.uncertain_obs_name(observation.obs_name)
-        )
-        uncertain_obs.inputs.add(*observation.inputs.all())
-        uncertain_obs.outputs.add(*[
-            IO.objects.create(name=io.name, value=new_value)
-            for (io, new_value) in zip(obs_outputs, bool_values)
-        ])
-        yield uncertain_obs
-
-
-def diagnoses_probs(system_name) -> dict[Diagnosis: float]:
-    """ Find all similar diagnoses in the same system and calculate the total probability of each """
-    system_diagnoses_prob = {}  # key: Diagnosis, value: probability
-    for diagnosis in Diagnosis.objects.filter(uncertain_observation__system__name=system_name):
-        if diagnosis in list(system_diagnoses_prob.keys()):
-            continue
-        similar_diagnosis_probs = map(lambda d: d.p, diagnosis.all_similar_diagnoses())
-        total_diagnosis_prob = reduce(lambda p1, p2: p1 + p2, similar_diagnosis_probs)
-        system_diagnoses_prob[diagnosis] = total_diagnosis_prob
-    return system_diagnoses_prob
+def create_uncertain_observations(observation: Observation) -> list[UncertainObservation]:
+    """ Creates the uncertain observations of the observation that pass the cutoffs (see MAX_FLIPPED_OUTPUTS and
+    MIN_UNCERTAIN_OBS_PROB in config.py), in descending probability order.
+    The uncertain observations are not saved in the DB (only their diagnoses are, see Diagnosis.flip_mask).
+    """
+    return [UncertainObservation.of(observation, flip_mask) for flip_mask in system_flip_masks(observation.system)]
+
+
+@profiled
+def diagnoses_probs(system_name, n=None) -> dict[str: float]:
+    """ Groups the similar diagnoses in the same system (by their gates key) and sums the probability of each group,
+    in a single query. Returns the n most probable groups (or all of them if no n provided),
+    in descending probability order (ties are ordered by their first diagnosis).
+
+    Returns:
+        dict[str: float]. key: the gates key of the diagnoses (see Diagnosis.gates_key_of), value: total probability
+    """
+    system_diagnoses_prob = Diagnosis.objects.filter(observation__system__name=system_name) \
+        .values('gates_key') \
+        .annotate(total_p=Sum('probability'), first_pk=Min('pk')) \
+        .order_by('-total_p', 'first_pk')
+    if n is not None:
+        system_diagnoses_prob = system_diagnoses_prob[:n]
+    return {row['gates_key']: row['total_p'] for row in system_diagnoses_prob}
+
+
+@profiled
+def estimate_diagnoses_probs(system_name, n=None, samples=SAMPLES_PER_OBSERVATION, time_budget=None,
+                             engine=DIAGNOSIS_ENGINE, seed=None) -> dict:
+    """ Approximates diagnoses_probs for systems with too many outputs to enumerate their uncertain observations:
+    samples the flip masks of the uncertain observations of each observation by their prior (see engines/sampling.py),
+    diagnoses each distinct sampled uncertain observation once, and nothing is saved in the DB.
+
+    Args:
+        n: amount of the most probable diagnoses to return (None for all the sampled ones)
+        samples: maximal amount of samples per observation
+        time_budget: maximal amount of seconds to sample (None for no limit)
+        engine: name of the diagnosis engine to diagnose the sampled uncertain observations with
+        seed: seed of the random samples (None for a random seed)
+
+    Returns:
+        dict[str: ProbabilityEstimate]. key: the gates key of the diagnoses (see Diagnosis.gates_key_of),
+        value: (estimated probability, confidence interval low, high), in descending probability order
+    """
+    system = System.objects.get(name=system_name)
+    circuit = system.compiled
+    outputs_num = len(circuit.output_names)
+    flips_nums = {flips_num for flips_num, _ in UncertainObservation.flip_masks_levels(outputs_num)}
+
+    def diagnose(obs, flip_masks, predictions):
+        uncertain_observations = [UncertainObservation.of(obs, flip_mask) for flip_mask in flip_masks]
+        if SHARED_UNCERTAIN_SEARCH and engine == BFS_ENGINE:
+            # the candidates that the former rounds of the observation predicted are not predicted again
+            uncertain_diagnoses = obs.find_uncertain_diagnoses(uncertain_observations, predictions)
+        else:
+            uncertain_diagnoses, _ = diagnose_observation(obs, uncertain_observations, engine)
+        return {
+            uncertain_obs.flip_mask: [circuit.gate_indices(diagnosis_gates) for diagnosis_gates in diagnoses]
+            for uncertain_obs, diagnoses in uncertain_diagnoses.items()
+        }
+
+    estimates = estimate_observations_diagnoses_probs(
+        list(system_observations(system)), flips_nums, diagnose,
+        samples=samples, time_budget=time_budget, seed=seed
+    )
+    ranked = sorted(estimates.items(), key=lambda diagnosis_estimate: diagnosis_estimate[1].p, reverse=True)[:n]
+    gates = Gate.objects.in_bulk(circuit.gate_keys)
+    return {
+        Diagnosis.gates_key_of(gates[circuit.gate_keys[gate_i]] for gate_i in diagnosis): estimate
+        for diagnosis, estimate in ranked
+    }
 
 
+@profiled
 def save_txt_results(system_name):
     """ Saves the diagnoses of the system in descending probability order in a file """
     diagnoses_prob: list[tuple[list[str], float]] = top_diagnoses(system_name)
-    with open(f'{RESULTS_DIAGNOSIS_PROBABILITIES_DIR}/{system_name}_1.0.txt', 'a') as txt:
+    with open(f'{RESULTS_DIAGNOSIS_PROBABILITIES_DIR}/{system_name}_1.0.txt', 'w') as txt:
         for diagnosis, p in diagnoses_prob:
             txt.write(f'{diagnosis}: p = {p}\n')
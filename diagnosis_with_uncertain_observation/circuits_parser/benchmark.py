@@ -0,0 +1,200 @@
+""" Reproducible benchmarks of the pipeline over the systems of circuits_examples.
+
+Every system is benchmarked on the same fixed observations (the first ones in its .obs file), with untimed warm-up
+runs and repeated timed runs of: parsing its files, simulating candidates, diagnosing single observations (with all
+of their uncertain observations) and top_diagnoses. The report is a JSON file that can be compared with a baseline.
+
+Nothing is left in the DB: the benchmarks of each system run in a transaction that is rolled back
+(and the system rows that already exist are deleted inside it, so every run starts from the same state).
+
+Usage (in django DB shell):
+    from circuits_parser.benchmark import run_benchmarks, compare_reports
+    run_benchmarks(report_filepath='baseline.json')
+    ...  # change the code or the config
+    run_benchmarks(report_filepath='report.json')
+    compare_reports('baseline.json', 'report.json')
+"""
+import glob
+import json
+import os
+import platform
+import statistics
+import time
+
+import django
+from django.db import transaction
+
+from .api import diagnose_observation, create_uncertain_observations, top_diagnoses
+from .config import DATA_SYSTEMS_DIR, DATA_OBSERVATIONS_DIR, SIMULATION_MODE, DIAGNOSIS_ENGINE, \
+    SHARED_UNCERTAIN_SEARCH, BENCHMARK_SYSTEMS, BENCHMARK_OBSERVATIONS_NUM, BENCHMARK_WARMUP_RUNS, BENCHMARK_RUNS, \
+    BENCHMARK_TOP_N, BENCHMARK_REGRESSION_TOLERANCE, RESULTS_BENCHMARKS_DIR
+from .consts import SYS_FILE_EXTENSION, OBS_FILE_EXTENSION
+from .models import System, Observation, Diagnosis
+from .simulation import CompiledCircuit
+from .utils import percentile
+
+BENCHMARK_STAGES = ('parse', 'simulate', 'diagnose', 'top_diagnoses')
+
+
+def run_benchmarks(systems=BENCHMARK_SYSTEMS, observations_num=BENCHMARK_OBSERVATIONS_NUM,
+                   warmup_runs=BENCHMARK_WARMUP_RUNS, runs=BENCHMARK_RUNS, report_filepath=None) -> dict:
+    """ Benchmarks every stage of the pipeline on each of the systems, and saves the report in a JSON file.
+
+    Args:
+        systems: names of the systems (with .sys and .obs files in DATA_SYSTEMS_DIR and DATA_OBSERVATIONS_DIR)
+        observations_num: amount of the observations of each system to simulate and to diagnose
+        warmup_runs: amount of untimed runs of each benchmark
+        runs: amount of timed runs of each benchmark
+        report_filepath: path of the JSON report (by default, a new file in RESULTS_BENCHMARKS_DIR)
+
+    Returns:
+        dict. The report: the configuration of the benchmarks, and for each system and stage the run times
+        (median and p95, in seconds) and the throughput (candidates per second, for the stages that simulate)
+    """
+    report = {
+        'config': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'simulation_mode': SIMULATION_MODE,
+            'diagnosis_engine': DIAGNOSIS_ENGINE,
+            'shared_uncertain_search': SHARED_UNCERTAIN_SEARCH,
+            'observations_num': observations_num,
+            'warmup_runs': warmup_runs,
+            'runs': runs,
+        },
+        'benchmarks': {},
+    }
+    for system_name in systems:
+        print(f'Benchmarking system {system_name}')
+        report['benchmarks'][system_name] = benchmark_system(system_name, observations_num, warmup_runs, runs)
+
+    if report_filepath is None:
+        os.makedirs(RESULTS_BENCHMARKS_DIR, exist_ok=True)
+        report_filepath = f'{RESULTS_BENCHMARKS_DIR}/{time.strftime("%Y%m%d-%H%M%S")}.json'
+    with open(report_filepath, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'The report is saved in {report_filepath}')
+    return report
+
+
+def benchmark_system(system_name, observations_num, warmup_runs, runs) -> dict:
+    """ Runs the benchmarks of all the stages on the system, in a transaction that is rolled back """
+    sys_filepath = f'{DATA_SYSTEMS_DIR}/{system_name}.{SYS_FILE_EXTENSION}'
+    obs_filepaths = glob.glob(f'{DATA_OBSERVATIONS_DIR}/{system_name}_*.{OBS_FILE_EXTENSION}')
+
+    def parse_files():
+        System.parse(sys_filepath)
+        for obs_filepath in obs_filepaths:
+            Observation.parse(obs_filepath)
+
+    def parse():
+        with transaction.atomic():
+            parse_files()
+            transaction.set_rollback(True)
+
+    results = {}
+    with transaction.atomic():
+        System.objects.filter(name=system_name).delete()
+        results['parse'] = measure(parse, warmup_runs, runs)
+
+        parse_files()  # once more, for the rest of the benchmarks
+        system = System.objects.get(name=system_name)
+        observations_pks = list(
+            Observation.objects.filter(system=system).order_by('pk').values_list('pk', flat=True)[:observations_num]
+        )
+        circuit = system.compiled
+
+        def fixed_observations():
+            # the observations are fetched on every run, so nothing that they cache is shared between the runs
+            circuit.prediction_memo.cache_clear()
+            return list(Observation.objects.filter(pk__in=observations_pks).select_related('system').order_by('pk'))
+
+        def simulate():
+            # the healthy circuit and every single faulty gate
+            fault_sets = [frozenset()] + [frozenset([gate_i]) for gate_i in range(circuit.gates_num)]
+            for obs in fixed_observations():
+                obs.predict_fault_sets(fault_sets)
+            return len(observations_pks) * len(fault_sets)
+
+        def diagnose():
+            for obs in fixed_observations():
+                diagnose_observation(obs, create_uncertain_observations(obs), DIAGNOSIS_ENGINE)
+            memo_info = circuit.prediction_memo.cache_info()
+            return memo_info.hits + memo_info.misses
+
+        results['simulate'] = measure(simulate, warmup_runs, runs)
+        results['diagnose'] = measure(diagnose, warmup_runs, runs)
+
+        for obs in fixed_observations():
+            Diagnosis.save_uncertain_diagnoses(
+                diagnose_observation(obs, create_uncertain_observations(obs), DIAGNOSIS_ENGINE)[0]
+            )
+        results['top_diagnoses'] = measure(lambda: top_diagnoses(system_name, BENCHMARK_TOP_N), warmup_runs, runs)
+        transaction.set_rollback(True)
+
+    # the pk of the rolled back system may be reused by another system
+    CompiledCircuit.forget(system)
+    return results
+
+
+def measure(run, warmup_runs, runs) -> dict:
+    """ Times the runs of the function, after the warm-up runs.
+
+    Args:
+        run: function without arguments, that may return the amount of candidates it simulated
+
+    Returns:
+        dict. The median and the p95 of the run times, and the throughput in candidates per second
+        (None if the function does not count its candidates)
+    """
+    for _ in range(warmup_runs):
+        run()
+
+    run_times, candidates_nums = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        candidates_nums.append(run())
+        run_times.append(time.perf_counter() - start)
+
+    candidates_per_second = None
+    if all(isinstance(candidates_num, int) for candidates_num in candidates_nums):
+        candidates_per_second = sum(candidates_nums) / sum(run_times)
+    return {
+        'runs': runs,
+        'median': statistics.median(run_times),
+        'p95': percentile(run_times, 95),
+        'candidates_per_second': candidates_per_second,
+    }
+
+
+def compare_reports(baseline_filepath, report_filepath, tolerance=BENCHMARK_REGRESSION_TOLERANCE) -> list:
+    """ Compares the medians of the benchmarks of a report with those of a baseline report,
+    and prints the ratio of each benchmark that is in both of them.
+
+    Args:
+        tolerance: the relative slowdown of a median that is considered a regression (e.g. 0.1 for 10%)
+
+    Returns:
+        list[tuple[str, str, float, float]]. (system name, stage, baseline median, median) of every regression
+    """
+    with open(baseline_filepath) as f:
+        baseline = json.load(f)
+    with open(report_filepath) as f:
+        report = json.load(f)
+    if baseline['config'] != report['config']:
+        print(f'Note: the configurations differ: {baseline["config"]} -> {report["config"]}')
+
+    regressions = []
+    for system_name, stages in report['benchmarks'].items():
+        baseline_stages = baseline['benchmarks'].get(system_name, {})
+        for stage in BENCHMARK_STAGES:
+            if stage not in stages or stage not in baseline_stages:
+                continue
+            baseline_median, median = baseline_stages[stage]['median'], stages[stage]['median']
+            ratio = median / baseline_median if baseline_median else float('inf')
+            is_regression = median > baseline_median * (1 + tolerance)
+            if is_regression:
+                regressions.append((system_name, stage, baseline_median, median))
+            print(f'{system_name} {stage}: {baseline_median:.6f}s -> {median:.6f}s (x{ratio:.2f})'
+                  f'{" REGRESSION" if is_regression else ""}')
+    return regressions
@@ -1,11 +1,74 @@
+from importlib.util import find_spec
+
+from .consts import BIT_PARALLEL_SIMULATION, BFS_ENGINE, BUILTIN_SAT_SOLVER, PYSAT_SAT_SOLVER
+
 DATA_SYSTEMS_DIR = 'circuits_examples/Data_Systems'
 DATA_OBSERVATIONS_DIR = 'circuits_examples/Data_Observations'
 
+# amount of processes that read the data files in parallel (None for the amount of CPUs)
+PARSING_WORKERS = None
+
 MAX_FAULTY_COMPONENTS = 3
+# the default diagnosis search: BFS_ENGINE, CONFLICT_DIRECTED_ENGINE or SAT_ENGINE (see engines/__init__.py)
+DIAGNOSIS_ENGINE = BFS_ENGINE
+# the solver of SAT_ENGINE: PYSAT_SAT_SOLVER (requires the python-sat package, the default when it is installed) or
+# BUILTIN_SAT_SOLVER (pure Python, much slower)
+SAT_SOLVER = PYSAT_SAT_SOLVER if find_spec('pysat') else BUILTIN_SAT_SOLVER
+# the solver of the python-sat package that PYSAT_SAT_SOLVER runs (see pysat.solvers.SolverNames)
+PYSAT_SOLVER_NAME = 'cadical153'
 SINGLE_GATE_FAULTY_PROB = 0.01
 SINGLE_OUTPUT_CERTAINTY_PROB = 0.99
 SINGLE_OUTPUT_UNCERTAINTY_PROB = 1 - SINGLE_OUTPUT_CERTAINTY_PROB
+# cutoffs of the uncertain observations of an observation: the maximal amount of flipped outputs (None for any amount)
+# and the minimal probability (0 for any probability)
+MAX_FLIPPED_OUTPUTS = None
+MIN_UNCERTAIN_OBS_PROB = 0
+# approximate diagnoses probabilities (see api.estimate_diagnoses_probs, the uncertain observations are sampled by
+# their prior): the maximal amount of samples per observation, the amount of samples per observation in each round
+# and the confidence level of the intervals
+SAMPLES_PER_OBSERVATION = 1000
+SAMPLING_BATCH_SIZE = 100
+SAMPLING_CONFIDENCE = 0.95
+
+# how the systems are simulated: BIT_PARALLEL_SIMULATION (in memory, many candidates per pass),
+# INCREMENTAL_SIMULATION (in memory, only the fan-out cone of each candidate over a cached healthy simulation),
+# COMPILED_SIMULATION (in memory, a candidate per pass) or ORM_SIMULATION (through the IO rows)
+SIMULATION_MODE = BIT_PARALLEL_SIMULATION
+# amount of evaluations packed into a single bit-parallel simulation pass
+SIMULATION_LANES = 256
+# maximal amount of predictions memoized per circuit, by input vector and faulty gates (0 to disable the memo)
+PREDICTION_MEMO_SIZE = 2 ** 16
+# whether all the uncertain observations of an observation are diagnosed by a single shared search
+SHARED_UNCERTAIN_SEARCH = True
+# amount of processes that diagnose the observations in parallel (1 to diagnose all of them in the main process).
+# More workers than CPUs only add overhead.
+DIAGNOSIS_WORKERS = 1
+# systems with fewer gates are diagnosed in the main process even with more workers, since sending their observations
+# to a worker takes longer than diagnosing them (~20 ms per observation, while c17 takes ~8 ms and 74182 ~90 ms)
+PARALLEL_DIAGNOSIS_MIN_GATES = 10
+# JSON lines file of the traces of the diagnosis runs, with counters per BFS layer (None to disable them,
+# see tracing.py)
+TRACE_FILEPATH = None
+# whether the API calls count their DB queries (see profiling.py)
+QUERY_PROFILING = False
+
+# directory of the compiled circuits cache, keyed by the hash of their structure (None to compile on every run)
+COMPILED_CIRCUITS_CACHE_DIR = 'diagnosis_with_uncertain_observation/circuits_parser/cache/compiled_circuits'
+
+# benchmarks (see benchmark.py): the benchmarked systems, the amount of observations of each system (the first ones
+# in its .obs file), the amount of untimed and of timed runs of every benchmark, the n of the top_diagnoses benchmark
+# and the relative slowdown of a median (compared to a baseline report) that is considered a regression
+BENCHMARK_SYSTEMS = ['c17', '74182', '74283', '74181']
+BENCHMARK_OBSERVATIONS_NUM = 3
+BENCHMARK_WARMUP_RUNS = 1
+BENCHMARK_RUNS = 5
+BENCHMARK_TOP_N = 10
+BENCHMARK_REGRESSION_TOLERANCE = 0.1
+
+# amount of rows inserted by a single query when results are saved in bulk
+BULK_CREATE_BATCH_SIZE = 500
 
 RESULTS_RUN_TIMES_DIR = 'diagnosis_with_uncertain_observation/circuits_parser/results/run_times'
 RESULTS_DIAGNOSIS_PROBABILITIES_DIR = \
     'diagnosis_with_uncertain_observation/circuits_parser/results/diagnosis_probabilities'
+RESULTS_BENCHMARKS_DIR = 'diagnosis_with_uncertain_observation/circuits_parser/results/benchmarks'
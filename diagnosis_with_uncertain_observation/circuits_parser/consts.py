@@ -1,5 +1,6 @@
 SYS_FILE_EXTENSION = 'sys'
 OBS_FILE_EXTENSION = 'obs'
+COMPILED_CIRCUIT_FILE_EXTENSION = 'circuit'
 
 INVERTER = 'inverter'
 AND = 'and'
@@ -11,3 +12,15 @@ BUFFER = 'buffer'
 
 INPUT_PREFIX = 'i'
 OUTPUT_PREFIX = 'o'
+
+ORM_SIMULATION = 'orm'
+COMPILED_SIMULATION = 'compiled'
+BIT_PARALLEL_SIMULATION = 'bit_parallel'
+INCREMENTAL_SIMULATION = 'incremental'
+
+BFS_ENGINE = 'bfs'
+CONFLICT_DIRECTED_ENGINE = 'conflict_directed'
+SAT_ENGINE = 'sat'
+
+BUILTIN_SAT_SOLVER = 'builtin'
+PYSAT_SAT_SOLVER = 'pysat'
@@ -0,0 +1,23 @@
+""" Defines all possible diagnosis engines, besides the BFS of Observation.find_diagnoses.
+
+Each engine is a function of (observation, max_faulty_components) that returns the minimal diagnoses of the
+observation as sets of gate indices in the compiled circuit of the system.
+(The best-first search of the most probable diagnoses of a whole system is in best_first.py, see
+api.search_top_diagnoses.)
+
+An engine may also search for the diagnoses of all the uncertain observations of an observation at once:
+a function of (observation, output vectors, max_faulty_components) in uncertain_engines, that returns the diagnoses
+of each of the output vectors (as the BFS of Observation.find_uncertain_diagnoses).
+"""
+from .conflict_directed import find_conflict_directed_diagnoses
+from .sat import find_sat_diagnoses, find_uncertain_sat_diagnoses
+from ..consts import CONFLICT_DIRECTED_ENGINE, SAT_ENGINE
+
+engines = {
+    CONFLICT_DIRECTED_ENGINE: find_conflict_directed_diagnoses,
+    SAT_ENGINE: find_sat_diagnoses,
+}
+
+uncertain_engines = {
+    SAT_ENGINE: find_uncertain_sat_diagnoses,
+}
@@ -0,0 +1,161 @@
+""" Best-first search for the most probable diagnoses of a system, over all the uncertain observations.
+
+The probability of a diagnosis of a system is the sum, over the observations, of the probability of the uncertain
+observation it explains times SINGLE_GATE_FAULTY_PROB ** |diagnosis|. A candidate predicts a single output vector
+of each observation, so it is paired with a single uncertain observation (the one with the outputs it predicts),
+and the probability of the pair depends only on (amount of faulty gates, amount of flipped outputs).
+
+The pairs are explored in descending probability from a heap, so a diagnosis is always explored after its subsets
+with the same flipped outputs (which keeps it minimal). The candidates are generated and simulated lazily, in
+batches, only when the most probable pair they may make reaches the top of the heap.
+The search stops when the n best accumulated diagnoses can not be overtaken by any other candidate, with its pairs
+that are still in the heap and at most the top of the heap per observation it was not simulated with. Then the
+exact probabilities of these n diagnoses are completed.
+"""
+import heapq
+import itertools
+from collections import defaultdict
+
+from ..config import MAX_FAULTY_COMPONENTS, SINGLE_GATE_FAULTY_PROB, SIMULATION_LANES
+from ..subset_index import SubsetIndex
+from ..utils import indices_mask
+
+
+def find_top_diagnoses(observations: list, flips_priors: dict[int: float], n: int,
+                       max_faulty_components: int = MAX_FAULTY_COMPONENTS,
+                       batch_size: int = SIMULATION_LANES) -> list[tuple[frozenset[int], float]]:
+    """ Looks for the n most probable diagnoses of the observations (of the same system) and their probabilities.
+
+    Args:
+        observations: Observations of the system
+        flips_priors: key: amount of flipped outputs of the uncertain observations to consider,
+                      value: the probability of such an uncertain observation
+        n: amount of diagnoses to find
+        max_faulty_components: maximal amount of faulty gates in a diagnosis
+        batch_size: amount of the candidates that are simulated together
+
+    Returns:
+        list[tuple[frozenset[int], float]]. (gate indices in the compiled circuit of the system, probability)
+        of each of the n most probable diagnoses, in descending probability order
+    """
+    if not observations or not flips_priors:
+        return []
+
+    # the heap holds the simulated pairs by their probabilities, and the candidates that are not simulated yet
+    # (per observation and amount of faulty gates, generated lazily) by the most probable pair they may make
+    gates_num = observations[0].system.compiled.gates_num
+    max_flips_prior = max(flips_priors.values())
+    order = itertools.count()  # breaks the ties of the heap, so the entries themselves are never compared
+    heap = [
+        (-SINGLE_GATE_FAULTY_PROB ** faulty_num * max_flips_prior, next(order), obs_i, None,
+         map(frozenset, itertools.combinations(range(gates_num), faulty_num)))
+        for faulty_num in range(1, max_faulty_components + 1)
+        for obs_i in range(len(observations))
+    ]
+    heapq.heapify(heap)
+
+    diagnoses_indices = defaultdict(SubsetIndex)  # key: (observation index, flip mask)
+    accumulated = defaultdict(float)  # key: diagnosis, value: its probability of the explored pairs
+    # key: candidate, value: the amount of observations it was simulated with / the probability of its pairs in the heap
+    simulated = defaultdict(int)
+    pending = {}
+    checked_p = None
+    while heap:
+        # a new candidate gains at most a pair as probable as the top of the heap per observation
+        top_p = -heap[0][0]
+        if top_p != checked_p:
+            checked_p = top_p
+            bounds = {
+                candidate: accumulated.get(candidate, 0) + pending.get(candidate, (0, 0))[1] +
+                (len(observations) - simulated_num) *
+                min(top_p, SINGLE_GATE_FAULTY_PROB ** len(candidate) * max_flips_prior)
+                for candidate, simulated_num in simulated.items()
+            }
+            if top_settled(accumulated, bounds, n, len(observations) * top_p):
+                break
+
+        neg_p, _, obs_i, pair, candidates = heapq.heappop(heap)
+        if candidates is not None:
+            batch = list(itertools.islice(candidates, batch_size))
+            if len(batch) == batch_size:
+                heapq.heappush(heap, (neg_p, next(order), obs_i, None, candidates))
+            for candidate in batch:
+                simulated[candidate] += 1
+            for pair_p, pair in simulated_pairs(observations[obs_i], flips_priors, batch):
+                heapq.heappush(heap, (-pair_p, next(order), obs_i, pair, None))
+                pairs_num, pairs_p = pending.get(pair[0], (0, 0))
+                pending[pair[0]] = (pairs_num + 1, pairs_p + pair_p)
+            continue
+
+        # the subsets of the candidate are more probable with the same flipped outputs, so they were popped already
+        candidate, flip_mask = pair
+        pairs_num, pairs_p = pending.pop(candidate)
+        if pairs_num > 1:
+            pending[candidate] = (pairs_num - 1, pairs_p + neg_p)
+        diagnoses_index = diagnoses_indices[(obs_i, flip_mask)]
+        if not diagnoses_index.has_subset_of(candidate):
+            diagnoses_index.add(candidate)
+            accumulated[candidate] += -neg_p
+
+    top = sorted(accumulated, key=accumulated.get, reverse=True)[:n]
+    return sorted(
+        ((diagnosis, diagnosis_p(observations, flips_priors, diagnosis)) for diagnosis in top),
+        key=lambda diagnosis_prob: diagnosis_prob[1],
+        reverse=True
+    )
+
+
+def simulated_pairs(observation, flips_priors: dict[int: float], candidates: list[frozenset[int]]):
+    """ Pairs each of the candidates with the uncertain observation it explains (if it passes the cutoffs).
+
+    Returns:
+        generator of tuple[float, tuple[frozenset[int], int]]. (probability of the pair,
+        (candidate, flip mask of the uncertain observation)) of each of the paired candidates
+    """
+    for candidate, prediction in zip(candidates, observation.predict_fault_sets(candidates)):
+        flip_mask = flipped_outputs_mask(prediction, observation.output_vector)
+        flips_num = flip_mask.bit_count()
+        if flips_num in flips_priors:
+            yield SINGLE_GATE_FAULTY_PROB ** len(candidate) * flips_priors[flips_num], (candidate, flip_mask)
+
+
+def flipped_outputs_mask(prediction: tuple[bool], output_vector: tuple[bool]) -> int:
+    """ Returns the flip mask of the uncertain observation with the predicted outputs (see UncertainObservation) """
+    return indices_mask(i for i, (predicted, observed) in enumerate(zip(prediction, output_vector))
+                        if predicted != observed)
+
+
+def top_settled(accumulated: dict, bounds: dict, n: int, unexplored_p: float) -> bool:
+    """ Checks whether the n best accumulated diagnoses stay the n best until the end of the search.
+
+    Args:
+        accumulated: key: diagnosis, value: its probability so far
+        bounds: key: candidate, value: the maximal probability it may reach
+        unexplored_p: the maximal probability that a candidate that is not in bounds may reach
+    """
+    top = heapq.nlargest(n, accumulated, key=accumulated.get)
+    if len(top) < n:
+        return unexplored_p == 0 and all(bound == 0 for bound in bounds.values())
+    top_min_p = accumulated[top[-1]]
+    top = set(top)
+    return top_min_p >= unexplored_p and all(
+        bound <= top_min_p for candidate, bound in bounds.items() if candidate not in top
+    )
+
+
+def diagnosis_p(observations: list, flips_priors: dict[int: float], diagnosis: frozenset[int]) -> float:
+    """ The exact probability of the diagnosis over the observations: for each observation, the diagnosis is counted
+    if none of its subsets predicts the same outputs (so it is a minimal diagnosis of that uncertain observation).
+    """
+    subsets = [
+        frozenset(subset)
+        for subset_size in range(1, len(diagnosis))
+        for subset in itertools.combinations(sorted(diagnosis), subset_size)
+    ]
+    p = 0
+    for obs in observations:
+        prediction, *subsets_predictions = obs.predict_fault_sets([diagnosis] + subsets)
+        flips_num = flipped_outputs_mask(prediction, obs.output_vector).bit_count()
+        if flips_num in flips_priors and prediction not in subsets_predictions:
+            p += SINGLE_GATE_FAULTY_PROB ** len(diagnosis) * flips_priors[flips_num]
+    return p
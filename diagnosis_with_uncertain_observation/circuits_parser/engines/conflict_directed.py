@@ -0,0 +1,56 @@
+""" Conflict-directed search for minimal diagnoses (HS-tree, as in GDE).
+
+If all the gates in the fan-in cone of a discrepant output were healthy, the output would keep its predicted value,
+so every diagnosis must contain a gate from that cone (a conflict). Each node of the search tree is a set of faulty
+gates, and it is expanded only by the gates of its smallest conflict, instead of by every gate of the system.
+The tree is explored level by level, so the diagnoses are exactly the minimal ones that the BFS finds.
+"""
+from ..config import MAX_FAULTY_COMPONENTS
+from ..subset_index import SubsetIndex
+
+
+def find_conflict_directed_diagnoses(observation, max_faulty_components: int = MAX_FAULTY_COMPONENTS):
+    """ Looks for the minimal diagnoses of the observation by expanding only the conflicts of each candidate.
+
+    Args:
+        observation: Observation to diagnose
+        max_faulty_components: maximal amount of faulty gates in a diagnosis
+
+    Returns:
+        list[frozenset[int]]. The diagnoses, as indices of the gates in the compiled circuit of the system
+    """
+    circuit = observation.system.compiled
+    all_gates = frozenset(range(circuit.gates_num))
+
+    diagnoses = []
+    diagnoses_index = SubsetIndex()
+    level = [frozenset()]
+    visited = set(level)
+    while level:
+        next_level = []
+        for candidate, prediction in zip(level, observation.predict_fault_sets(level)):
+            if diagnoses_index.has_subset_of(candidate):
+                continue  # not minimal
+
+            discrepant_outputs = [
+                i for i, (predicted, observed) in enumerate(zip(prediction, observation.output_vector))
+                if predicted != observed
+            ]
+            if not discrepant_outputs:
+                if candidate:
+                    diagnoses.append(candidate)
+                    diagnoses_index.add(candidate)
+                    continue
+                # the healthy system explains the observation, so there is no conflict to focus on
+                conflict = all_gates
+            else:
+                conflict = min((circuit.output_cones[i] - candidate for i in discrepant_outputs), key=len)
+
+            if len(candidate) < max_faulty_components:
+                for gate_i in conflict:
+                    child = candidate | {gate_i}
+                    if child not in visited:
+                        visited.add(child)
+                        next_level.append(child)
+        level = next_level
+    return diagnoses
@@ -0,0 +1,116 @@
+""" Monte Carlo estimation of the probabilities of the diagnoses of a system, for circuits with too many outputs to
+enumerate all of their uncertain observations.
+
+The probability of a diagnosis is the sum, over the observations, of the expectation (over the flip masks of the
+uncertain observations, by their prior) of SINGLE_GATE_FAULTY_PROB ** |diagnosis| when it is a diagnosis of the
+uncertain observation (and 0 for the flip masks out of the cutoffs). The flip masks are sampled from their prior
+(each output is flipped with SINGLE_OUTPUT_UNCERTAINTY_PROB), so the estimate of an observation is the plain mean of
+its samples.
+The observations are sampled one after the other: each distinct flip mask of an observation is diagnosed once, and
+the output vectors that its candidates predict are kept across its rounds, so each candidate is predicted once.
+"""
+import math
+import random
+import time
+from collections import defaultdict, namedtuple
+from statistics import NormalDist
+
+from ..config import SINGLE_GATE_FAULTY_PROB, SINGLE_OUTPUT_UNCERTAINTY_PROB, SAMPLES_PER_OBSERVATION, \
+    SAMPLING_BATCH_SIZE, SAMPLING_CONFIDENCE
+
+ProbabilityEstimate = namedtuple('ProbabilityEstimate', ['p', 'ci_low', 'ci_high'])
+
+
+def estimate_diagnoses_probs(observations: list, flips_nums: set[int], diagnose,
+                             samples: int = SAMPLES_PER_OBSERVATION, time_budget: float = None,
+                             confidence: float = SAMPLING_CONFIDENCE, seed=None) -> dict:
+    """ Estimates the probabilities of the diagnoses of the observations (of the same system) by sampling the flip
+    masks of their uncertain observations, observation by observation.
+
+    Args:
+        observations: Observations of the system
+        flips_nums: amounts of flipped outputs of the uncertain observations to consider (see flip_masks_levels)
+        diagnose: function of (observation, flip masks, predictions) that returns the diagnoses of each of the
+                  uncertain observations (dict[int: list[frozenset[int]]], diagnoses as sets of gate indices).
+                  predictions is a dict of the observation that is kept across its rounds, for the output vectors
+                  that the candidates predict (see Observation.find_uncertain_diagnoses)
+        samples: maximal amount of samples per observation
+        time_budget: maximal amount of seconds to sample (None for no limit). What is left of it is split evenly
+                     between the observations that are not sampled yet, and each observation has at least a round
+        confidence: confidence level of the intervals of the estimates
+        seed: seed of the random samples (None for a random seed)
+
+    Returns:
+        dict[frozenset[int]: ProbabilityEstimate]. The estimated probability of each diagnosis that was sampled,
+        with its confidence interval
+    """
+    rng = random.Random(seed)
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    probs = defaultdict(float)  # key: diagnosis, value: sum of the estimates of the observations
+    variances = defaultdict(float)  # key: diagnosis, value: sum of the variances of the estimates of the observations
+    for obs_i, obs in enumerate(observations):
+        obs_deadline = None if deadline is None else \
+            time.monotonic() + max(deadline - time.monotonic(), 0) / (len(observations) - obs_i)
+        sums, squares_sums, samples_num = sample_observation(rng, obs, flips_nums, diagnose, samples, obs_deadline)
+        # the observations are sampled independently, so the variances of their means are summed
+        for diagnosis, values_sum in sums.items():
+            probs[diagnosis] += values_sum / samples_num
+            variances[diagnosis] += sample_mean_variance(values_sum, squares_sums[diagnosis], samples_num)
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    estimates = {}
+    for diagnosis, p in probs.items():
+        half_width = z * math.sqrt(variances[diagnosis])
+        estimates[diagnosis] = ProbabilityEstimate(p, max(p - half_width, 0), p + half_width)
+    return estimates
+
+
+def sample_observation(rng: random.Random, obs, flips_nums: set[int], diagnose, samples: int,
+                       deadline: float = None) -> tuple[dict, dict, int]:
+    """ Samples the flip masks of the uncertain observations of the observation in rounds of SAMPLING_BATCH_SIZE,
+    until the samples budget or the deadline (checked after each round) is reached.
+
+    Returns:
+        (dict[frozenset[int]: float], dict[frozenset[int]: float], int). The sum of the values of the samples of each
+        diagnosis, the sum of their squares, and the amount of samples
+    """
+    outputs_num = len(obs.output_vector)
+    masks_diagnoses = {}  # key: flip mask, value: its diagnoses
+    predictions = {}  # key: candidate, value: the output vector it predicts (see diagnose)
+    sums, squares_sums = defaultdict(float), defaultdict(float)
+    samples_num = 0
+    while samples_num < samples and (deadline is None or samples_num == 0 or time.monotonic() < deadline):
+        batch_size = min(SAMPLING_BATCH_SIZE, samples - samples_num)
+        flip_masks = [sample_flip_mask(rng, outputs_num, SINGLE_OUTPUT_UNCERTAINTY_PROB) for _ in range(batch_size)]
+        # a flip mask out of the cutoffs is not diagnosed, its value is 0 for every diagnosis
+        new_flip_masks = [
+            flip_mask for flip_mask in dict.fromkeys(flip_masks)
+            if flip_mask not in masks_diagnoses and flip_mask.bit_count() in flips_nums
+        ]
+        if new_flip_masks:
+            masks_diagnoses.update(diagnose(obs, new_flip_masks, predictions))
+
+        for flip_mask in flip_masks:
+            for diagnosis in masks_diagnoses.get(flip_mask, ()):
+                value = SINGLE_GATE_FAULTY_PROB ** len(diagnosis)
+                sums[diagnosis] += value
+                squares_sums[diagnosis] += value ** 2
+        samples_num += batch_size
+    return sums, squares_sums, samples_num
+
+
+def sample_flip_mask(rng: random.Random, outputs_num: int, flip_prob: float) -> int:
+    """ Returns a flip mask where each output is flipped with the given probability (see UncertainObservation) """
+    flip_mask = 0
+    for i in range(outputs_num):
+        if rng.random() < flip_prob:
+            flip_mask |= 1 << i
+    return flip_mask
+
+
+def sample_mean_variance(values_sum: float, squares_sum: float, samples_num: int) -> float:
+    """ The estimated variance of the mean of samples, from the sum of the samples and the sum of their squares """
+    if samples_num < 2:
+        return 0
+    mean = values_sum / samples_num
+    return max(squares_sum / samples_num - mean ** 2, 0) / (samples_num - 1)
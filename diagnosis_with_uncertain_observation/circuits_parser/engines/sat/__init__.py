@@ -0,0 +1,69 @@
+""" SAT-based search for minimal diagnoses.
+
+The circuit and the observation are encoded as CNF (see encoding.py), so every solution is a set of faulty gates
+with the outputs it flips. Each flip mask is solved under assumptions of its flipped outputs, on a single solver
+whose learned clauses are shared by the masks. The diagnoses are enumerated by an increasing bound of faulty gates
+(a cardinality constraint that is assumed per bound), and each diagnosis is blocked with all of its supersets for
+the same flipped outputs. Once all the solutions of a bound are blocked, every solution of the next bound is a
+minimal diagnosis, so the diagnoses are exactly the minimal ones that the BFS finds.
+The solver is pluggable (SAT_SOLVER in config.py, see solver.py). With the python-sat package (the default when it is
+installed) the engine is much faster than the BFS on the larger circuits, whose layers of candidates grow too large
+to simulate (e.g. c432 and c880, see README.md). Without it, the dependency-free solver is a correctness reference
+of the BFS: it solves once per diagnosis in Python, so it is slower than the bit-parallel BFS.
+"""
+from .encoding import CircuitCNF
+from .solver import solvers
+from ...config import MAX_FAULTY_COMPONENTS, SAT_SOLVER
+
+
+def find_sat_diagnoses(observation, max_faulty_components: int = MAX_FAULTY_COMPONENTS):
+    """ Looks for the minimal diagnoses of the observation with a SAT solver.
+
+    Args:
+        observation: Observation to diagnose
+        max_faulty_components: maximal amount of faulty gates in a diagnosis
+
+    Returns:
+        list[frozenset[int]]. The diagnoses, as indices of the gates in the compiled circuit of the system
+    """
+    output_vector = tuple(observation.output_vector)
+    return find_uncertain_sat_diagnoses(observation, [output_vector], max_faulty_components)[output_vector]
+
+
+def find_uncertain_sat_diagnoses(observation, output_vectors: list[tuple[bool]],
+                                 max_faulty_components: int = MAX_FAULTY_COMPONENTS) -> dict:
+    """ Looks for the minimal diagnoses of the uncertain observations of the observation in a single formula,
+    where the flipped outputs of each uncertain observation are assumed (a flip variable per output).
+
+    Args:
+        observation: Observation whose inputs are the inputs of all the uncertain observations
+        output_vectors: the output vectors of the uncertain observations
+        max_faulty_components: maximal amount of faulty gates in a diagnosis
+
+    Returns:
+        dict[tuple[bool]: list[frozenset[int]]]. The diagnoses of each of the output vectors
+    """
+    circuit = observation.system.compiled
+    observed = tuple(observation.output_vector)
+    masks_outputs = {flip_mask_of(output_vector, observed): tuple(output_vector) for output_vector in output_vectors}
+    if not masks_outputs:
+        return {}
+
+    solver = solvers[SAT_SOLVER]()
+    cnf = CircuitCNF(solver, circuit, observation.input_vector, observed, max_faulty_components, masks_outputs)
+    diagnoses = {}
+    for flip_mask, output_vector in masks_outputs.items():
+        diagnoses[output_vector] = []
+        for faulty_num in range(1, max_faulty_components + 1):
+            assumptions = cnf.assumptions(flip_mask, faulty_num)
+            while solver.solve(assumptions):
+                faulty_gates = cnf.faulty_gates()
+                diagnoses[output_vector].append(faulty_gates)
+                cnf.block(faulty_gates, flip_mask)
+    return diagnoses
+
+
+def flip_mask_of(output_vector, observed) -> int:
+    """ The outputs in which the output vector differs from the observed one (bit i stands for the output i) """
+    return sum(1 << i for i, (value, observed_value) in enumerate(zip(output_vector, observed))
+               if value != observed_value)
@@ -0,0 +1,137 @@
+""" CNF encoding of a compiled circuit under an observation (Tseitin encoding).
+
+Every net of the circuit has a variable, and every gate has a health variable: a healthy gate drives the operation
+of its inputs, and a faulty one drives the inverted operation (the fault model of the simulations). Multiple inputs
+are reduced with the binary operator from left to right, as in Component.op, through intermediate variables.
+The inputs of the observation are unit clauses, and each output has a flip variable: the output net has the
+observed value, flipped when the flip variable is true (so the uncertain observations are all in one formula).
+Each flip mask is solved by assuming its flip variables, and its blocking clauses are guarded by an activation
+variable of the mask, so they are satisfied (and never visited by the propagation) when another mask is solved.
+"""
+from ...consts import INVERTER, AND, OR, NAND, NOR, XOR
+from ...simulation.compiled_circuit import OPERATOR_NAMES
+
+
+class CircuitCNF:
+    """ The clauses of a compiled circuit and of an observation, added to a solver.
+
+    Usage:
+        cnf = CircuitCNF(solver, circuit, input_vector, output_vector, max_faulty_components=3, flip_masks=[0, 0b10])
+        solver.solve(assumptions=cnf.assumptions(0b10, faulty_num=2))
+        cnf.faulty_gates()
+    """
+
+    def __init__(self, solver, circuit, input_vector, output_vector, max_faulty_components: int,
+                 flip_masks=(0,)):
+        """
+        Args:
+            solver: SAT solver backend (see solver.py)
+            circuit: CompiledCircuit of the system
+            input_vector: values of the system inputs (see CompiledCircuit.input_vector)
+            output_vector: observed values of the system outputs (see CompiledCircuit.output_vector)
+            max_faulty_components: maximal amount of faulty gates that at_most_faulty may be asked for
+            flip_masks: the flipped outputs that may be solved (bit i stands for the output in position i)
+        """
+        self.solver = solver
+        self.net_vars = [solver.new_var() for _ in range(circuit.inputs_num + circuit.gates_num)]
+        # healthy first, so the first solutions have few faulty gates
+        self.health_vars = [solver.new_var(phase=True) for _ in range(circuit.gates_num)]
+        self.flip_vars = [solver.new_var() for _ in circuit.output_nets]
+        self.mask_vars = {flip_mask: solver.new_var() for flip_mask in flip_masks}
+
+        for net_var, value in zip(self.net_vars, input_vector):
+            solver.add_clause([net_var if value else -net_var])
+        for i, (op_code, unary, fan_in) in enumerate(zip(circuit.op_codes, circuit.unary, circuit.fan_ins)):
+            self.__add_gate(OPERATOR_NAMES[op_code], unary, [self.net_vars[net] for net in fan_in],
+                            self.net_vars[circuit.inputs_num + i], self.health_vars[i])
+        for net, flip_var, value in zip(circuit.output_nets, self.flip_vars, output_vector):
+            self.__add_xor(self.net_vars[net], flip_var if value else -flip_var, True)
+
+        # a diagnosis has at least one faulty gate (as in the BFS, which starts from the single gates)
+        solver.add_clause([-health_var for health_var in self.health_vars])
+        self.__at_least_faulty = self.__add_counter([-health_var for health_var in self.health_vars],
+                                                    max_faulty_components + 1)
+
+    def assumptions(self, flip_mask: int, faulty_num: int) -> list[int]:
+        """ The literals to assume for the solutions with the given flipped outputs and at most faulty_num faulty gates
+        (up to max_faulty_components)
+        """
+        return ([mask_var if mask == flip_mask else -mask_var for mask, mask_var in self.mask_vars.items()] +
+                [flip_var if flip_mask >> i & 1 else -flip_var for i, flip_var in enumerate(self.flip_vars)] +
+                [-self.__at_least_faulty[faulty_num]])
+
+    def faulty_gates(self) -> frozenset[int]:
+        """ The indices of the faulty gates in the last solution """
+        return frozenset(i for i, healthy in enumerate(self.solver.values(self.health_vars)) if not healthy)
+
+    def block(self, faulty_gates: frozenset[int], flip_mask: int):
+        """ Excludes the solutions with all the given faulty gates (any of their supersets) and the given flips """
+        # the activation literal first, so the clause is watched by it
+        self.solver.add_clause([-self.mask_vars[flip_mask]] + [self.health_vars[i] for i in faulty_gates])
+
+    def __add_gate(self, op_name: str, unary: bool, input_literals: list[int], output_var: int, health_var: int):
+        if unary:
+            value = -input_literals[0] if op_name == INVERTER else input_literals[0]
+        else:
+            value = input_literals[0]
+            for input_literal in input_literals[1:]:
+                value = self.__add_binary(op_name, value, input_literal)
+        # output = value XOR faulty, where faulty is the negated health variable
+        self.__add_xor(output_var, value, -health_var)
+
+    def __add_binary(self, op_name: str, a: int, b: int) -> int:
+        """ Adds a variable that is the binary operation of the literals a and b, and returns it """
+        var = self.solver.new_var()
+        if op_name in (AND, NAND):
+            # NAND is the negation of AND
+            result = var if op_name == AND else -var
+            self.solver.add_clause([-result, a])
+            self.solver.add_clause([-result, b])
+            self.solver.add_clause([result, -a, -b])
+        elif op_name in (OR, NOR):
+            result = var if op_name == OR else -var
+            self.solver.add_clause([result, -a])
+            self.solver.add_clause([result, -b])
+            self.solver.add_clause([-result, a, b])
+        elif op_name == XOR:
+            self.__add_xor(var, a, b)
+        else:
+            raise ValueError(f'The operator {op_name} is not binary')
+        return var
+
+    def __add_xor(self, result: int, a, b):
+        """ Adds the clauses of result = a XOR b, where b may be a literal or a constant """
+        if b is True:
+            self.solver.add_clause([result, a])
+            self.solver.add_clause([-result, -a])
+            return
+        self.solver.add_clause([-result, a, b])
+        self.solver.add_clause([-result, -a, -b])
+        self.solver.add_clause([result, -a, b])
+        self.solver.add_clause([result, a, -b])
+
+    def __add_counter(self, literals: list[int], bound: int) -> list[int]:
+        """ Adds a sequential counter (Sinz) of the true literals, in one direction: enough to bound the amount from
+        above by assuming that a counter variable is false.
+
+        Returns:
+            list[int]. Variables, where the variable in position j is true when at least j + 1 literals are true
+            (up to bound literals)
+        """
+        at_least = []  # of the literals so far
+        for literal in literals:
+            next_at_least = [self.solver.new_var() for _ in range(min(len(at_least) + 1, bound))]
+            for j, var in enumerate(next_at_least):
+                if j < len(at_least):
+                    self.solver.add_clause([-at_least[j], var])
+                if j == 0:
+                    self.solver.add_clause([-literal, var])
+                else:
+                    self.solver.add_clause([-literal, -at_least[j - 1], var])
+            at_least = next_at_least
+        return at_least + [self.__false_var()] * (bound - len(at_least))
+
+    def __false_var(self) -> int:
+        var = self.solver.new_var()
+        self.solver.add_clause([-var])
+        return var
@@ -0,0 +1,308 @@
+""" SAT solver backends of the SAT engine.
+
+A backend solves CNF formulas over variables numbered from 1, where a literal is a variable (true)
+or its negation (false), and clauses may be added between the solutions (e.g. blocking clauses).
+"""
+import heapq
+
+from ...config import PYSAT_SOLVER_NAME
+from ...consts import BUILTIN_SAT_SOLVER, PYSAT_SAT_SOLVER
+
+
+class Solver:
+    """ Dependency-free CDCL solver: two watched literals, first-UIP clause learning, activity-based decisions with
+    phase saving, and restarts. The learned clauses are kept between the solutions, since clauses are only added.
+
+    Usage:
+        solver = Solver()
+        a, b = solver.new_var(), solver.new_var()
+        solver.add_clause([a, -b])
+        solver.solve(assumptions=[b])  # True
+        solver.value(a)  # True
+    """
+    RESTART_CONFLICTS = 100
+    RESTART_GROWTH = 1.5
+    ACTIVITY_DECAY = 0.95
+
+    def __init__(self):
+        self.vars_num = 0
+        self.clauses: list[list[int]] = []
+        self.watches: dict[int: list[int]] = {}  # key: literal, value: indices of the clauses that watch it
+        # key: literal of an assigned variable, value: whether it is true (so a literal is looked up in a single step)
+        self.truth: dict[int: bool] = {}
+        self.levels: list[int] = [0]
+        self.reasons: list = [None]  # per variable: index of the clause that implied it
+        self.activity: list[float] = [0.0]
+        self.phases: list[bool] = [False]
+        self.trail: list[int] = []
+        self.trail_limits: list[int] = []  # the trail position of each decision level
+        self.propagated = 0  # trail position of the next literal to propagate
+        self.order: list = []  # heap of (-activity, variable)
+        self.activity_increment = 1.0
+        self.unsatisfiable = False
+        self.model: dict[int: bool] = {}
+
+    def new_var(self, phase: bool = False) -> int:
+        """ Adds a variable, that is tried with the given value first """
+        self.vars_num += 1
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phases.append(phase)
+        self.watches[self.vars_num] = []
+        self.watches[-self.vars_num] = []
+        heapq.heappush(self.order, (0.0, self.vars_num))
+        return self.vars_num
+
+    def add_clause(self, literals):
+        """ Adds a clause (at the root level, so it may be added after a solution) """
+        self.__backtrack(0)
+        clause = []
+        for literal in dict.fromkeys(literals):
+            value = self.truth.get(literal)
+            if value is True or -literal in clause:
+                return  # satisfied at the root level, or a tautology
+            if value is None:
+                clause.append(literal)
+
+        if not clause:
+            self.unsatisfiable = True
+        elif len(clause) == 1:
+            self.__assign(clause[0], None)
+            if self.__propagate() is not None:
+                self.unsatisfiable = True
+        else:
+            self.__add_watched(clause)
+
+    def solve(self, assumptions=()) -> bool:
+        """ Checks whether the clauses are satisfiable when the assumptions literals are true
+        (the model of a solution is available by value)
+        """
+        if self.unsatisfiable:
+            return False
+        self.__backtrack(0)
+        if self.__propagate() is not None:
+            self.unsatisfiable = True
+            return False
+
+        conflicts, restart_limit = 0, self.RESTART_CONFLICTS
+        while True:
+            conflict = self.__propagate()
+            if conflict is not None:
+                conflicts += 1
+                if not self.trail_limits:
+                    self.unsatisfiable = True
+                    return False
+                learned, backtrack_level = self.__analyze(conflict)
+                self.__backtrack(backtrack_level)
+                if len(learned) == 1:
+                    self.__assign(learned[0], None)
+                else:
+                    self.__assign(learned[0], self.__add_watched(learned))
+                self.activity_increment /= self.ACTIVITY_DECAY
+                continue
+
+            if conflicts >= restart_limit:
+                conflicts, restart_limit = 0, restart_limit * self.RESTART_GROWTH
+                self.__backtrack(0)
+                continue
+
+            # the assumptions are the first decisions
+            level = len(self.trail_limits)
+            if level < len(assumptions):
+                literal = assumptions[level]
+                value = self.truth.get(literal)
+                if value is False:
+                    self.__backtrack(0)
+                    return False
+                self.trail_limits.append(len(self.trail))
+                if value is None:
+                    self.__assign(literal, None)
+                continue
+
+            var = self.__pick_branching_var()
+            if var is None:
+                self.model = {literal: True for literal in self.trail if literal > 0}
+                self.__backtrack(0)
+                return True
+            self.trail_limits.append(len(self.trail))
+            self.__assign(var if self.phases[var] else -var, None)
+
+    def value(self, var: int) -> bool:
+        """ The value of the variable in the model of the last solution """
+        return var in self.model
+
+    def values(self, variables: list[int]) -> list[bool]:
+        """ The values of the variables in the model of the last solution """
+        return [var in self.model for var in variables]
+
+    def __assign(self, literal: int, reason):
+        var = abs(literal)
+        self.truth[literal] = True
+        self.truth[-literal] = False
+        self.levels[var] = len(self.trail_limits)
+        self.reasons[var] = reason
+        self.trail.append(literal)
+
+    def __add_watched(self, clause: list[int]) -> int:
+        self.clauses.append(clause)
+        clause_i = len(self.clauses) - 1
+        self.watches[clause[0]].append(clause_i)
+        self.watches[clause[1]].append(clause_i)
+        return clause_i
+
+    def __propagate(self):
+        """ Propagates the assigned literals through the watched clauses.
+
+        Returns:
+            int. Index of a conflicting clause, or None
+        """
+        truth, clauses, watches, trail = self.truth, self.clauses, self.watches, self.trail
+        while self.propagated < len(trail):
+            false_literal = -trail[self.propagated]
+            self.propagated += 1
+            watching = watches[false_literal]
+            kept = []
+            for watch_i, clause_i in enumerate(watching):
+                clause = clauses[clause_i]
+                # the false literal is kept in the second position
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                first_value = truth.get(clause[0])
+                if first_value is True:
+                    kept.append(clause_i)
+                    continue
+
+                for i in range(2, len(clause)):
+                    if truth.get(clause[i]) is not False:
+                        clause[1], clause[i] = clause[i], clause[1]
+                        watches[clause[1]].append(clause_i)
+                        break
+                else:
+                    kept.append(clause_i)
+                    if first_value is False:
+                        kept += watching[watch_i + 1:]
+                        watches[false_literal] = kept
+                        self.propagated = len(trail)
+                        return clause_i
+                    self.__assign(clause[0], clause_i)
+            watches[false_literal] = kept
+        return None
+
+    def __analyze(self, conflict: int) -> tuple[list[int], int]:
+        """ Learns the first-UIP clause of the conflict.
+
+        Returns:
+            (list[int], int). The learned clause (with the asserting literal first) and the level to backtrack to
+        """
+        level = len(self.trail_limits)
+        learned, seen = [None], set()
+        at_level, trail_i = 0, len(self.trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            for literal in clause:
+                var = abs(literal)
+                if var in seen or self.levels[var] == 0:
+                    continue
+                seen.add(var)
+                self.__bump(var)
+                if self.levels[var] == level:
+                    at_level += 1
+                else:
+                    learned.append(literal)
+            # the next literal of the current level on the trail
+            while abs(self.trail[trail_i]) not in seen:
+                trail_i -= 1
+            literal = self.trail[trail_i]
+            trail_i -= 1
+            at_level -= 1
+            if at_level == 0:
+                learned[0] = -literal
+                break
+            clause = [other for other in self.clauses[self.reasons[abs(literal)]] if other != literal]
+
+        backtrack_level = 0
+        if len(learned) > 1:
+            # the second watched literal is the one of the highest level
+            max_i = max(range(1, len(learned)), key=lambda i: self.levels[abs(learned[i])])
+            learned[1], learned[max_i] = learned[max_i], learned[1]
+            backtrack_level = self.levels[abs(learned[1])]
+        return learned, backtrack_level
+
+    def __bump(self, var: int):
+        self.activity[var] += self.activity_increment
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.activity_increment *= 1e-100
+            self.order = [(-self.activity[var], var) for var in range(1, self.vars_num + 1)]
+            heapq.heapify(self.order)
+        else:
+            heapq.heappush(self.order, (-self.activity[var], var))
+
+    def __pick_branching_var(self):
+        while self.order:
+            _, var = heapq.heappop(self.order)
+            if var not in self.truth:
+                return var
+        return None
+
+    def __backtrack(self, level: int):
+        if len(self.trail_limits) <= level:
+            return
+        for literal in self.trail[self.trail_limits[level]:]:
+            var = abs(literal)
+            self.phases[var] = literal > 0
+            del self.truth[literal], self.truth[-literal]
+            self.reasons[var] = None
+            heapq.heappush(self.order, (-self.activity[var], var))
+        del self.trail[self.trail_limits[level]:]
+        del self.trail_limits[level:]
+        self.propagated = len(self.trail)
+
+
+class PysatSolver:
+    """ The same interface as Solver, backed by a solver of the optional python-sat package """
+
+    def __init__(self, name=PYSAT_SOLVER_NAME):
+        try:
+            from pysat.solvers import Solver as PysatBackend
+        except ImportError as e:
+            raise ImportError(f'The {PYSAT_SAT_SOLVER} SAT solver requires the python-sat package') from e
+        self.__solver = PysatBackend(name=name)
+        self.vars_num = 0
+        self.__phases = []
+        self.__phases_num = 0  # amount of the phases that the backend has
+        self.__model = []  # the literal of each variable, in its position
+
+    def new_var(self, phase: bool = False) -> int:
+        self.vars_num += 1
+        self.__phases.append(self.vars_num if phase else -self.vars_num)
+        return self.vars_num
+
+    def add_clause(self, literals):
+        self.__solver.add_clause(list(literals))
+
+    def solve(self, assumptions=()) -> bool:
+        # the backend keeps the phases, so they are set again only after new variables
+        if self.__phases_num < len(self.__phases) and hasattr(self.__solver, 'set_phases'):
+            self.__solver.set_phases(self.__phases)
+            self.__phases_num = len(self.__phases)
+        if not self.__solver.solve(assumptions=list(assumptions)):
+            return False
+        self.__model = self.__solver.get_model()
+        # the variables that are in no clause may be missing from the model of the backend
+        self.__model += range(-len(self.__model) - 1, -self.vars_num - 1, -1)
+        return True
+
+    def value(self, var: int) -> bool:
+        return self.__model[var - 1] > 0
+
+    def values(self, variables: list[int]) -> list[bool]:
+        model = self.__model
+        return [model[var - 1] > 0 for var in variables]
+
+
+solvers = {
+    BUILTIN_SAT_SOLVER: Solver,
+    PYSAT_SAT_SOLVER: PysatSolver,
+}
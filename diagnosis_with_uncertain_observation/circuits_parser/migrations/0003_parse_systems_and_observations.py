@@ -1,15 +1,111 @@
 import glob
+import itertools
+import re
+from concurrent.futures import ProcessPoolExecutor
 
 from django.db import migrations
 
-from ..consts import SYS_FILE_EXTENSION, OBS_FILE_EXTENSION
-from diagnosis_with_uncertain_observation.circuits_parser.config import DATA_SYSTEMS_DIR, DATA_OBSERVATIONS_DIR
-from ..api import parse_system, parse_observations
+from ..consts import SYS_FILE_EXTENSION, OBS_FILE_EXTENSION, INPUT_PREFIX, OUTPUT_PREFIX
+from ..config import DATA_SYSTEMS_DIR, DATA_OBSERVATIONS_DIR, PARSING_WORKERS
+
+# The data files are read and inserted by a frozen copy of the parsing code of the models (System.read_file,
+# System.create_parsed, Observation.read_file and Observation.create_parsed) as they were at this migration,
+# so a fresh DB is migrated with the historical models whatever the current models are.
+COMPONENT_NAME_FORMAT = r'(\D+)(\d*)'
+OBSERVATION_FORMAT = r'\((.+),(.+),(\[.+\])\)\.'
+IO_VALUE_FORMAT = r'(\-?)([io]\d+)'
+
+
+def read_until(f, ending='.') -> list[str]:
+    """ Reads lines from a file until meets the given ending """
+    line = f.readline().rstrip('\n')
+    lines = [line]
+    while line and not line.endswith(ending):
+        line = f.readline().rstrip('\n')
+        lines.append(line)
+    return lines
+
+
+def string_list_to_list(s) -> list[str]:
+    """ Converts string in list format to real list (e.g. '[i1,i2,i3].' -> ['i1', 'i2', 'i3']) """
+    return s.strip('[],.()').split(',')
+
+
+def read_system_file(filepath) -> tuple[str, list[str], list[str], list[list[str]]]:
+    """ Reads a .sys file into (system name, inputs names, outputs names, raw gates) """
+    with open(filepath) as f:
+        sys_name = f.readline().rstrip('\n')[:-1]  # remove '.' at the end of id line
+        inputs_names = list(itertools.chain(*map(string_list_to_list, read_until(f))))
+        outputs_names = list(itertools.chain(*map(string_list_to_list, read_until(f))))
+        raw_gates = list(map(string_list_to_list, read_until(f)))
+    return sys_name, inputs_names, outputs_names, raw_gates
+
+
+def read_observations_file(filepath) -> list[tuple[str, str, list[tuple[str, bool]]]]:
+    """ Reads a .obs file into (system name, observation name, observed IO values) per observation """
+    observations = []
+    with open(filepath) as f:
+        while obs_str := ''.join(read_until(f)):
+            system_name, obs_name, io_values = re.match(OBSERVATION_FORMAT, obs_str).groups()
+            values = []
+            for io_val in string_list_to_list(io_values):
+                false_sign, io_name = re.match(IO_VALUE_FORMAT, io_val).groups()
+                values.append((io_name, not false_sign))
+            observations.append((system_name, obs_name, values))
+    return observations
+
+
+def read_files(read_file, filepaths) -> list:
+    """ Reads the files in a process pool (the readers use no DB, so only this process writes) """
+    with ProcessPoolExecutor(max_workers=PARSING_WORKERS) as executor:
+        return list(executor.map(read_file, filepaths))
 
 
 def load_systems_from_dir(apps, schema_editor):
-    for filepath in glob.glob(pathname=fr'{DATA_SYSTEMS_DIR}/*.{SYS_FILE_EXTENSION}'):
-        parse_system(filepath)
+    System = apps.get_model("circuits_parser", "System")
+    IO = apps.get_model("circuits_parser", "IO")
+    Gate = apps.get_model("circuits_parser", "Gate")
+    Component = apps.get_model("circuits_parser", "Component")
+    OperatorType = apps.get_model("circuits_parser", "OperatorType")
+
+    operator_types = {operator_type.name: operator_type for operator_type in OperatorType.objects.all()}
+    components = {
+        (component.operator_type.name, component.inputs_num): component
+        for component in Component.objects.select_related('operator_type')
+    }
+
+    def component_of(logical_type_name):
+        op_name, inputs_num_str = re.match(COMPONENT_NAME_FORMAT, logical_type_name).groups()
+        component_type = (op_name, int(inputs_num_str) if inputs_num_str else 1)
+        if component_type not in components:
+            components[component_type] = Component.objects.create(operator_type=operator_types[op_name],
+                                                                  inputs_num=component_type[1])
+        return components[component_type]
+
+    filepaths = glob.glob(pathname=fr'{DATA_SYSTEMS_DIR}/*.{SYS_FILE_EXTENSION}')
+    for sys_name, inputs_names, outputs_names, raw_gates in read_files(read_system_file, filepaths):
+        # every net gets a single IO, in the order the nets appear in the file
+        ios = {}  # key: net name, value: IO
+        for name in [*inputs_names, *outputs_names, *(output_name for _, _, output_name, *_ in raw_gates)]:
+            ios.setdefault(name, IO(name=name))
+        system = System.objects.create(name=sys_name)
+        IO.objects.bulk_create(ios.values())
+        gates = Gate.objects.bulk_create([
+            Gate(serial_num=i, logical_type=component_of(logical_type_name), name=gate_name, output=ios[output_name])
+            for i, (logical_type_name, gate_name, output_name, *_) in enumerate(raw_gates)
+        ])
+        Gate.inputs.through.objects.bulk_create([
+            Gate.inputs.through(gate_id=gate.pk, io_id=ios[input_name].pk)
+            for gate, (_, _, _, *inputs_names) in zip(gates, raw_gates)
+            for input_name in dict.fromkeys(inputs_names)
+        ])
+        for relation, names in ((System.inputs, inputs_names), (System.outputs, outputs_names)):
+            relation.through.objects.bulk_create(
+                [relation.through(system_id=system.pk, io_id=ios[name].pk) for name in dict.fromkeys(names)]
+            )
+        System.gates.through.objects.bulk_create(
+            [System.gates.through(system_id=system.pk, gate_id=gate.pk) for gate in gates]
+        )
 
 
 def delete_systems(apps, schema_editor):
@@ -18,8 +114,28 @@ def delete_systems(apps, schema_editor):
 
 
 def load_observations_from_dir(apps, schema_editor):
-    for filepath in glob.glob(pathname=fr'{DATA_OBSERVATIONS_DIR}/*.{OBS_FILE_EXTENSION}'):
-        parse_observations(filepath)
+    System = apps.get_model("circuits_parser", "System")
+    Observation = apps.get_model("circuits_parser", "Observation")
+    IO = apps.get_model("circuits_parser", "IO")
+
+    systems = {system.name: system for system in System.objects.all()}
+    filepaths = glob.glob(pathname=fr'{DATA_OBSERVATIONS_DIR}/*.{OBS_FILE_EXTENSION}')
+    for observations in read_files(read_observations_file, filepaths):
+        observation_objs = Observation.objects.bulk_create(
+            [Observation(system=systems[system_name], obs_name=obs_name) for system_name, obs_name, _ in observations]
+        )
+        obs_ios = [
+            (obs, IO(name=io_name, value=value))
+            for obs, (_, _, io_values) in zip(observation_objs, observations)
+            for io_name, value in io_values
+            if io_name.startswith((INPUT_PREFIX, OUTPUT_PREFIX))
+        ]
+        IO.objects.bulk_create([io for _, io in obs_ios])
+        for relation, prefix in ((Observation.inputs, INPUT_PREFIX), (Observation.outputs, OUTPUT_PREFIX)):
+            relation.through.objects.bulk_create([
+                relation.through(observation_id=obs.pk, io_id=io.pk)
+                for obs, io in obs_ios if io.name.startswith(prefix)
+            ])
 
 
 def delete_observations(apps, schema_editor):
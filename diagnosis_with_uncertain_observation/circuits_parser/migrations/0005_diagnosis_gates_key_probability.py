@@ -0,0 +1,62 @@
+from functools import reduce
+
+from django.db import migrations, models
+
+from ..config import SINGLE_GATE_FAULTY_PROB, SINGLE_OUTPUT_CERTAINTY_PROB, SINGLE_OUTPUT_UNCERTAINTY_PROB, \
+    BULK_CREATE_BATCH_SIZE
+
+GATES_KEY_SEPARATOR = ','
+UNCERTAIN_OBS_NAME_PREFIX = 'u'
+
+
+def uncertain_observation_p(Observation, uncertain_obs):
+    """ The same as UncertainObservation.p, over the historical models """
+    original_obs = Observation.objects.get(system_id=uncertain_obs.system_id,
+                                           obs_name=uncertain_obs.obs_name.lstrip(UNCERTAIN_OBS_NAME_PREFIX))
+    original_outputs = {io.name: io.value for io in original_obs.outputs.all()}
+    output_probs = map(
+        lambda uncertain_output:
+            SINGLE_OUTPUT_CERTAINTY_PROB
+            if uncertain_output.value == original_outputs[uncertain_output.name]
+            else SINGLE_OUTPUT_UNCERTAINTY_PROB,
+        uncertain_obs.outputs.all()
+    )
+    return reduce(lambda a, b: a * b, output_probs)
+
+
+def fill_gates_keys_and_probabilities(apps, schema_editor):
+    Diagnosis = apps.get_model('circuits_parser', 'Diagnosis')
+    Observation = apps.get_model('circuits_parser', 'Observation')
+
+    uncertain_obs_probs = {}  # key: uncertain observation pk, value: its probability
+    diagnoses = list(Diagnosis.objects.select_related('uncertain_observation').prefetch_related('invalid_gates'))
+    for diagnosis in diagnoses:
+        uncertain_obs = diagnosis.uncertain_observation
+        if uncertain_obs.pk not in uncertain_obs_probs:
+            uncertain_obs_probs[uncertain_obs.pk] = uncertain_observation_p(Observation, uncertain_obs)
+        invalid_gates_pks = sorted(gate.pk for gate in diagnosis.invalid_gates.all())
+        diagnosis.gates_key = GATES_KEY_SEPARATOR.join(map(str, invalid_gates_pks))
+        diagnosis.probability = \
+            (SINGLE_GATE_FAULTY_PROB ** len(invalid_gates_pks)) * uncertain_obs_probs[uncertain_obs.pk]
+    Diagnosis.objects.bulk_update(diagnoses, ['gates_key', 'probability'], batch_size=BULK_CREATE_BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('circuits_parser', '0004_add_uncertaion_observations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diagnosis',
+            name='gates_key',
+            field=models.CharField(db_index=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='diagnosis',
+            name='probability',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(fill_gates_keys_and_probabilities, migrations.RunPython.noop),
+    ]
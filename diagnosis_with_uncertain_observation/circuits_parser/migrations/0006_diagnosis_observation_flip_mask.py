@@ -0,0 +1,51 @@
+from django.db import migrations, models
+
+UNCERTAIN_OBS_NAME_PREFIX = 'u'
+
+
+def move_diagnoses_to_parent_observations(apps, schema_editor):
+    """ The uncertain observations were saved as observations with their own output IOs.
+    Now their diagnoses refer to the parent observation with the mask of the flipped outputs
+    (in the order of the outputs names), and the uncertain observations rows are deleted.
+    """
+    Diagnosis = apps.get_model('circuits_parser', 'Diagnosis')
+    Observation = apps.get_model('circuits_parser', 'Observation')
+    IO = apps.get_model('circuits_parser', 'IO')
+
+    uncertain_observations = Observation.objects.filter(obs_name__startswith=UNCERTAIN_OBS_NAME_PREFIX)
+    parents = {
+        (obs.system_id, obs.obs_name): obs
+        for obs in Observation.objects.exclude(obs_name__startswith=UNCERTAIN_OBS_NAME_PREFIX)
+        .prefetch_related('outputs')
+    }
+    for uncertain_obs in uncertain_observations.prefetch_related('outputs'):
+        parent = parents[(uncertain_obs.system_id, uncertain_obs.obs_name.lstrip(UNCERTAIN_OBS_NAME_PREFIX))]
+        uncertain_outputs = {io.name: io.value for io in uncertain_obs.outputs.all()}
+        parent_outputs = sorted(parent.outputs.all(), key=lambda io: io.name)
+        flip_mask = sum(1 << i for i, io in enumerate(parent_outputs) if uncertain_outputs[io.name] != io.value)
+        Diagnosis.objects.filter(observation=uncertain_obs).update(observation=parent, flip_mask=format(flip_mask, 'x'))
+
+    # the rows to delete are selected by subqueries, rather than by lists of their pks
+    IO.objects.filter(observation_output__in=uncertain_observations).delete()
+    uncertain_observations.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('circuits_parser', '0005_diagnosis_gates_key_probability'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='diagnosis',
+            old_name='uncertain_observation',
+            new_name='observation',
+        ),
+        migrations.AddField(
+            model_name='diagnosis',
+            name='flip_mask',
+            field=models.CharField(default='0', max_length=64),
+        ),
+        migrations.RunPython(move_diagnoses_to_parent_observations, migrations.RunPython.noop),
+    ]
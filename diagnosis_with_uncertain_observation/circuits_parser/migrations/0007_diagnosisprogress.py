@@ -0,0 +1,39 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+from ..config import BULK_CREATE_BATCH_SIZE
+
+
+def mark_diagnosed_observations(apps, schema_editor):
+    """ The observations that already have diagnoses were diagnosed by complete runs """
+    Observation = apps.get_model('circuits_parser', 'Observation')
+    DiagnosisProgress = apps.get_model('circuits_parser', 'DiagnosisProgress')
+    DiagnosisProgress.objects.bulk_create(
+        [
+            DiagnosisProgress(observation_id=obs_pk)
+            for obs_pk in Observation.objects.filter(diagnosis__isnull=False).distinct().values_list('pk', flat=True)
+        ],
+        batch_size=BULK_CREATE_BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('circuits_parser', '0006_diagnosis_observation_flip_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiagnosisProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_time', models.FloatField(default=0)),
+                ('completed_at', models.DateTimeField(auto_now_add=True)),
+                ('observation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE,
+                                                     related_name='diagnosis_progress',
+                                                     to='circuits_parser.observation')),
+            ],
+        ),
+        migrations.RunPython(mark_diagnosed_observations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """ The fault state of the gates is an argument of the simulations, and is never stored in the DB """
+
+    dependencies = [
+        ('circuits_parser', '0007_diagnosisprogress'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='gate',
+            name='is_healthy',
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """ The systems that were parsed before get their structure hash when they are first compiled
+    (see CompiledCircuit.for_system)
+    """
+
+    dependencies = [
+        ('circuits_parser', '0008_remove_gate_is_healthy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='system',
+            name='structure_sha256',
+            field=models.CharField(max_length=64, null=True),
+        ),
+    ]
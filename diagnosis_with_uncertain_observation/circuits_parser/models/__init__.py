@@ -5,4 +5,5 @@ from .observation import Observation
 from .operators import OperatorType
 from .system import System
 from .diagnosis import Diagnosis
+from .diagnosis_progress import DiagnosisProgress
 from .uncertain_observation import UncertainObservation
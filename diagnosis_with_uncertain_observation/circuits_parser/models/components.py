@@ -32,13 +32,44 @@ class Component(models.Model):
         Returns:
             Component. New instance of cls generated from the provided args
         """
-        op_name, inputs_num_str = re.match(cls.NAME_FORMAT, name).groups()
-
-        inputs_num = int(inputs_num_str) if inputs_num_str \
-            else cls._meta.get_field('inputs_num').get_default()
-
+        op_name, inputs_num = cls.parse_name(name)
         obj, _ = cls.objects.get_or_create(
             operator_type=OperatorType.objects.get(name=op_name),
             inputs_num=inputs_num
         )
         return obj
+
+    @classmethod
+    def parse_all(cls, names) -> dict:
+        """ The same as parse for many names at once, with a constant number of queries.
+
+        Args:
+            names (Iterable[str]): full logic types as appear in .sys files
+
+        Returns:
+            dict[str: Component]. key: logic type name, value: its Component
+        """
+        types = {name: cls.parse_name(name) for name in names}  # value: (operator name, inputs num)
+        components = {
+            (component.operator_type.name, component.inputs_num): component
+            for component in cls.objects.select_related('operator_type')
+        }
+        operator_types = OperatorType.objects.in_bulk({op_name for op_name, _ in types.values()}, field_name='name')
+        new_types = sorted(set(types.values()) - components.keys())
+        new_components = cls.objects.bulk_create(
+            [cls(operator_type=operator_types[op_name], inputs_num=inputs_num) for op_name, inputs_num in new_types]
+        )
+        components.update(zip(new_types, new_components))
+        return {name: components[component_type] for name, component_type in types.items()}
+
+    @classmethod
+    def parse_name(cls, name) -> tuple[str, int]:
+        """ Splits a full logic type as appears in .sys files into its operator name and inputs number.
+        E.g.:
+            'nand2'     ->  ('nand', 2)
+            'inverter'  ->  ('inverter', 1)
+        """
+        op_name, inputs_num_str = re.match(cls.NAME_FORMAT, name).groups()
+        inputs_num = int(inputs_num_str) if inputs_num_str \
+            else cls._meta.get_field('inputs_num').get_default()
+        return op_name, inputs_num
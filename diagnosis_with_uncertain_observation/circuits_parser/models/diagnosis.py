@@ -1,36 +1,103 @@
-from django.db import models
+from django.db import models, transaction
 
+from .observation import Observation
 from .uncertain_observation import UncertainObservation
 from .gate import Gate
-from ..config import SINGLE_GATE_FAULTY_PROB
+from ..config import SINGLE_GATE_FAULTY_PROB, BULK_CREATE_BATCH_SIZE
 
 
 class Diagnosis(models.Model):
-    uncertain_observation = models.ForeignKey(UncertainObservation, on_delete=models.CASCADE, related_name='diagnosis')
+    # the diagnosis is of the uncertain observation of (observation, flip mask), see UncertainObservation
+    observation = models.ForeignKey(Observation, on_delete=models.CASCADE, related_name='diagnosis')
+    flip_mask = models.CharField(max_length=64, default='0')  # hex
     invalid_gates = models.ManyToManyField(Gate)
+    # canonical key of the set of invalid gates (their sorted pks), so similar diagnoses can be grouped in the DB
+    gates_key = models.CharField(max_length=255, db_index=True, default='')
+    probability = models.FloatField(default=0)
+
+    GATES_KEY_SEPARATOR = ','
 
     @staticmethod
     def save_diagnoses(uncertain_observation: UncertainObservation, diagnoses: tuple[list[Gate]]):
-        for diagnosis_gates in diagnoses:
-            diagnosis_obj = Diagnosis.objects.create(uncertain_observation=uncertain_observation)
-            diagnosis_obj.invalid_gates.add(*diagnosis_gates)
+        Diagnosis.save_uncertain_diagnoses({uncertain_observation: diagnoses})
+
+    @staticmethod
+    def save_uncertain_diagnoses(uncertain_diagnoses: dict[UncertainObservation, tuple[list[Gate]]]):
+        """ Saves the diagnoses of many uncertain observations with bulk inserts, in a single transaction.
+
+        Args:
+            uncertain_diagnoses: key: uncertain observation, value: its diagnoses (each as a list of gates)
+        """
+        Diagnosis.save_uncertain_diagnoses_pks({
+            uncertain_obs: [[gate.pk for gate in diagnosis_gates] for diagnosis_gates in diagnoses]
+            for uncertain_obs, diagnoses in uncertain_diagnoses.items()
+        })
+
+    @staticmethod
+    def save_uncertain_diagnoses_pks(uncertain_diagnoses: dict[UncertainObservation, list[list[int]]]):
+        """ The same as save_uncertain_diagnoses, where each diagnosis is a list of the pks of its gates """
+        obs_diagnoses = [
+            (uncertain_obs, diagnosis_gates)
+            for uncertain_obs, diagnoses in uncertain_diagnoses.items()
+            for diagnosis_gates in diagnoses
+        ]
+        # the probability of an uncertain observation is computed once for all of its diagnoses
+        uncertain_obs_probs = {
+            uncertain_obs: uncertain_obs.p for uncertain_obs, diagnoses in uncertain_diagnoses.items() if diagnoses
+        }
+        with transaction.atomic():
+            diagnosis_objs = Diagnosis.objects.bulk_create(
+                [
+                    Diagnosis(observation=uncertain_obs.parent,
+                              flip_mask=format(uncertain_obs.flip_mask, 'x'),
+                              gates_key=Diagnosis.gates_key_of_pks(diagnosis_gates),
+                              probability=Diagnosis.diagnosis_p(invalid_gates_num=len(diagnosis_gates),
+                                                                uncertain_obs_p=uncertain_obs_probs[uncertain_obs]))
+                    for uncertain_obs, diagnosis_gates in obs_diagnoses
+                ],
+                batch_size=BULK_CREATE_BATCH_SIZE
+            )
+            Diagnosis.invalid_gates.through.objects.bulk_create(
+                [
+                    Diagnosis.invalid_gates.through(diagnosis_id=diagnosis_obj.pk, gate_id=gate_pk)
+                    for diagnosis_obj, (_, diagnosis_gates) in zip(diagnosis_objs, obs_diagnoses)
+                    for gate_pk in diagnosis_gates
+                ],
+                batch_size=BULK_CREATE_BATCH_SIZE
+            )
+
+    @property
+    def uncertain_observation(self) -> UncertainObservation:
+        return UncertainObservation.of(self.observation, flip_mask=int(self.flip_mask, 16))
+
+    @staticmethod
+    def gates_key_of(gates) -> str:
+        """ Returns the canonical key of a set of gates, which is the same for any order of the gates """
+        return Diagnosis.gates_key_of_pks(gate.pk for gate in gates)
+
+    @staticmethod
+    def gates_key_of_pks(gates_pks) -> str:
+        """ The same as gates_key_of, by the pks of the gates """
+        return Diagnosis.GATES_KEY_SEPARATOR.join(map(str, sorted(gates_pks)))
+
+    @staticmethod
+    def gates_pks_of(gates_key: str) -> list[int]:
+        """ Returns the pks of the gates of the given canonical key (see gates_key_of) """
+        return list(map(int, gates_key.split(Diagnosis.GATES_KEY_SEPARATOR))) if gates_key else []
+
+    @staticmethod
+    def diagnosis_p(invalid_gates_num: int, uncertain_obs_p: float) -> float:
+        return (SINGLE_GATE_FAULTY_PROB ** invalid_gates_num) * uncertain_obs_p
 
     @property
     def p(self):
-        return (SINGLE_GATE_FAULTY_PROB ** self.invalid_gates.count()) * self.uncertain_observation.p
+        # the same as diagnosis_p of the invalid gates and the uncertain observation, which is saved with the diagnosis
+        return self.probability
 
     def all_similar_diagnoses(self):
         """ Returns all the diagnoses that similar to this one """
-        return filter(lambda d: d == self,
-                      Diagnosis.objects.filter(uncertain_observation__system=self.uncertain_observation.system))
+        return Diagnosis.objects.filter(observation__system=self.observation.system_id,
+                                        gates_key=self.gates_key)
 
     def invalid_gates_names(self):
         return list(map(lambda gate: gate.name, self.invalid_gates.all()))
-
-    def __eq__(self, other):
-        # diagnoses are equal if they relate to the same system and have the same set of invalid gates
-        return self.uncertain_observation.system == other.uncertain_observation.system and \
-            set(self.invalid_gates.all()) == set(other.invalid_gates.all())
-
-    def __hash__(self):
-        return hash((self.uncertain_observation.system, self.invalid_gates))
@@ -0,0 +1,13 @@
+from django.db import models
+
+from .observation import Observation
+
+
+class DiagnosisProgress(models.Model):
+    """ Marks an observation whose diagnoses were all saved by find_diagnosis (in the same transaction as its last
+    diagnoses), so a resumed run skips it, and the diagnoses of an observation without it are partial.
+    """
+    observation = models.OneToOneField(Observation, on_delete=models.CASCADE, related_name='diagnosis_progress')
+    # total run time of the searches on the observation
+    run_time = models.FloatField(default=0)
+    completed_at = models.DateTimeField(auto_now_add=True)
@@ -11,16 +11,13 @@ class Gate(models.Model):
     name = models.CharField(max_length=20)
     output = models.ForeignKey(IO, on_delete=models.CASCADE, related_name='output_gate')
     inputs = models.ManyToManyField(IO, related_name='input_gate')
-    is_healthy = models.BooleanField(default=True)
 
     @property
     def op(self):
         """ Usage:
                 self.op(*args) - activate the logic operation with any amount of inputs
         """
-        gate_op = self.logical_type.op
-        return gate_op if self.is_healthy \
-            else lambda *l: not gate_op(*l)
+        return self.logical_type.op
 
     @classmethod
     def parse_from_file(cls, lines: list[str]):
@@ -41,12 +38,20 @@ class Gate(models.Model):
         ))
         return gates_lists
 
-    def calc_output(self):
-        """ Calculates the output of the gate based on the provided inputs. """
-        inputs = self.inputs.all()
-        assert all(io.is_available() for io in inputs), \
+    def calc_output(self, values: dict[int, bool], is_faulty: bool = False) -> bool:
+        """ Calculates the output of the gate based on the provided inputs values, without saving anything.
+
+        Args:
+            values: key: IO pk, value: the value of the IO
+            is_faulty: whether to invert the operation of the gate (the fault state is never stored in the DB)
+
+        Returns:
+            bool. The value of the gate output
+        """
+        # the inputs are reduced in creation order
+        inputs = sorted(self.inputs.all(), key=lambda io: io.pk)
+        assert all(io.pk in values for io in inputs), \
             f'{self.name}: not all the inputs are available'
 
-        inputs_values = [io.value for io in inputs]
-        self.output.value = self.op(*inputs_values)
-        self.output.save()
+        output_value = self.logical_type.op(*[values[io.pk] for io in inputs])
+        return not output_value if is_faulty else output_value
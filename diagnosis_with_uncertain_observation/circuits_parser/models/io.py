@@ -43,11 +43,6 @@ class IO(models.Model):
     def is_available(self):
         return self.value is not None
 
-    def clear_value(self):
-        """ Clears the value of the IO """
-        self.value = None
-        self.save()
-
     def is_member(self, ios):
         return any(self == io for io in ios)
 
@@ -1,12 +1,20 @@
+import itertools
 import re
+import time
+from functools import cache, cached_property
 
-from django.db import models
+from django.db import models, transaction
 
 from .gate import Gate
 from .io import IO
 from .system import System
-from ..config import MAX_FAULTY_COMPONENTS
-from ..utils import read_until, string_list_to_list, is_superset, remove_subset
+from ..config import MAX_FAULTY_COMPONENTS, SIMULATION_MODE, DIAGNOSIS_ENGINE, BULK_CREATE_BATCH_SIZE
+from ..consts import ORM_SIMULATION, BIT_PARALLEL_SIMULATION, INCREMENTAL_SIMULATION, BFS_ENGINE
+from ..engines import engines
+from ..simulation import BitParallelSimulator, IncrementalSimulator
+from ..subset_index import SubsetIndex
+from ..tracing import tracer
+from ..utils import read_until, string_list_to_list, mask_indices, minimal_masks
 
 
 class Observation(models.Model):
@@ -25,101 +33,367 @@ class Observation(models.Model):
         Args:
             filepath (str): .obs file path
         """
+        return cls.create_parsed(cls.read_file(filepath))
+
+    @classmethod
+    def read_file(cls, filepath) -> list[tuple[str, str, list[tuple[str, bool]]]]:
+        """ Reads a .obs file into plain data, without any DB access.
+
+        Args:
+            filepath (str): .obs file path
+
+        Returns:
+            list[tuple[str, str, list[tuple[str, bool]]]]. (system name, observation name, observed IO values) per
+                                                           observation (e.g. [('c17', '1', [('i1', False), ...]), ...])
+        """
+        observations = []
         with open(filepath) as f:
             while obs_str := ''.join(read_until(f)):
                 system_name, obs_name, io_values = re.match(cls.OBSERVATION_FORMAT, obs_str).groups()
-                inputs_ios, outputs_ios = cls.__parse_io_values(io_values)
-                obs = cls.objects.create(system=System.objects.get(name=system_name),
-                                         obs_name=obs_name)
-                obs.inputs.add(*inputs_ios)
-                obs.outputs.add(*outputs_ios)
+                observations.append((system_name, obs_name, cls.__parse_io_values(io_values)))
+        return observations
 
     @classmethod
-    def __parse_io_values(cls, io_values: str):
-        """ Creates 2 separated lists of IO inputs and IO outputs with their observed boolean values.
+    def __parse_io_values(cls, io_values: str) -> list[tuple[str, bool]]:
+        """ Parses the observed IO values.
 
         Args:
             io_values: string of all the input and output values as appears in the .obs files
 
         Returns:
-            (list[IO], list[IO]). Tuple of (list of input IOs, list of output IOs)
+            list[tuple[str, bool]]. (IO name, observed boolean value) of every IO, in the order of the file
         """
         io_values_list: list[str] = string_list_to_list(io_values)
-        inputs, outputs = [], []
+        values = []
         for io_val in io_values_list:
             false_sign, io_name = re.match(cls.IO_VALUE_FORMAT, io_val).groups()
-            bool_val = not false_sign
-            io = IO.objects.create(name=io_name, value=bool_val)
-            if IO.is_input(io_name):
-                inputs.append(io)
-            elif IO.is_output(io_name):
-                outputs.append(io)
-        return inputs, outputs
+            values.append((io_name, not false_sign))
+        return values
+
+    @classmethod
+    def create_parsed(cls, observations: list[tuple[str, str, list[tuple[str, bool]]]]) -> list['Observation']:
+        """ Creates the Observations from the data of their .obs file (see read_file) with bulk inserts,
+        in a single transaction. The systems of the observations must already exist.
+
+        Returns:
+            list[Observation]. The new observations
+        """
+        systems = System.objects.in_bulk({system_name for system_name, *_ in observations}, field_name='name')
+        with transaction.atomic():
+            observation_objs = cls.objects.bulk_create(
+                [cls(system=systems[system_name], obs_name=obs_name) for system_name, obs_name, _ in observations],
+                batch_size=BULK_CREATE_BATCH_SIZE
+            )
+            obs_ios = [
+                (obs, IO(name=io_name, value=value))
+                for obs, (_, _, io_values) in zip(observation_objs, observations)
+                for io_name, value in io_values
+                if IO.is_input(io_name) or IO.is_output(io_name)
+            ]
+            IO.objects.bulk_create([io for _, io in obs_ios], batch_size=BULK_CREATE_BATCH_SIZE)
+            for relation, is_relation_io in ((cls.inputs, IO.is_input), (cls.outputs, IO.is_output)):
+                relation.through.objects.bulk_create(
+                    [
+                        relation.through(observation_id=obs.pk, io_id=io.pk)
+                        for obs, io in obs_ios if is_relation_io(io.name)
+                    ],
+                    batch_size=BULK_CREATE_BATCH_SIZE
+                )
+        return observation_objs
+
+    def input_ios(self):
+        """ Returns the IOs of the observed inputs """
+        return self.inputs.all()
+
+    def output_ios(self):
+        """ Returns the IOs of the observed outputs """
+        return self.outputs.all()
 
     @property
     def prediction(self):
-        return self.system.predict_output(inputs=self.inputs.all())
+        return self.system.predict_output(inputs=self.input_ios())
+
+    @cached_property
+    def input_vector(self) -> list[bool]:
+        """ The observed inputs values, ordered as the compiled circuit of the system expects them """
+        return self.system.compiled.input_vector({io.name: io.value for io in self.input_ios()})
+
+    @cached_property
+    def output_vector(self) -> tuple[bool]:
+        """ The observed outputs values, ordered as the compiled circuit of the system predicts them """
+        return self.system.compiled.output_vector({io.name: io.value for io in self.output_ios()})
+
+    @cached_property
+    def incremental_simulator(self) -> IncrementalSimulator:
+        """ Simulator of the system that caches the healthy simulation of the observed inputs """
+        return IncrementalSimulator(self.system.compiled, self.input_vector)
+
+    @cached_property
+    def discrepant_outputs(self) -> int:
+        """ Mask of the outputs whose observed value differs from the prediction of the healthy system
+        (see CompiledCircuit.reachable_outputs)
+        """
+        circuit = self.system.compiled
+        return circuit.discrepant_outputs_mask(self.predict_faulty(frozenset()), self.output_vector)
+
+    def covers_discrepancies(self, candidate: int) -> bool:
+        """ A gate can explain a wrong output only if the output is in its fan-out,
+        so a candidate (mask of gate indices) can be a diagnosis only if its gates reach all the discrepant outputs.
+        """
+        circuit = self.system.compiled
+        return self.discrepant_outputs & ~circuit.reachable_outputs_mask(mask_indices(candidate)) == 0
+
+    def diagnose(self, engine: str = DIAGNOSIS_ENGINE) -> tuple[list[Gate]]:
+        """ Looks for the minimal diagnoses of the observation (with at most MAX_FAULTY_COMPONENTS gates).
+
+        Args:
+            engine: name of the diagnosis engine to search with (BFS_ENGINE or one of engines.engines)
+
+        Returns:
+            tuple[list[Gate]]. The diagnoses, each as a list of its faulty gates
+        """
+        if engine == BFS_ENGINE:
+            return self.find_diagnoses()
+        return self.gates_of(engines[engine](self, MAX_FAULTY_COMPONENTS))
+
+    def gates_of(self, fault_sets: list[frozenset[int]]) -> tuple[list[Gate]]:
+        """ Converts sets of gate indices (in the compiled circuit of the system) to lists of Gates """
+        circuit = self.system.compiled
+        gates = self.system.gates.in_bulk(circuit.gate_keys)
+        return tuple([gates[circuit.gate_keys[i]] for i in sorted(fault_set)] for fault_set in fault_sets)
+
+    def gates_of_many(self, keys_fault_sets: dict) -> dict:
+        """ The same as gates_of for many lists of fault sets at once, with a single query.
+
+        Args:
+            keys_fault_sets: dict[Any: list[frozenset[int]]]. Lists of sets of gate indices, by any keys
+
+        Returns:
+            dict[Any: tuple[list[Gate]]]. The lists as lists of Gates, by the same keys
+        """
+        diagnoses_gates = iter(self.gates_of([fault_set for fault_sets in keys_fault_sets.values()
+                                              for fault_set in fault_sets]))
+        return {key: tuple(itertools.islice(diagnoses_gates, len(fault_sets)))
+                for key, fault_sets in keys_fault_sets.items()}
+
+    def find_diagnoses(self) -> tuple[list[Gate]]:
+        """ Looks for the minimal diagnoses of the observation by BFS over the sets of faulty gates """
+        return self.gates_of(list(map(mask_indices, self.find_diagnoses_masks())))
+
+    def find_diagnoses_masks(self) -> list[int]:
+        """ BFS over candidates represented as masks of gate indices (bit i stands for the gate in position i).
+        A candidate is expanded only by gates above its highest one, so each candidate is generated exactly once.
+
+        Returns:
+            list[int]. The diagnoses masks
+        """
+        gates_num = self.system.compiled.gates_num
+        memo = self.system.compiled.prediction_memo
+        diagnoses: list[int] = []
+        diagnoses_index = SubsetIndex()
 
-    def find_diagnoses(self, candidates: list[list[Gate]] = None, diagnoses: tuple[list[Gate]] = ()):
         # initialize each candidate with a single gate
-        if candidates is None:
-            candidates = [[gate] for gate in self.system.gates.all()]
-        # no more candidates, so the diagnoses are ready
-        if len(candidates) == 0:
-            return diagnoses
-
-        # check whether some candidates are diagnoses
-        new_diagnoses = tuple(filter(self.is_diagnosis, candidates))
-        diagnoses += new_diagnoses
-        # remove the new diagnoses from candidates
-        remove_subset(superset=candidates, subset=new_diagnoses)
-
-        # update the candidates by adding more gates
-        new_candidates = []
-        for candidate in candidates:
-            optional_gates: set[Gate] = set(self.system.gates.all()) - set(candidate)
-            expanded_candidate: list[list[Gate]] = [
-                candidate + [gate]
-                for gate in optional_gates
-                if len(candidate) < MAX_FAULTY_COMPONENTS and
-                   not self.is_diagnosis_superset(candidate + [gate], diagnoses)
+        candidates = [
+            1 << i for i in range(gates_num)
+            if MAX_FAULTY_COMPONENTS > 1 or self.covers_discrepancies(1 << i)
+        ]
+        # counters of the candidates of the layer, before they are checked (see tracing.py)
+        generated, deduplicated, pruned_superset, pruned_uncovered = gates_num, 0, 0, gates_num - len(candidates)
+        layer = 1
+        while candidates:
+            layer_start, memo_hits = time.perf_counter(), memo.hits
+            # check whether some candidates are diagnoses (only those that can explain all the discrepant outputs)
+            covering_candidates = list(filter(self.covers_discrepancies, candidates))
+            simulation_start = time.perf_counter()
+            new_diagnoses = self.filter_diagnoses(covering_candidates)
+            simulation_seconds = time.perf_counter() - simulation_start
+            diagnoses += new_diagnoses
+            for diagnosis in new_diagnoses:
+                diagnoses_index.add(mask_indices(diagnosis))
+            new_diagnoses = set(new_diagnoses)
+
+            # update the candidates by adding more gates
+            children = [
+                candidate | (1 << i)
+                for candidate in candidates
+                if candidate not in new_diagnoses and candidate.bit_count() < MAX_FAULTY_COMPONENTS
+                for i in range(candidate.bit_length(), gates_num)
+            ]
+            minimal_children = [child for child in children if not self.is_diagnosis_superset(child, diagnoses_index)]
+            next_candidates = [
+                child for child in minimal_children
+                # the candidates of the last layer are not expanded, so they must explain all the discrepancies
+                if child.bit_count() < MAX_FAULTY_COMPONENTS or self.covers_discrepancies(child)
             ]
-            if expanded_candidate:
-                new_candidates += expanded_candidate
-        candidates = self.distinct_candidates(new_candidates)
 
-        # recursive call
-        return self.find_diagnoses(candidates, diagnoses)
+            if tracer.enabled:
+                tracer.emit('bfs_layer', system=self.system.name, observation=self.obs_name, layer=layer,
+                            generated=generated, deduplicated=deduplicated, pruned_superset=pruned_superset,
+                            pruned_uncovered=pruned_uncovered + len(candidates) - len(covering_candidates),
+                            checked=len(covering_candidates), memo_hits=memo.hits - memo_hits,
+                            accepted=len(new_diagnoses), simulation_seconds=simulation_seconds,
+                            bookkeeping_seconds=time.perf_counter() - layer_start - simulation_seconds)
+            generated, pruned_superset, pruned_uncovered = \
+                len(children), len(children) - len(minimal_children), len(minimal_children) - len(next_candidates)
+            # a child is generated only from its subset without its highest gate, so there is nothing to de-duplicate;
+            # the repeated children are counted only when traced, as a check of that
+            deduplicated = len(children) - len(set(children)) if tracer.enabled else 0
+            candidates = next_candidates
+            layer += 1
+        return diagnoses
 
-    def is_diagnosis(self, candidate: list[Gate]):
-        # invert the operation of the gates in the candidate
-        for gate in candidate:
-            gate.is_healthy = False
-            gate.save()
+    def find_uncertain_diagnoses(self, uncertain_observations: list['Observation'], predictions: dict = None) -> dict:
+        """ Looks for the diagnoses of all the uncertain observations of this observation in a single search.
+        Whether a candidate is a diagnosis depends only on the output vector it predicts, so each candidate is
+        simulated once and assigned to the uncertain observation that has the predicted outputs.
+        The diagnoses of each uncertain observation are the same as its own find_diagnoses would find
+        (minimal, and with at most MAX_FAULTY_COMPONENTS gates).
+        As in find_diagnoses_masks, a candidate is simulated only if its gates reach all the discrepant outputs of
+        at least one of the uncertain observations.
 
-        # predict the output of the system with this observation using the same system with inverted gates
-        new_outputs = self.prediction
+        Args:
+            uncertain_observations: observations with the same inputs as this one (and any outputs),
+                                    e.g. the uncertain observations of this observation
+            predictions: dict[int: tuple[bool]]. The output vectors that candidates (masks of gate indices) predict
+                         with the inputs of this observation, from former searches. They are not predicted again, and
+                         the predictions of this search are added to it (e.g. by the rounds of engines/sampling.py)
 
-        # revert the system to it's original state
-        for gate in candidate:
-            gate.is_healthy = True
-            gate.save()
+        Returns:
+            dict[Observation: tuple[list[Gate]]]. The diagnoses of each of the uncertain observations
+        """
+        if not uncertain_observations:
+            return {}
 
-        # compare this prediction with the observed output
-        assert len(new_outputs) == len(self.outputs.all())
-        return all(obs_output.is_member(new_outputs) for obs_output in self.outputs.all())
+        observations_by_outputs = {obs.output_vector: obs for obs in uncertain_observations}
+        diagnoses = {obs: [] for obs in uncertain_observations}  # value: diagnoses masks
+        diagnoses_indices = {obs: SubsetIndex() for obs in uncertain_observations}
 
-    @staticmethod
-    def is_diagnosis_superset(candidate: list[Gate], diagnoses: list[list[Gate]]):
-        return any(
-            is_superset(superset=candidate, subset=diagnosis)
-            for diagnosis in diagnoses
-        )
+        circuit = self.system.compiled
+        healthy_prediction = self.predict_faulty(frozenset())
+        discrepancies = minimal_masks(circuit.discrepant_outputs_mask(healthy_prediction, obs.output_vector)
+                                      for obs in uncertain_observations)
+
+        @cache  # the candidates reach a few distinct sets of outputs
+        def covers_some_discrepancies(reachable_outputs: int) -> bool:
+            return any(discrepancy & ~reachable_outputs == 0 for discrepancy in discrepancies)
+
+        gates_num = circuit.gates_num
+        gates_reachable_outputs = circuit.reachable_outputs
+        memo = circuit.prediction_memo
+        # key: candidate, value: mask of the outputs that its gates can reach (extended with each added gate)
+        candidates = {
+            1 << i: gates_reachable_outputs[i] for i in range(gates_num)
+            if MAX_FAULTY_COMPONENTS > 1 or covers_some_discrepancies(gates_reachable_outputs[i])
+        }
+        # counters of the candidates of the layer, before they are checked (see tracing.py)
+        generated, pruned_uncovered = gates_num, gates_num - len(candidates)
+        layer = 1
+        while candidates:
+            layer_start, memo_hits = time.perf_counter(), memo.hits
+            # an uncovered candidate predicts the outputs of no uncertain observation, but its children may
+            # (the candidates of the last layer are pruned when they are generated)
+            covering_candidates = list(candidates) if layer == MAX_FAULTY_COMPONENTS else [
+                candidate for candidate, reachable_outputs in candidates.items()
+                if covers_some_discrepancies(reachable_outputs)
+            ]
+            simulation_start = time.perf_counter()
+            if predictions is None:
+                layer_predictions = self.predict_fault_sets(list(map(mask_indices, covering_candidates)))
+            else:
+                new_candidates = [candidate for candidate in covering_candidates if candidate not in predictions]
+                new_predictions = self.predict_fault_sets(list(map(mask_indices, new_candidates)))
+                predictions.update(zip(new_candidates, new_predictions))
+                layer_predictions = [predictions[candidate] for candidate in covering_candidates]
+            simulation_seconds = time.perf_counter() - simulation_start
+            unobserved, pruned_superset = 0, 0
+            for candidate, prediction in zip(covering_candidates, layer_predictions):
+                obs = observations_by_outputs.get(prediction)
+                if obs is None:
+                    unobserved += 1
+                # a diagnosis of another uncertain observation can not prune the candidate, so only the
+                # diagnoses of the uncertain observation it explains are checked
+                elif self.is_diagnosis_superset(candidate, diagnoses_indices[obs]):
+                    pruned_superset += 1
+                else:
+                    diagnoses[obs].append(candidate)
+                    diagnoses_indices[obs].add(mask_indices(candidate))
+
+            if tracer.enabled:
+                tracer.emit('shared_bfs_layer', system=self.system.name, observation=self.obs_name, layer=layer,
+                            generated=generated, pruned_uncovered=pruned_uncovered + len(candidates) -
+                            len(covering_candidates), checked=len(covering_candidates),
+                            memo_hits=memo.hits - memo_hits, unobserved=unobserved, pruned_superset=pruned_superset,
+                            accepted=len(covering_candidates) - unobserved - pruned_superset,
+                            simulation_seconds=simulation_seconds,
+                            bookkeeping_seconds=time.perf_counter() - layer_start - simulation_seconds)
+            if layer == MAX_FAULTY_COMPONENTS:
+                break
+            generated = sum(gates_num - candidate.bit_length() for candidate in candidates)
+            candidates = {
+                candidate | (1 << i): reachable_outputs | gates_reachable_outputs[i]
+                for candidate, reachable_outputs in candidates.items()
+                for i in range(candidate.bit_length(), gates_num)
+                # the candidates of the last layer are not expanded, so they must explain some discrepancies
+                if layer + 1 < MAX_FAULTY_COMPONENTS or covers_some_discrepancies(
+                    reachable_outputs | gates_reachable_outputs[i])
+            }
+            pruned_uncovered = generated - len(candidates)
+            layer += 1
+        return self.gates_of_many({
+            obs: list(map(mask_indices, obs_diagnoses)) for obs, obs_diagnoses in diagnoses.items()
+        })
+
+    def predict_fault_sets(self, fault_sets: list[frozenset[int]]) -> list[tuple[bool]]:
+        """ Returns the output vector that the observation inputs produce with each set of faulty gates indices """
+        return self.system.compiled.prediction_memo.predict_many(self.input_vector, fault_sets,
+                                                                 predict=self.__simulate_fault_sets)
+
+    def predict_faulty(self, faulty: frozenset[int]) -> tuple[bool]:
+        """ Returns the output vector that the observation inputs produce with the given faulty gates indices """
+        return self.system.compiled.prediction_memo.predict(self.input_vector, faulty, predict=self.__simulate_faulty)
+
+    def __simulate_fault_sets(self, fault_sets: list[frozenset[int]]) -> list[tuple[bool]]:
+        if SIMULATION_MODE == BIT_PARALLEL_SIMULATION:
+            return BitParallelSimulator(self.system.compiled).predict_candidates(self.input_vector, fault_sets)
+        return list(map(self.__simulate_faulty, fault_sets))
+
+    def __simulate_faulty(self, faulty: frozenset[int]) -> tuple[bool]:
+        if SIMULATION_MODE == ORM_SIMULATION:
+            # propagate the values through the gates as they are stored in the DB
+            outputs = self.system.predict_output(inputs=self.input_ios(), faulty_gates=self.gates_of([faulty])[0],
+                                                 in_memory=False)
+            return self.system.compiled.output_vector({io.name: io.value for io in outputs})
+        if SIMULATION_MODE == INCREMENTAL_SIMULATION:
+            return self.incremental_simulator.predict(faulty)
+        return self.system.compiled.predict(self.input_vector, faulty)
+
+    def filter_diagnoses(self, candidates: list[int]) -> list[int]:
+        """ Returns the candidates (masks of gate indices) that are diagnoses of the observation """
+        if SIMULATION_MODE == ORM_SIMULATION:
+            candidates_gates = self.gates_of(list(map(mask_indices, candidates)))
+            return [
+                candidate for candidate, candidate_gates in zip(candidates, candidates_gates)
+                if self.is_diagnosis(candidate_gates)
+            ]
+
+        # the candidates that are not memoized are simulated together (in batches, in bit-parallel simulation)
+        predictions = self.predict_fault_sets(list(map(mask_indices, candidates)))
+        return [candidate for candidate, prediction in zip(candidates, predictions) if prediction == self.output_vector]
+
+    def is_diagnosis(self, candidate: list[Gate]):
+        if SIMULATION_MODE != ORM_SIMULATION:
+            # simulate the compiled circuit with the candidate gates inverted, without touching the DB
+            return self.predict_faulty(self.system.compiled.gate_indices(candidate)) == self.output_vector
+
+        # predict the output of the system with this observation, with the operation of the candidate gates inverted
+        new_outputs = self.system.predict_output(inputs=self.input_ios(), faulty_gates=candidate, in_memory=False)
+
+        # compare this prediction with the observed output
+        obs_outputs = list(self.output_ios())
+        assert len(new_outputs) == len(obs_outputs)
+        return all(obs_output.is_member(new_outputs) for obs_output in obs_outputs)
 
     @staticmethod
-    def distinct_candidates(candidates: list[list[Gate]]):
-        distinct: list[list[Gate]] = []
-        for candidate in candidates:
-            if set(candidate) not in list(map(set, distinct)):
-                distinct.append(candidate)
-        return distinct
+    def is_diagnosis_superset(candidate: int, diagnoses: SubsetIndex):
+        """ Checks whether any of the found diagnoses is a subset of the candidate mask """
+        return diagnoses.has_subset_of(mask_indices(candidate))
@@ -1,10 +1,13 @@
-from django.db import models
-from django.db.models import QuerySet, Q
+from django.db import models, transaction
+from django.db.models import Q
 
 from .components import Component
 from .gate import Gate
 from .io import IO
-from ..utils import read_clear_line, read_until, clone_django_object
+from ..config import SIMULATION_MODE, BULK_CREATE_BATCH_SIZE
+from ..consts import ORM_SIMULATION
+from ..simulation import CompiledCircuit
+from ..utils import read_clear_line, read_until
 
 
 class System(models.Model):
@@ -12,6 +15,8 @@ class System(models.Model):
     inputs = models.ManyToManyField(IO, related_name='system_input')
     outputs = models.ManyToManyField(IO, related_name='system_output')
     gates = models.ManyToManyField(Gate, related_name='system')
+    # hash of the compiled circuit of the system, which keys its cached circuit (see CompiledCircuit.structure_sha256)
+    structure_sha256 = models.CharField(max_length=64, null=True)
 
     @property
     def all_ios(self):
@@ -19,6 +24,11 @@ class System(models.Model):
         return IO.objects.filter(Q(system_input=self) | Q(system_output=self) |
                                  Q(input_gate__system=self) | Q(output_gate__system=self)).distinct()
 
+    @property
+    def compiled(self) -> CompiledCircuit:
+        """ Returns the in-memory compiled circuit of the system (compiled once per system). """
+        return CompiledCircuit.for_system(self)
+
     @classmethod
     def parse(cls, filepath):
         """ Creates a System from the given .sys file.
@@ -26,87 +36,105 @@ class System(models.Model):
         Args:
             filepath (str): .sys file path
         """
+        return cls.create_parsed(*cls.read_file(filepath))
+
+    @staticmethod
+    def read_file(filepath) -> tuple[str, list[str], list[str], list[list[str]]]:
+        """ Reads a .sys file into plain data, without any DB access.
+
+        Args:
+            filepath (str): .sys file path
+
+        Returns:
+            (str, list[str], list[str], list[list[str]]). Tuple of (system name, inputs names, outputs names,
+                                                                    raw gates as returned from Gate.parse_from_file)
+        """
         with open(filepath) as f:
             sys_name = read_clear_line(f)[:-1]  # remove '.' at the end of id line
             inputs_names, outputs_names = IO.parse_from_file(inputs_lines=read_until(f),
                                                              outputs_lines=read_until(f))
             raw_gates = Gate.parse_from_file(lines=read_until(f))
+        return sys_name, inputs_names, outputs_names, raw_gates
 
-        system = cls.objects.create(name=sys_name)
-        system.inputs.add(*system.__create_ios(inputs_names))
-        system.outputs.add(*system.__create_ios(outputs_names))
-        system.__create_gates(raw_gates)
-
-    def __create_ios(self, names: list[str]):
-        """ Creates new IOs only for names that have not appear in the system till now.
-
-        Args:
-            names: list of io names
+    @classmethod
+    def create_parsed(cls, sys_name: str, inputs_names: list[str], outputs_names: list[str],
+                      raw_gates: list[list[str]]):
+        """ Creates a System from the data of its .sys file (see read_file) with bulk inserts, in a single transaction.
+        Every net of the system gets a single IO, and the IOs are created in the order the nets appear in the file
+        (inputs, outputs, and then the outputs of the gates), which is the order Gate.calc_output reduces them in.
 
         Returns:
-            list[IO]. List of the newly created IOs ONLY!
-        """
-        # returns a list of all the new IOs
-        ios = []
-        for name in names:
-            io = IO.objects.filter(Q(system_input=self) | Q(system_output=self), Q(name=name))
-            if not io:
-                io = IO.objects.create(name=name)
-                ios.append(io)
-        return ios
-
-    def __create_gates(self, raw_gates: list[list[str]]):
-        """ Creates the Gates of the system from the raw data in the .sys files.
-
-        Args:
-            raw_gates: lists and strings representation of the gates as appear in the .sys files
+            System. The new system
         """
-        for i, (logical_type_name, gate_name, output_name, *inputs_names) in enumerate(raw_gates):
-            output_io = self.all_ios.filter(name=output_name).get() \
-                if self.all_ios.filter(name=output_name) \
-                else IO.objects.create(name=output_name)
-            gate = Gate.objects.create(
-                serial_num=i,
-                logical_type=Component.parse(logical_type_name),
-                name=gate_name,
-                output=output_io
+        ios = {}  # key: net name, value: IO
+        for name in [*inputs_names, *outputs_names, *(output_name for _, _, output_name, *_ in raw_gates)]:
+            if name not in ios:
+                ios[name] = IO(name=name)
+        logical_types = Component.parse_all({logical_type_name for logical_type_name, *_ in raw_gates})
+        structure_sha256 = CompiledCircuit.from_parsed(sys_name, inputs_names, outputs_names, raw_gates).structure_sha256
+
+        with transaction.atomic():
+            system = cls.objects.create(name=sys_name, structure_sha256=structure_sha256)
+            IO.objects.bulk_create(ios.values(), batch_size=BULK_CREATE_BATCH_SIZE)
+            gates = Gate.objects.bulk_create(
+                [
+                    Gate(serial_num=i, logical_type=logical_types[logical_type_name], name=gate_name,
+                         output=ios[output_name])
+                    for i, (logical_type_name, gate_name, output_name, *_) in enumerate(raw_gates)
+                ],
+                batch_size=BULK_CREATE_BATCH_SIZE
             )
-            inputs = self.all_ios.filter(name__in=inputs_names)
-            gate.inputs.add(*inputs)
-            self.gates.add(gate)
+            Gate.inputs.through.objects.bulk_create(
+                [
+                    Gate.inputs.through(gate_id=gate.pk, io_id=ios[input_name].pk)
+                    for gate, (_, _, _, *inputs_names) in zip(gates, raw_gates)
+                    for input_name in dict.fromkeys(inputs_names)  # a repeated input is connected once
+                ],
+                batch_size=BULK_CREATE_BATCH_SIZE
+            )
+            for relation, names in ((cls.inputs, inputs_names), (cls.outputs, outputs_names)):
+                relation.through.objects.bulk_create(
+                    [relation.through(system_id=system.pk, io_id=ios[name].pk) for name in dict.fromkeys(names)],
+                    batch_size=BULK_CREATE_BATCH_SIZE
+                )
+            cls.gates.through.objects.bulk_create(
+                [cls.gates.through(system_id=system.pk, gate_id=gate.pk) for gate in gates],
+                batch_size=BULK_CREATE_BATCH_SIZE
+            )
+        return system
 
-    def predict_output(self, inputs: QuerySet):
+    def predict_output(self, inputs, faulty_gates: list[Gate] = (),
+                       in_memory: bool = SIMULATION_MODE != ORM_SIMULATION):
         """ Predicts the outputs the system emits for the given inputs.
+        Nothing is written to the DB, so many predictions can run on the same system at the same time.
 
         Args:
-            inputs: QuerySet of IOs
+            inputs: IOs with the values of the system inputs
+            faulty_gates: gates to simulate with inverted operation
+            in_memory: whether to simulate the compiled circuit, or to propagate the values through the gates
+                       as they are stored in the DB
 
         Returns:
-            list[IO]. List of IOs with the values of predicted outputs
+            list[IO]. List of IOs (that are NOT saved in the DB) with the values of predicted outputs
         """
-        assert inputs.count() == self.inputs.all().count(), \
+        if in_memory:
+            return self.compiled.predict_ios(inputs, faulty_gates)
+
+        inputs_values = {io.name: io.value for io in inputs}
+        assert len(inputs_values) == self.inputs.all().count(), \
             'Not all the inputs are provided to get the output prediction'
 
-        # initialize system inputs values
-        for input_obj in self.inputs.all():
-            input_obj.value = inputs.get(name=input_obj.name).value
-            input_obj.save()
+        # initialize system inputs values (key: IO pk, value: its value)
+        values = {input_obj.pk: inputs_values[input_obj.name] for input_obj in self.inputs.all()}
 
         # propagate the inputs through the system to calculate the outputs
-        for gate in self.gates.order_by('serial_num'):
-            gate.calc_output()
-
-        outputs = [
-            clone_django_object(output_obj)
-            for output_obj in self.outputs.all()
-        ]
-        assert all(io.is_available() for io in outputs), \
+        faulty_gates_pks = {gate.pk for gate in faulty_gates}
+        gates = self.gates.select_related('logical_type__operator_type').prefetch_related('inputs') \
+            .order_by('serial_num')
+        for gate in gates:
+            values[gate.output_id] = gate.calc_output(values, is_faulty=gate.pk in faulty_gates_pks)
+
+        system_outputs = self.outputs.all()
+        assert all(output_obj.pk in values for output_obj in system_outputs), \
             f'System {self.name}: could not predict all the outputs'
-
-        self.clear_ios()
-        return outputs
-
-    def clear_ios(self):
-        """ Clears all the IO values in the whole system (including inner gates) """
-        for io in self.all_ios:
-            io.clear_value()
+        return [IO(name=output_obj.name, value=values[output_obj.pk]) for output_obj in system_outputs]
@@ -1,15 +1,38 @@
-from functools import reduce
+import itertools
+from functools import cached_property
+from math import comb
 
+from .io import IO
 from .observation import Observation
-from ..config import SINGLE_OUTPUT_CERTAINTY_PROB, SINGLE_OUTPUT_UNCERTAINTY_PROB
+from ..config import SINGLE_OUTPUT_CERTAINTY_PROB, SINGLE_OUTPUT_UNCERTAINTY_PROB, MAX_FLIPPED_OUTPUTS, \
+    MIN_UNCERTAIN_OBS_PROB
 
 
 class UncertainObservation(Observation):
+    """ An observation with the same inputs as its parent observation, where some of the observed outputs are flipped.
+    It is a lightweight value of (parent observation, flip mask), whose outputs and probability are derived on the fly,
+    and it is never saved in the DB (its diagnoses are saved with the parent observation and the flip mask).
+
+    Usage:
+        uncertain_obs = UncertainObservation.of(observation, flip_mask=0b101)  # the first and the third outputs
+    """
     class Meta:
         proxy = True
 
     UNCERTAIN_OBS_NAME_PREFIX = 'u'
 
+    @classmethod
+    def of(cls, parent: Observation, flip_mask: int):
+        """
+        Args:
+            parent: the observation with the observed outputs
+            flip_mask: mask of the flipped outputs (bit i stands for the output in position i of the output vector)
+        """
+        uncertain_obs = cls(system=parent.system, obs_name=cls.uncertain_obs_name(parent.obs_name))
+        uncertain_obs.parent = parent
+        uncertain_obs.flip_mask = flip_mask
+        return uncertain_obs
+
     @staticmethod
     def uncertain_obs_name(obs_name):
         return f'{UncertainObservation.UNCERTAIN_OBS_NAME_PREFIX}{obs_name}'
@@ -18,14 +41,72 @@ class UncertainObservation(Observation):
         assert self.obs_name.startswith(UncertainObservation.UNCERTAIN_OBS_NAME_PREFIX)
         return self.obs_name.lstrip(UncertainObservation.UNCERTAIN_OBS_NAME_PREFIX)
 
+    @cached_property
+    def input_vector(self) -> list[bool]:
+        return self.parent.input_vector
+
+    @cached_property
+    def output_vector(self) -> tuple[bool]:
+        return tuple(value != bool((self.flip_mask >> i) & 1) for i, value in enumerate(self.parent.output_vector))
+
+    def input_ios(self):
+        return self.parent.input_ios()
+
+    def output_ios(self):
+        output_names = self.system.compiled.output_names
+        return [IO(name=name, value=value) for name, value in zip(output_names, self.output_vector)]
+
     @property
     def p(self):
-        original_obs = Observation.objects.get(system=self.system, obs_name=self.original_obs_name())
-        output_probs = map(
-            lambda uncertain_output:
-                SINGLE_OUTPUT_CERTAINTY_PROB
-                if uncertain_output.value == original_obs.outputs.get(name=uncertain_output.name).value
-                else SINGLE_OUTPUT_UNCERTAINTY_PROB,
-            self.outputs.all()
+        return UncertainObservation.prior(flips_num=self.flip_mask.bit_count(), outputs_num=len(self.output_vector))
+
+    @staticmethod
+    def prior(flips_num: int, outputs_num: int) -> float:
+        """ The probability of an uncertain observation that flips the given amount of outputs """
+        return (SINGLE_OUTPUT_UNCERTAINTY_PROB ** flips_num) * \
+            (SINGLE_OUTPUT_CERTAINTY_PROB ** (outputs_num - flips_num))
+
+    @staticmethod
+    def flip_masks_levels(outputs_num: int, max_flips: int = MAX_FLIPPED_OUTPUTS,
+                          min_prob: float = MIN_UNCERTAIN_OBS_PROB) -> list[tuple[int, iter]]:
+        """ Returns the flip masks of the uncertain observations that pass the cutoffs, lazily and
+        in descending probability order: a level per amount of flipped outputs (the masks of a level are equiprobable).
+
+        Args:
+            outputs_num: amount of the outputs of the observations
+            max_flips: maximal amount of flipped outputs (None for any amount)
+            min_prob: minimal probability of an uncertain observation
+
+        Returns:
+            list[tuple[int, Iterator[int]]]. (amount of flipped outputs, iterator of the flip masks) per level
+        """
+        flips_nums = sorted(
+            (
+                flips_num for flips_num in range(outputs_num + 1)
+                if (max_flips is None or flips_num <= max_flips) and
+                UncertainObservation.prior(flips_num, outputs_num) >= min_prob
+            ),
+            key=lambda flips_num: UncertainObservation.prior(flips_num, outputs_num),
+            reverse=True
+        )
+        return [
+            (flips_num, (
+                sum(1 << i for i in flipped_outputs)
+                for flipped_outputs in itertools.combinations(range(outputs_num), flips_num)
+            ))
+            for flips_num in flips_nums
+        ]
+
+    @staticmethod
+    def levels_mass(levels: list[tuple[int, iter]], outputs_num: int) -> float:
+        """ The total probability of the uncertain observations of the given levels (see flip_masks_levels) """
+        return sum(
+            comb(outputs_num, flips_num) * UncertainObservation.prior(flips_num, outputs_num) for flips_num, _ in levels
         )
-        return reduce(lambda a, b: a * b, output_probs)
+
+    def __eq__(self, other):
+        return isinstance(other, UncertainObservation) and \
+            self.parent.pk == other.parent.pk and self.flip_mask == other.flip_mask
+
+    def __hash__(self):
+        return hash((self.parent.pk, self.flip_mask))
@@ -0,0 +1,113 @@
+""" Profiling of the DB queries of the API calls, and query budgets to catch N+1 query patterns in tests.
+
+Usage:
+    with count_queries() as stats:
+        top_diagnoses('c17', 5)
+    stats.queries, stats.sql_seconds
+
+    with assert_max_queries(2):  # raises AssertionError (with the SQL of the queries) on the third query
+        top_diagnoses('c17', 5)
+
+    query_profiler.enabled = True  # or QUERY_PROFILING in config.py
+    find_diagnosis()
+    query_profiler.report()  # the queries and the SQL time of every profiled API call
+"""
+import functools
+import time
+from contextlib import contextmanager
+
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from .config import QUERY_PROFILING
+
+
+class QueryStats:
+    """ Counts the queries that run through a DB connection, as an execute wrapper of the connection """
+
+    def __init__(self, record_sql=False):
+        """
+        Args:
+            record_sql: whether to keep the SQL of every query (in statements)
+        """
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = []
+        self.record_sql = record_sql
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_seconds += time.perf_counter() - start
+            if self.record_sql:
+                self.statements.append(sql)
+
+
+@contextmanager
+def count_queries(using=DEFAULT_DB_ALIAS, record_sql=False):
+    """ Counts the queries (and their time) that run in this process, on the given DB, inside the context """
+    stats = QueryStats(record_sql)
+    with connections[using].execute_wrapper(stats):
+        yield stats
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, using=DEFAULT_DB_ALIAS):
+    """ Fails when the code inside the context runs more queries than its budget.
+
+    Raises:
+        AssertionError: the amount of queries exceeds max_queries (the message lists their SQL)
+    """
+    with count_queries(using, record_sql=True) as stats:
+        yield stats
+    if stats.queries > max_queries:
+        raise AssertionError(
+            f'{stats.queries} queries exceeded the budget of {max_queries}:\n' + '\n'.join(stats.statements)
+        )
+
+
+class QueryProfiler:
+    """ Accumulates the queries of the profiled API calls (see profiled), per API call name.
+    Only the queries of this process are counted (not those of the worker processes of a pool).
+    """
+
+    def __init__(self, enabled=QUERY_PROFILING):
+        self.enabled = enabled
+        self.profiles = {}  # key: API call name, value: dict of calls, queries and SQL seconds
+
+    @contextmanager
+    def profile(self, name):
+        with count_queries() as stats:
+            yield stats
+        profile = self.profiles.setdefault(name, {'calls': 0, 'queries': 0, 'sql_seconds': 0.0})
+        profile['calls'] += 1
+        profile['queries'] += stats.queries
+        profile['sql_seconds'] += stats.sql_seconds
+
+    def report(self) -> dict:
+        """ Prints the profiles of the API calls by descending SQL time (the queries of an API call include those
+        of the profiled API calls it makes), and returns them.
+        """
+        for name, profile in sorted(self.profiles.items(), key=lambda item: item[1]['sql_seconds'], reverse=True):
+            print(f'{name}: {profile["calls"]} calls, {profile["queries"]} queries, '
+                  f'{profile["sql_seconds"]:.4f}s of SQL')
+        return self.profiles
+
+    def reset(self):
+        self.profiles = {}
+
+
+query_profiler = QueryProfiler()
+
+
+def profiled(func):
+    """ Decorator of an API call that accumulates its queries in query_profiler (when it is enabled) """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not query_profiler.enabled:
+            return func(*args, **kwargs)
+        with query_profiler.profile(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
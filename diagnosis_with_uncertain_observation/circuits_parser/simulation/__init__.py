@@ -0,0 +1,4 @@
+from .compiled_circuit import CompiledCircuit
+from .bit_parallel import BitParallelSimulator
+from .incremental import IncrementalSimulator
+from .memo import PredictionMemo
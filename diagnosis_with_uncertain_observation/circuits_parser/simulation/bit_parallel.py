@@ -0,0 +1,115 @@
+""" Bit-parallel simulation of a CompiledCircuit.
+
+Every net value is a Python int that packs many independent evaluations, one per bit (lane).
+Python ints behave as infinite two's complement words, so every operator is a single bitwise operation
+over all the lanes at once, and the lanes are masked out only when the outputs are read.
+"""
+import operator
+from functools import reduce
+
+from .compiled_circuit import CompiledCircuit, OPERATOR_NAMES
+from ..config import SIMULATION_LANES
+from ..consts import INVERTER, AND, OR, NAND, NOR, XOR, BUFFER
+
+word_operators = {
+    INVERTER: operator.__invert__,
+    AND: operator.__and__,
+    OR: operator.__or__,
+    NAND: lambda a, b: ~(a & b),
+    NOR: lambda a, b: ~(a | b),
+    XOR: operator.__xor__,
+    BUFFER: lambda a: a
+}
+
+ALL_LANES = -1  # a word with all the bits set
+
+
+class BitParallelSimulator:
+    """ Simulates a CompiledCircuit over many lanes in a single pass,
+    where each lane holds a different fault set or a different input vector.
+
+    Usage:
+        simulator = BitParallelSimulator(circuit)
+        simulator.predict_candidates(input_vector, candidates=[{0}, {3, 5}, ...])
+    """
+
+    def __init__(self, circuit: CompiledCircuit, lanes: int = SIMULATION_LANES):
+        self.circuit = circuit
+        self.lanes = lanes
+        self.word_ops = [word_operators[OPERATOR_NAMES[op_code]] for op_code in circuit.op_codes]
+
+    def simulate(self, input_words: list[int], fault_words: dict[int, int] = None) -> list[int]:
+        """ Propagates the packed inputs through the circuit.
+
+        Args:
+            input_words: packed values of the system inputs (lane i of word j is the value of input j in lane i)
+            fault_words: key: gate index, value: word of the lanes in which the gate operation is inverted
+
+        Returns:
+            list[int]. Packed values of all the nets of the circuit
+        """
+        fault_words = fault_words or {}
+        circuit = self.circuit
+        values = list(input_words) + [0] * circuit.gates_num
+        for i, (op, unary, fan_in) in enumerate(zip(self.word_ops, circuit.unary, circuit.fan_ins)):
+            # the same semantics as Component.op: multiple inputs are reduced with the binary operator
+            value = op(values[fan_in[0]]) if unary else reduce(op, [values[net] for net in fan_in])
+            values[circuit.inputs_num + i] = value ^ fault_words[i] if i in fault_words else value
+        return values
+
+    def predict(self, input_words: list[int], fault_words: dict[int, int] = None) -> list[int]:
+        """ Returns the packed values of the system outputs (see CompiledCircuit.output_vector) """
+        values = self.simulate(input_words, fault_words)
+        return [values[net] for net in self.circuit.output_nets]
+
+    def predict_candidates(self, input_vector: list[bool], candidates: list[frozenset[int]]) -> list[tuple[bool]]:
+        """ Predicts the outputs of a single input vector under each of the candidates fault sets.
+
+        Returns:
+            list[tuple[bool]]. The predicted output vector of each candidate (in the candidates order)
+        """
+        predictions = []
+        for batch in self.batches(candidates):
+            output_words = self.predict(self.broadcast(input_vector), self.pack_faults(batch))
+            predictions += self.unpack(output_words, len(batch))
+        return predictions
+
+    def predict_inputs(self, input_vectors: list[list[bool]],
+                       faulty: frozenset[int] = frozenset()) -> list[tuple[bool]]:
+        """ Predicts the outputs of each of the input vectors under a single fault set.
+
+        Returns:
+            list[tuple[bool]]. The predicted output vector of each input vector (in the input vectors order)
+        """
+        predictions = []
+        for batch in self.batches(input_vectors):
+            input_words = [
+                sum(value << lane for lane, value in enumerate(input_values))
+                for input_values in zip(*batch)
+            ]
+            output_words = self.predict(input_words, dict.fromkeys(faulty, ALL_LANES))
+            predictions += self.unpack(output_words, len(batch))
+        return predictions
+
+    def batches(self, items: list) -> list[list]:
+        """ Splits the items into batches that fit the lanes of a single pass """
+        return [items[i:i + self.lanes] for i in range(0, len(items), self.lanes)]
+
+    @staticmethod
+    def broadcast(vector) -> list[int]:
+        """ Packs a single vector of booleans into words that hold it in all the lanes """
+        return [ALL_LANES if value else 0 for value in vector]
+
+    @staticmethod
+    def pack_faults(fault_sets: list[frozenset[int]]) -> dict[int, int]:
+        """ Packs the fault sets (one per lane) into a fault word per gate """
+        fault_words = {}
+        for lane, fault_set in enumerate(fault_sets):
+            for gate_i in fault_set:
+                fault_words[gate_i] = fault_words.get(gate_i, 0) | (1 << lane)
+        return fault_words
+
+    @staticmethod
+    def unpack(words: list[int], lanes: int) -> list[tuple[bool]]:
+        """ Unpacks words into a vector of booleans per lane """
+        return [tuple(bool((word >> lane) & 1) for word in words) for lane in range(lanes)]
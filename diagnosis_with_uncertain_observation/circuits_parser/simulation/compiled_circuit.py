@@ -0,0 +1,407 @@
+""" In-memory representation of a System that predicts its outputs without any DB traffic.
+
+The gates of a system are compiled once into flat arrays (operator codes, fan-in net indices, output slots),
+sorted by their topological level, so a prediction is a single pass over plain Python lists.
+
+The arrays are also cached on disk, keyed by the hash of the structure of the circuit (which is stored on the system
+when it is parsed), so a new process loads them from a read-only memory map (shared by all the processes that load
+the same circuit) instead of compiling again.
+"""
+import array
+import hashlib
+import json
+import mmap
+import operator
+import os
+from functools import reduce, cached_property
+
+from django.db.models import Prefetch
+
+from ..config import COMPILED_CIRCUITS_CACHE_DIR
+from ..consts import COMPILED_CIRCUIT_FILE_EXTENSION
+from ..models.components import Component
+from ..models.io import IO
+from ..models.operators import operators
+from .memo import PredictionMemo
+
+OPERATOR_NAMES = tuple(operators.keys())
+# bump whenever the layout of the cached circuit files changes
+COMPILED_CIRCUIT_FORMAT_VERSION = 2
+
+
+class CompiledCircuit:
+    """ Array-backed, topologically levelized representation of a System.
+
+    Every net of the circuit is addressed by an index: the system inputs take the first slots,
+    and the gate in position i (in the levelized order) drives the net `inputs_num + i`.
+
+    Usage:
+        circuit = CompiledCircuit.for_system(system)
+        outputs = circuit.predict(circuit.input_vector({'i1': True, 'i2': False, ...}), faulty={3, 5})
+    """
+    _compiled = {}  # key: System pk, value: CompiledCircuit
+
+    def __init__(self, name: str, input_names: list[str], output_names: list[str], raw_gates: list[tuple]):
+        """
+        Args:
+            name: the system name
+            input_names: names of the system inputs, in the order of the input vectors
+            output_names: names of the system outputs, in the order of the predicted output vectors
+            raw_gates: (gate key, gate name, operator name, inputs num, output name, inputs names) per gate,
+                       in any order (e.g. [(12, 'gate10', 'nand', 2, 'z1', ['i1', 'i3']), ...])
+        """
+        self.name = name
+        self.input_names = list(input_names)
+        self.output_names = list(output_names)
+        self.inputs_num = len(self.input_names)
+
+        raw_gates = self.__levelize(raw_gates)
+        self.gates_num = len(raw_gates)
+        self.gate_keys = [gate_key for gate_key, *_ in raw_gates]
+        self.gate_names = [gate_name for _, gate_name, *_ in raw_gates]
+        self.op_codes = [OPERATOR_NAMES.index(op_name) for _, _, op_name, *_ in raw_gates]
+        self.unary = [inputs_num == 1 for _, _, _, inputs_num, *_ in raw_gates]
+
+        net_index = {name: i for i, name in enumerate(self.input_names)}
+        net_index.update({
+            output_name: self.inputs_num + i
+            for i, (_, _, _, _, output_name, _) in enumerate(raw_gates)
+        })
+        self.fan_ins = [
+            tuple(net_index[input_name] for input_name in inputs_names)
+            for *_, inputs_names in raw_gates
+        ]
+        self.output_nets = [net_index[output_name] for output_name in self.output_names]
+        self.__derive()
+
+    @classmethod
+    def from_arrays(cls, name: str, input_names: list[str], output_names: list[str], gate_names: list[str],
+                    op_codes, unary, fan_ins: list[tuple[int]], output_nets, gate_keys_by_name):
+        """ Creates a circuit from its levelized arrays (as the attributes of a compiled circuit),
+        where the keys of the gates are looked up by their names only when they are first used.
+
+        Args:
+            gate_keys_by_name: callable that returns a dict of key: gate name, value: gate key
+        """
+        circuit = cls.__new__(cls)
+        circuit.name = name
+        circuit.input_names = list(input_names)
+        circuit.output_names = list(output_names)
+        circuit.inputs_num = len(circuit.input_names)
+        circuit.gates_num = len(gate_names)
+        circuit.gate_names = list(gate_names)
+        circuit.gate_keys_by_name = gate_keys_by_name
+        circuit.op_codes = op_codes
+        circuit.unary = unary
+        circuit.fan_ins = fan_ins
+        circuit.output_nets = output_nets
+        circuit.__derive()
+        return circuit
+
+    def __derive(self):
+        """ Derives the fan-outs and the output cones of the gates from the levelized arrays """
+        # the gates that read the output of each gate (always in later positions)
+        self.fan_outs = [[] for _ in range(self.gates_num)]
+        for i, fan_in in enumerate(self.fan_ins):
+            for net in set(fan_in):
+                if net >= self.inputs_num:
+                    self.fan_outs[net - self.inputs_num].append(i)
+
+        # the gates that each output depends on (its fan-in cone)
+        self.output_cones = [self.__fan_in_cone(net) for net in self.output_nets]
+        # mask of the outputs that each gate can reach (bit i stands for the output in position i)
+        self.reachable_outputs = [0] * self.gates_num
+        for output_i, cone in enumerate(self.output_cones):
+            for gate_i in cone:
+                self.reachable_outputs[gate_i] |= 1 << output_i
+
+    @cached_property
+    def gate_keys(self) -> list:
+        """ The keys of the gates, in the circuit order (set on creation, unless the circuit is created from arrays) """
+        gate_keys = self.gate_keys_by_name()
+        return [gate_keys[gate_name] for gate_name in self.gate_names]
+
+    @cached_property
+    def gate_index(self) -> dict:
+        """ key: gate key, value: the position of the gate in the circuit """
+        return {gate_key: i for i, gate_key in enumerate(self.gate_keys)}
+
+    @cached_property
+    def prediction_memo(self) -> PredictionMemo:
+        """ The predictions of the circuit that were already made (by any simulation, see PredictionMemo) """
+        return PredictionMemo()
+
+    @classmethod
+    def for_system(cls, system):
+        """ Returns the compiled circuit of the system, compiling it only on the first call
+        (or loading it from the cache of compiled circuits, when the system has a .sys file in DATA_SYSTEMS_DIR).
+        """
+        if system.pk not in cls._compiled:
+            cls._compiled[system.pk] = cls.__from_cache(system) or cls.from_system(system)
+        return cls._compiled[system.pk]
+
+    @classmethod
+    def forget(cls, system):
+        """ Drops the compiled circuit of the system, e.g. when the system rows are rolled back (so its pk may be
+        reused by another system).
+        """
+        cls._compiled.pop(system.pk, None)
+
+    @classmethod
+    def __from_cache(cls, system):
+        """ Loads the compiled circuit of the system from COMPILED_CIRCUITS_CACHE_DIR, where it is keyed by its
+        structure hash (see structure_sha256). A cached circuit is used only when the hash in its header is the one
+        stored on the system when it was parsed, and the keys of its gates are queried only when they are first used.
+        On a miss the circuit is compiled from the DB rows (the source of truth), cached under the hash of their
+        structure, and the hash is stored on the system (e.g. for a system parsed before the hashes were stored).
+
+        Returns:
+            CompiledCircuit. The circuit, or None if the cache is disabled
+        """
+        if COMPILED_CIRCUITS_CACHE_DIR is None:
+            return None
+
+        if system.structure_sha256 is not None and os.path.isfile(cls.__cache_filepath(system.structure_sha256)):
+            circuit = cls.load(cls.__cache_filepath(system.structure_sha256),
+                               lambda: dict(system.gates.values_list('name', 'pk')))
+            if circuit is not None and circuit.structure_sha256 == system.structure_sha256:
+                return circuit
+
+        circuit = cls.from_system(system)
+        circuit.save(cls.__cache_filepath(circuit.structure_sha256))
+        if circuit.structure_sha256 != system.structure_sha256:
+            system.structure_sha256 = circuit.structure_sha256
+            type(system).objects.filter(pk=system.pk).update(structure_sha256=system.structure_sha256)
+        return circuit
+
+    @staticmethod
+    def __cache_filepath(structure_sha256: str) -> str:
+        return f'{COMPILED_CIRCUITS_CACHE_DIR}/{structure_sha256}.{COMPILED_CIRCUIT_FILE_EXTENSION}'
+
+    @classmethod
+    def from_system(cls, system):
+        """ Compiles the given System from its gates in the DB. """
+        # the inputs are prefetched in creation order, which is the order Gate.calc_output reduces them in
+        gates = system.gates.select_related('logical_type__operator_type', 'output') \
+            .prefetch_related(Prefetch('inputs', queryset=IO.objects.order_by('pk'))) \
+            .order_by('serial_num')
+        raw_gates = [
+            (gate.pk, gate.name, gate.logical_type.operator_type.name, gate.logical_type.inputs_num,
+             gate.output.name, [io.name for io in gate.inputs.all()])
+            for gate in gates
+        ]
+        return cls(
+            name=system.name,
+            input_names=[io.name for io in system.inputs.order_by('name')],
+            output_names=[io.name for io in system.outputs.order_by('name')],
+            raw_gates=raw_gates
+        )
+
+    @classmethod
+    def from_parsed(cls, sys_name: str, inputs_names: list[str], outputs_names: list[str],
+                    raw_gates: list[list[str]]):
+        """ Compiles a system from the data of its .sys file (see System.read_file), without any DB access.
+        The keys of the gates are their names, and everything else is the same as compiling the System
+        that System.create_parsed creates from this data.
+        """
+        # the inputs of a gate are reduced in the creation order of their IOs, which is the order of the nets in
+        # the file (see System.create_parsed)
+        nets_order = {
+            name: i for i, name in
+            enumerate(dict.fromkeys([*inputs_names, *outputs_names, *(output for _, _, output, *_ in raw_gates)]))
+        }
+        return cls(
+            name=sys_name,
+            input_names=sorted(set(inputs_names)),
+            output_names=sorted(set(outputs_names)),
+            raw_gates=[
+                (gate_name, gate_name, *Component.parse_name(logical_type_name), output_name,
+                 sorted(set(gate_inputs_names), key=nets_order.get))
+                for logical_type_name, gate_name, output_name, *gate_inputs_names in raw_gates
+            ]
+        )
+
+    @cached_property
+    def structure_sha256(self) -> str:
+        """ The hex SHA-256 of the names and the levelized arrays of the circuit (the gate keys aside), so the circuits
+        of systems with the same structure have the same hash, whether they are compiled from the DB or from a file
+        """
+        structure = [
+            self.name, self.input_names, self.output_names, list(self.gate_names), list(self.op_codes),
+            list(map(bool, self.unary)), list(map(list, self.fan_ins)), list(self.output_nets),
+        ]
+        return hashlib.sha256(json.dumps(structure).encode()).hexdigest()
+
+    def save(self, filepath):
+        """ Writes the arrays of the circuit to a file (which load maps back).
+        The file is written aside and then renamed, so other processes never read it partially written.
+
+        Layout: header length (8 bytes), JSON header (the names of the circuit, its structure hash and the arrays
+                lengths), and the arrays: operator codes, unary flags, fan-ins offsets, fan-ins nets and output nets.
+        """
+        fan_ins_offsets = [0]
+        for fan_in in self.fan_ins:
+            fan_ins_offsets.append(fan_ins_offsets[-1] + len(fan_in))
+        arrays = [
+            array.array('B', self.op_codes),
+            array.array('B', self.unary),
+            array.array('i', fan_ins_offsets),
+            array.array('i', [net for fan_in in self.fan_ins for net in fan_in]),
+            array.array('i', self.output_nets),
+        ]
+        header = json.dumps({
+            'version': COMPILED_CIRCUIT_FORMAT_VERSION,
+            'operators': OPERATOR_NAMES,
+            'name': self.name,
+            'input_names': self.input_names,
+            'output_names': self.output_names,
+            'gate_names': self.gate_names,
+            'structure_sha256': self.structure_sha256,
+            'arrays': [(arr.typecode, len(arr)) for arr in arrays],
+        }).encode()
+
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        temp_filepath = f'{filepath}.{os.getpid()}.tmp'
+        with open(temp_filepath, 'wb') as f:
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            for arr in arrays:
+                f.write(bytes(-f.tell() % arr.itemsize))  # align the array to its item size
+                arr.tofile(f)
+        os.replace(temp_filepath, filepath)
+
+    @classmethod
+    def load(cls, filepath, gate_keys_by_name):
+        """ Maps a file written by save to a circuit. The arrays stay in the read-only memory map
+        (only the fan-ins are copied, into tuples).
+
+        Args:
+            filepath: the file of the circuit
+            gate_keys_by_name: callable that returns a dict of key: gate name, value: gate key
+
+        Returns:
+            CompiledCircuit. The circuit, or None if the file was written in another format
+        """
+        with open(filepath, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_len = int.from_bytes(buffer[:8], 'little')
+        header = json.loads(buffer[8:8 + header_len])
+        if header['version'] != COMPILED_CIRCUIT_FORMAT_VERSION or tuple(header['operators']) != OPERATOR_NAMES:
+            return None
+
+        arrays, offset = [], 8 + header_len
+        for typecode, length in header['arrays']:
+            itemsize = array.array(typecode).itemsize
+            offset += -offset % itemsize
+            arrays.append(memoryview(buffer)[offset:offset + length * itemsize].cast(typecode))
+            offset += length * itemsize
+        op_codes, unary, fan_ins_offsets, fan_ins_nets, output_nets = arrays
+
+        circuit = cls.from_arrays(
+            name=header['name'],
+            input_names=header['input_names'],
+            output_names=header['output_names'],
+            gate_names=header['gate_names'],
+            op_codes=op_codes,
+            unary=unary,
+            fan_ins=[
+                tuple(fan_ins_nets[fan_ins_offsets[i]:fan_ins_offsets[i + 1]])
+                for i in range(len(header['gate_names']))
+            ],
+            output_nets=output_nets,
+            gate_keys_by_name=gate_keys_by_name
+        )
+        circuit.structure_sha256 = header['structure_sha256']  # hashed when saved
+        return circuit
+
+    @staticmethod
+    def __levelize(raw_gates: list[tuple]) -> list[tuple]:
+        """ Sorts the gates by their topological level (and by their original order inside a level),
+        where the level of a gate is 1 + the maximal level of the gates that drive its inputs.
+        """
+        drivers = {output_name: i for i, (_, _, _, _, output_name, _) in enumerate(raw_gates)}
+        inputs_drivers = [
+            {drivers[name] for name in inputs_names if name in drivers}
+            for *_, inputs_names in raw_gates
+        ]
+        fan_outs = [[] for _ in raw_gates]
+        for i, gate_drivers in enumerate(inputs_drivers):
+            for driver in gate_drivers:
+                fan_outs[driver].append(i)
+
+        # Kahn's algorithm, relaxing the level of each gate from all of its drivers
+        levels = [1] * len(raw_gates)
+        pending_drivers = list(map(len, inputs_drivers))
+        ready = [i for i, pending in enumerate(pending_drivers) if pending == 0]
+        for i in ready:
+            for gate_i in fan_outs[i]:
+                levels[gate_i] = max(levels[gate_i], levels[i] + 1)
+                pending_drivers[gate_i] -= 1
+                if pending_drivers[gate_i] == 0:
+                    ready.append(gate_i)
+        assert len(ready) == len(raw_gates), 'The circuit has a cycle'
+        return [raw_gates[i] for i in sorted(range(len(raw_gates)), key=lambda i: (levels[i], i))]
+
+    def __fan_in_cone(self, net: int) -> frozenset[int]:
+        """ Returns the indices of all the gates that the value of the given net depends on """
+        cone = set()
+        pending = [net]
+        while pending:
+            gate_i = pending.pop() - self.inputs_num
+            if gate_i >= 0 and gate_i not in cone:
+                cone.add(gate_i)
+                pending += self.fan_ins[gate_i]
+        return frozenset(cone)
+
+    def input_vector(self, values: dict[str, bool]) -> list[bool]:
+        """ Orders the given input values (by input name) as the circuit expects them """
+        assert len(values) == self.inputs_num, 'Not all the inputs are provided to get the output prediction'
+        return [values[name] for name in self.input_names]
+
+    def output_vector(self, values: dict[str, bool]) -> tuple[bool]:
+        """ Orders the given output values (by output name) as the circuit predicts them """
+        return tuple(values[name] for name in self.output_names)
+
+    def reachable_outputs_mask(self, faulty: frozenset[int]) -> int:
+        """ Returns the mask of the outputs that at least one of the given gates can reach """
+        return reduce(operator.__or__, (self.reachable_outputs[gate_i] for gate_i in faulty), 0)
+
+    def discrepant_outputs_mask(self, prediction: tuple[bool], output_vector: tuple[bool]) -> int:
+        """ Returns the mask of the outputs whose predicted value differs from the given one """
+        return sum(1 << i for i, (predicted, observed) in enumerate(zip(prediction, output_vector))
+                   if predicted != observed)
+
+    def gate_indices(self, gates) -> frozenset[int]:
+        """ Returns the circuit indices of the given Gates """
+        return frozenset(self.gate_index[gate.pk] for gate in gates)
+
+    def simulate(self, input_vector: list[bool], faulty: frozenset[int] = frozenset()) -> list[bool]:
+        """ Propagates the input vector through the circuit.
+
+        Args:
+            input_vector: values of the system inputs (see input_vector)
+            faulty: indices of the gates that their operation is inverted
+
+        Returns:
+            list[bool]. Values of all the nets of the circuit
+        """
+        values = list(input_vector) + [False] * self.gates_num
+        for i, (op_code, unary, fan_in) in enumerate(zip(self.op_codes, self.unary, self.fan_ins)):
+            op = operators[OPERATOR_NAMES[op_code]]
+            # the same semantics as Component.op: multiple inputs are reduced with the binary operator
+            value = op(values[fan_in[0]]) if unary else reduce(op, [values[net] for net in fan_in])
+            values[self.inputs_num + i] = (not value) if i in faulty else value
+        return values
+
+    def predict(self, input_vector: list[bool], faulty: frozenset[int] = frozenset()) -> tuple[bool]:
+        """ Returns the values of the system outputs (see output_vector) for the given input vector """
+        values = self.simulate(input_vector, faulty)
+        return tuple(values[net] for net in self.output_nets)
+
+    def predict_ios(self, inputs, faulty_gates=()) -> list[IO]:
+        """ Predicts the outputs for the given input IOs, as new IOs that are NOT saved in the DB """
+        input_vector = self.input_vector({io.name: io.value for io in inputs})
+        outputs = self.prediction_memo.predict(input_vector, self.gate_indices(faulty_gates),
+                                               predict=lambda faulty: self.predict(input_vector, faulty))
+        return [IO(name=name, value=value) for name, value in zip(self.output_names, outputs)]
+
@@ -0,0 +1,52 @@
+""" Incremental (event-driven) simulation of a CompiledCircuit.
+
+Inverting a few gates can change only their fan-out cone, so the healthy simulation of an input vector is cached
+and only the gates downstream of the faulty ones are re-evaluated, stopping wherever a value does not change.
+"""
+import heapq
+from functools import reduce
+
+from .compiled_circuit import CompiledCircuit, OPERATOR_NAMES
+from ..models.operators import operators
+
+
+class IncrementalSimulator:
+    """ Predicts the outputs of a single input vector under many fault sets.
+
+    Usage:
+        simulator = IncrementalSimulator(circuit, input_vector)
+        simulator.predict(faulty={3, 5})
+    """
+
+    def __init__(self, circuit: CompiledCircuit, input_vector: list[bool]):
+        self.circuit = circuit
+        self.healthy_values = circuit.simulate(input_vector)
+        self.ops = [operators[OPERATOR_NAMES[op_code]] for op_code in circuit.op_codes]
+
+    def predict(self, faulty: frozenset[int]) -> tuple[bool]:
+        """ Returns the values of the system outputs (see CompiledCircuit.output_vector) when the given gates
+        are faulty, re-evaluating only the gates whose inputs have changed.
+        """
+        circuit, healthy_values = self.circuit, self.healthy_values
+        changed_values = {}  # key: net, value: its value when the gates are faulty
+
+        # the gates are evaluated in increasing position, so all the inputs of a gate are final when it pops
+        pending = sorted(faulty)
+        queued = set(faulty)
+        while pending:
+            i = heapq.heappop(pending)
+            fan_in_values = [changed_values.get(net, healthy_values[net]) for net in circuit.fan_ins[i]]
+            value = self.ops[i](fan_in_values[0]) if circuit.unary[i] else reduce(self.ops[i], fan_in_values)
+            if i in faulty:
+                value = not value
+
+            net = circuit.inputs_num + i
+            if value == healthy_values[net]:
+                continue  # the change does not propagate through this gate
+            changed_values[net] = value
+            for gate_i in circuit.fan_outs[i]:
+                if gate_i not in queued:
+                    queued.add(gate_i)
+                    heapq.heappush(pending, gate_i)
+
+        return tuple(changed_values.get(net, healthy_values[net]) for net in circuit.output_nets)
@@ -0,0 +1,84 @@
+""" Bounded memo of the predictions of a circuit.
+
+The observations of a system repeat the same input vectors (and all the uncertain observations of an observation
+share its inputs), so the same (input vector, fault set) pairs are predicted again and again.
+"""
+from collections import OrderedDict, namedtuple
+
+from ..config import PREDICTION_MEMO_SIZE
+from ..utils import booleans_to_num, indices_mask
+
+MemoInfo = namedtuple('MemoInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class PredictionMemo:
+    """ LRU memo of predicted output vectors, keyed by the packed input vector and the mask of the faulty gates.
+    The predictions are made by the given predict function (with any simulation), only for the missing keys.
+
+    Usage:
+        memo = PredictionMemo()
+        memo.predict_many(input_vector, fault_sets=[{0}, {3, 5}, ...], predict=simulate_fault_sets)
+        memo.cache_info()  # MemoInfo(hits=..., misses=..., maxsize=..., currsize=...)
+    """
+
+    def __init__(self, maxsize: int = PREDICTION_MEMO_SIZE):
+        """
+        Args:
+            maxsize: maximal amount of memoized predictions (0 to disable the memo)
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__predictions = OrderedDict()  # key: (packed input vector, fault mask), value: output vector
+
+    def predict(self, input_vector: list[bool], faulty: frozenset[int], predict) -> tuple[bool]:
+        """ Returns the output vector of the input vector when the given gates are faulty.
+
+        Args:
+            predict: function of a fault set that returns its output vector (of this input vector)
+        """
+        return self.predict_many(input_vector, [faulty], lambda fault_sets: [predict(fault_sets[0])])[0]
+
+    def predict_many(self, input_vector: list[bool], fault_sets: list[frozenset[int]], predict) -> list[tuple[bool]]:
+        """ Returns the output vector of the input vector under each of the fault sets.
+
+        Args:
+            predict: function of a list of fault sets that returns their output vectors (of this input vector),
+                     called once, with all the fault sets that are not memoized
+
+        Returns:
+            list[tuple[bool]]. The predicted output vector of each fault set (in the fault sets order)
+        """
+        packed_inputs = booleans_to_num(input_vector)
+        keys = [(packed_inputs, indices_mask(fault_set)) for fault_set in fault_sets]
+        predictions = list(map(self.__get, keys))
+
+        missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            for i, prediction in zip(missing, predict([fault_sets[i] for i in missing])):
+                predictions[i] = prediction
+                self.__put(keys[i], prediction)
+        return predictions
+
+    def cache_info(self) -> MemoInfo:
+        """ Returns the statistics of the memo (as functools.lru_cache does), to size it per circuit """
+        return MemoInfo(self.hits, self.misses, self.maxsize, len(self.__predictions))
+
+    def cache_clear(self):
+        self.__predictions.clear()
+        self.hits = self.misses = 0
+
+    def __get(self, key):
+        prediction = self.__predictions.get(key)
+        if prediction is not None:
+            self.__predictions.move_to_end(key)
+        return prediction
+
+    def __put(self, key, prediction):
+        if self.maxsize <= 0:
+            return
+        self.__predictions[key] = prediction
+        if len(self.__predictions) > self.maxsize:
+            self.__predictions.popitem(last=False)  # the least recently used prediction
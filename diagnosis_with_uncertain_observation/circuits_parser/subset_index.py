@@ -0,0 +1,48 @@
+""" Subset-query index over small sets of ints (e.g. diagnoses as gate indices). """
+from typing import Iterable
+
+END = None  # marks a trie node that ends a stored set
+
+
+class SubsetIndex:
+    """ Set-trie that answers "does any stored set is a subset of the query set?".
+
+    The stored sets are paths of increasing elements in the trie, and a query walks only the children that are
+    elements of the query set, so its cost depends on the query size and not on the amount of stored sets.
+
+    Usage:
+        index = SubsetIndex()
+        index.add({3, 7})
+        index.has_subset_of({1, 3, 7})  # True
+    """
+
+    def __init__(self, sets: Iterable[Iterable[int]] = ()):
+        self._root = {}  # key: element (or END), value: child node
+        self._size = 0
+        for items in sets:
+            self.add(items)
+
+    def add(self, items: Iterable[int]):
+        node = self._root
+        for item in sorted(items):
+            node = node.setdefault(item, {})
+        if END not in node:
+            node[END] = True
+            self._size += 1
+
+    def has_subset_of(self, items: Iterable[int]) -> bool:
+        """ Checks whether any stored set is a subset of (or equal to) the given set """
+        items = sorted(items)
+        pending = [(self._root, 0)]  # (node, position in items of the next element to match)
+        while pending:
+            node, start = pending.pop()
+            if END in node:
+                return True
+            for i in range(start, len(items)):
+                child = node.get(items[i])
+                if child is not None:
+                    pending.append((child, i + 1))
+        return False
+
+    def __len__(self):
+        return self._size
@@ -0,0 +1,5 @@
+""" Tests of the circuits_parser app, a module per area.
+
+Run from the repository root (the data and results paths in config.py are relative to it):
+    python diagnosis_with_uncertain_observation/manage.py test circuits_parser
+"""
@@ -0,0 +1,223 @@
+import sys
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase
+
+from .utils import parse_example, create_operator_types, isolate_results
+from .. import api
+from ..config import DATA_SYSTEMS_DIR, DATA_OBSERVATIONS_DIR
+from ..consts import SYS_FILE_EXTENSION, OBS_FILE_EXTENSION
+from ..models import System, Observation, Diagnosis, DiagnosisProgress
+from ..profiling import assert_max_queries
+from ..simulation import CompiledCircuit
+
+
+class ParseFilesTest(TestCase):
+    """ Reading the files in a process pool creates the same systems and observations as parsing them one by one """
+    SYSTEMS_NAMES = ('c17', '74182')
+
+    @staticmethod
+    def parsed_data() -> dict:
+        """ The parsed systems and observations, by names (the pks depend on the parsing order) """
+        return {
+            system.name: (
+                [io.name for io in system.inputs.order_by('pk')],
+                [io.name for io in system.outputs.order_by('pk')],
+                [
+                    (gate.serial_num, gate.name, gate.logical_type.operator_type.name, gate.logical_type.inputs_num,
+                     gate.output.name, sorted(io.name for io in gate.inputs.all()))
+                    for gate in system.gates.order_by('serial_num')
+                ],
+                sorted(
+                    (obs.obs_name, sorted((io.name, io.value) for io in obs.inputs.all()),
+                     sorted((io.name, io.value) for io in obs.outputs.all()))
+                    for obs in system.observations.all()
+                ),
+            )
+            for system in System.objects.all()
+        }
+
+    def test_parse_files_matches_parsing_each_file(self):
+        create_operator_types()
+        systems_filepaths = [f'{DATA_SYSTEMS_DIR}/{name}.{SYS_FILE_EXTENSION}' for name in self.SYSTEMS_NAMES]
+        observations_filepaths = [f'{DATA_OBSERVATIONS_DIR}/{name}_iscas85.{OBS_FILE_EXTENSION}'
+                                  for name in self.SYSTEMS_NAMES]
+        api.parse_files(systems_filepaths, observations_filepaths, workers=2)
+        parsed = self.parsed_data()
+        System.objects.all().delete()
+
+        for filepath in systems_filepaths:
+            api.parse_system(filepath)
+        for filepath in observations_filepaths:
+            api.parse_observations(filepath)
+        self.assertEqual(sorted(parsed), sorted(self.SYSTEMS_NAMES))
+        self.assertEqual(parsed, self.parsed_data())
+
+
+class QueryBudgetsTest(TestCase):
+    """ The query budgets of the API calls (a budget is per call or per observation, and never per diagnosis or per
+    uncertain observation, so the N+1 query patterns exceed it)
+    """
+    SYSTEM_NAME = 'c17'
+    TOP_N = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.system = parse_example(cls.SYSTEM_NAME)
+
+    def setUp(self):
+        isolate_results(self)
+
+    def test_parse(self):
+        create_operator_types()
+        with assert_max_queries(12):
+            api.parse_system(f'{DATA_SYSTEMS_DIR}/74182.{SYS_FILE_EXTENSION}')
+        with assert_max_queries(20):
+            api.parse_observations(f'{DATA_OBSERVATIONS_DIR}/74182_iscas85.{OBS_FILE_EXTENSION}')
+        system = System.objects.get(name='74182')
+        self.assertEqual(system.gates.count(), 19)
+        self.assertEqual(system.observations.count(), 250)
+
+    def test_find_diagnosis(self):
+        observations_num = Observation.objects.filter(system=self.system).count()
+        # the gates of the diagnoses, the diagnoses and their gates, and the progress, in savepoints
+        with assert_max_queries(10 + 8 * observations_num):
+            api.find_diagnosis(workers=1)
+        self.assertEqual(DiagnosisProgress.objects.filter(observation__system=self.system).count(), observations_num)
+        self.assertTrue(api.diagnoses_probs(self.SYSTEM_NAME))
+
+    def test_diagnoses_probs_and_top_diagnoses(self):
+        api.find_diagnosis(workers=1)
+        with assert_max_queries(1):
+            probs = api.diagnoses_probs(self.SYSTEM_NAME, self.TOP_N)
+        with assert_max_queries(2):
+            top = api.top_diagnoses(self.SYSTEM_NAME, self.TOP_N)
+        self.assertEqual([p for _, p in top], list(probs.values()))
+        self.assertEqual(sorted(probs.values(), reverse=True), list(probs.values()))
+
+    def test_search_top_diagnoses(self):
+        with assert_max_queries(5):
+            top = api.search_top_diagnoses(self.SYSTEM_NAME, self.TOP_N)
+        self.assertEqual(len(top), self.TOP_N)
+
+
+class ParallelDiagnosisTest(TransactionTestCase):
+    """ Diagnosing in a pool of processes (which read the committed rows) saves the same diagnoses as diagnosing in
+    this process
+    """
+    SYSTEMS_NAMES = ('c17', '74182')
+    OBSERVATIONS_NUM = 5
+
+    def setUp(self):
+        isolate_results(self)
+        for system_name in self.SYSTEMS_NAMES:
+            system = parse_example(system_name)
+            self.addCleanup(CompiledCircuit.forget, system)
+            first_observations = Observation.objects.filter(system=system).order_by('pk')[:self.OBSERVATIONS_NUM]
+            Observation.objects.filter(system=system).exclude(pk__in=first_observations.values('pk')).delete()
+
+    @staticmethod
+    def saved_diagnoses() -> list[tuple]:
+        return sorted(
+            (diagnosis.observation.system.name, diagnosis.observation.obs_name, diagnosis.flip_mask,
+             tuple(sorted(gate.name for gate in diagnosis.invalid_gates.all())), round(diagnosis.probability, 12))
+            for diagnosis in Diagnosis.objects.select_related('observation__system').prefetch_related('invalid_gates')
+        )
+
+    def test_workers_match_a_single_process(self):
+        api.find_diagnosis(workers=1)
+        expected = self.saved_diagnoses()
+        self.assertTrue(expected)
+
+        # the smaller system is diagnosed in this process, and the bigger one by the workers
+        with mock.patch.object(api, 'PARALLEL_DIAGNOSIS_MIN_GATES', 10):
+            api.find_diagnosis(workers=2)
+        self.assertEqual(self.saved_diagnoses(), expected)
+        self.assertEqual(DiagnosisProgress.objects.count(), len(self.SYSTEMS_NAMES) * self.OBSERVATIONS_NUM)
+
+
+class TopDiagnosesTest(TestCase):
+    """ The ways to find the most probable diagnoses without diagnosing every uncertain observation find the
+    diagnoses that diagnosing all of them finds
+    """
+    SYSTEM_NAME = 'c17'
+    TOP_N = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.system = parse_example(cls.SYSTEM_NAME)
+
+    def setUp(self):
+        isolate_results(self)
+
+    def test_top_n_early_stop_matches_the_full_run(self):
+        api.find_diagnosis(workers=1)
+        expected = api.top_diagnoses(self.SYSTEM_NAME, self.TOP_N)
+        Diagnosis.objects.all().delete()
+        DiagnosisProgress.objects.all().delete()
+
+        api.find_diagnosis(workers=1, top_n=self.TOP_N)
+        self.assertIn('settled', sys.stdout.getvalue())
+        # the probabilities are of the diagnosed levels only, and so are lower
+        top = api.top_diagnoses(self.SYSTEM_NAME, self.TOP_N)
+        self.assertEqual(sorted(diagnosis for diagnosis, _ in top), sorted(diagnosis for diagnosis, _ in expected))
+        self.assertTrue(all(p <= expected_p for (_, p), (_, expected_p) in zip(top, expected)))
+
+    def test_search_top_diagnoses_matches_top_diagnoses(self):
+        searched = api.search_top_diagnoses(self.SYSTEM_NAME, self.TOP_N)
+        api.find_diagnosis(workers=1)
+        expected = api.top_diagnoses(self.SYSTEM_NAME, self.TOP_N)
+
+        self.assertEqual(len(searched), len(expected))
+        for (_, searched_p), (_, p) in zip(searched, expected):
+            self.assertAlmostEqual(searched_p, p)
+        # the diagnoses that tie with the last one may be any of them
+        last_p = expected[-1][1]
+        self.assertEqual(
+            {tuple(diagnosis) for diagnosis, p in searched if p > last_p * (1 + 1e-9)},
+            {tuple(diagnosis) for diagnosis, p in expected if p > last_p * (1 + 1e-9)}
+        )
+
+
+class ResumeTest(TestCase):
+    """ A run with resume diagnoses only the observations that the previous runs did not complete, and keeps a single
+    run time per search
+    """
+    SYSTEM_NAME = 'c17'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.system = parse_example(cls.SYSTEM_NAME)
+
+    def setUp(self):
+        self.run_times_filepath = f'{isolate_results(self)}/{self.SYSTEM_NAME}.txt'
+
+    def test_resume_after_top_n_early_stop(self):
+        api.find_diagnosis(workers=1)
+        expected = api.top_diagnoses(self.SYSTEM_NAME)
+        api.find_diagnosis(workers=1, top_n=1)
+        self.assertFalse(DiagnosisProgress.objects.exists())
+        api.find_diagnosis(workers=1, resume=True)
+        self.assertEqual(api.top_diagnoses(self.SYSTEM_NAME), expected)
+
+        # the run times of the early stopped run are replaced by those of the resumed one
+        observations_pks = list(Observation.objects.filter(system=self.system).values_list('pk', flat=True))
+        self.assertEqual(sorted(obs_pk for obs_pk, _ in api.read_observations_run_times(self.system)),
+                         sorted(observations_pks))
+
+    def test_resume_keeps_the_run_times_of_the_completed_observations(self):
+        api.find_diagnosis(workers=1)
+        run_times = api.read_observations_run_times(self.system)
+        # an interrupted run, and a run time of an older version of the file
+        pending_obs = Observation.objects.filter(system=self.system).order_by('pk').last()
+        DiagnosisProgress.objects.filter(observation=pending_obs).delete()
+        with open(self.run_times_filepath, 'a') as txt:
+            txt.write(f'{pending_obs.pk} 1.5\n2.5\n')
+
+        with assert_max_queries(30):
+            api.find_diagnosis(workers=1, resume=True)
+        completed_run_times = [(obs_pk, run_time) for obs_pk, run_time in run_times if obs_pk != pending_obs.pk]
+        resumed_run_times = api.read_observations_run_times(self.system)
+        self.assertEqual(resumed_run_times[:len(completed_run_times) + 1], [*completed_run_times, (None, 2.5)])
+        self.assertEqual([obs_pk for obs_pk, _ in resumed_run_times[len(completed_run_times) + 1:]], [pending_obs.pk])
+        self.assertEqual(api.read_run_times(self.system), [run_time for _, run_time in resumed_run_times])
@@ -0,0 +1,103 @@
+import io
+import json
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from .utils import parse_example, create_operator_types
+from .. import benchmark
+from ..benchmark import BENCHMARK_STAGES
+from ..models import System, Diagnosis
+
+
+class CompareReportsTest(SimpleTestCase):
+    """ The regressions are the medians of the report that are slower than those of the baseline beyond the
+    tolerance, of the benchmarks that are in both of the reports
+    """
+    CONFIG = {'simulation_mode': 'bit_parallel'}
+
+    def setUp(self):
+        reports_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(reports_dir.cleanup)
+        self.reports_dir = reports_dir.name
+        patcher = mock.patch('sys.stdout', new_callable=io.StringIO)
+        self.stdout = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def save_report(self, name, benchmarks, config=CONFIG) -> str:
+        """ Saves a report with the given medians (dict[str: dict[str: float]], by system and stage) """
+        filepath = f'{self.reports_dir}/{name}.json'
+        with open(filepath, 'w') as f:
+            json.dump({
+                'config': config,
+                'benchmarks': {
+                    system_name: {stage: {'runs': 1, 'median': median, 'p95': median, 'candidates_per_second': None}
+                                  for stage, median in stages.items()}
+                    for system_name, stages in benchmarks.items()
+                },
+            }, f)
+        return filepath
+
+    def test_regressions_beyond_the_tolerance(self):
+        baseline = self.save_report('baseline', {'c17': {'parse': 1.0, 'simulate': 1.0, 'diagnose': 1.0,
+                                                         'top_diagnoses': 0.0}})
+        report = self.save_report('report', {'c17': {'parse': 1.05, 'simulate': 0.5, 'diagnose': 1.2,
+                                                     'top_diagnoses': 0.1}})
+        self.assertEqual(benchmark.compare_reports(baseline, report, tolerance=0.1),
+                         [('c17', 'diagnose', 1.0, 1.2), ('c17', 'top_diagnoses', 0.0, 0.1)])
+        self.assertEqual(benchmark.compare_reports(baseline, report, tolerance=0.01),
+                         [('c17', 'parse', 1.0, 1.05), ('c17', 'diagnose', 1.0, 1.2),
+                          ('c17', 'top_diagnoses', 0.0, 0.1)])
+        self.assertIn('c17 diagnose: 1.000000s -> 1.200000s (x1.20) REGRESSION', self.stdout.getvalue())
+        self.assertIn('(xinf)', self.stdout.getvalue())
+
+    def test_benchmarks_that_are_not_in_both_reports_are_skipped(self):
+        baseline = self.save_report('baseline', {'c17': {'parse': 1.0}, '74182': {'parse': 1.0}})
+        report = self.save_report('report', {'c17': {'parse': 1.0, 'diagnose': 5.0}, '74283': {'parse': 5.0}},
+                                  config={**self.CONFIG, 'runs': 3})
+        self.assertEqual(benchmark.compare_reports(baseline, report), [])
+        self.assertEqual(self.stdout.getvalue().count(' -> '), 2)
+        self.assertTrue(self.stdout.getvalue().startswith('Note: the configurations differ'))
+
+
+class RunBenchmarksTest(TestCase):
+    """ The benchmarks report every stage of every system, and leave the DB as it was """
+    SYSTEM_NAME = 'c17'
+
+    def setUp(self):
+        patcher = mock.patch('sys.stdout', new_callable=io.StringIO)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_benchmarks(self) -> dict:
+        report_file = tempfile.NamedTemporaryFile(suffix='.json')
+        self.addCleanup(report_file.close)
+        report = benchmark.run_benchmarks([self.SYSTEM_NAME], observations_num=2, warmup_runs=0, runs=2,
+                                          report_filepath=report_file.name)
+        with open(report_file.name) as f:
+            self.assertEqual(json.load(f), report)
+        return report
+
+    def test_every_stage_is_reported(self):
+        create_operator_types()
+        report = self.run_benchmarks()
+        self.assertEqual(report['config']['runs'], 2)
+        stages = report['benchmarks'][self.SYSTEM_NAME]
+        self.assertEqual(set(stages), set(BENCHMARK_STAGES))
+        for stage, results in stages.items():
+            with self.subTest(stage=stage):
+                self.assertEqual(results['runs'], 2)
+                self.assertLessEqual(results['median'], results['p95'])
+        # only the stages that simulate count their candidates
+        self.assertIsNone(stages['parse']['candidates_per_second'])
+        self.assertGreater(stages['simulate']['candidates_per_second'], 0)
+        self.assertFalse(System.objects.exists())
+
+    def test_the_existing_system_is_kept(self):
+        system = parse_example(self.SYSTEM_NAME)
+        observations_num = system.observations.count()
+        self.run_benchmarks()
+        self.assertEqual(System.objects.get().pk, system.pk)
+        self.assertEqual(system.observations.count(), observations_num)
+        self.assertFalse(Diagnosis.objects.exists())
@@ -0,0 +1,74 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+
+from .utils import parse_example
+from .. import api
+from ..config import DATA_SYSTEMS_DIR
+from ..consts import SYS_FILE_EXTENSION, COMPILED_CIRCUIT_FILE_EXTENSION
+from ..models import System
+from ..profiling import assert_max_queries
+from ..simulation import CompiledCircuit
+from ..simulation import compiled_circuit as compiled_circuit_module
+
+
+class CompiledCircuitCacheTest(TestCase):
+    """ The compiled circuits are loaded from the cache only when they have the structure of their system """
+    SYSTEM_NAME = 'c17'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.system = parse_example(cls.SYSTEM_NAME)
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        patcher = mock.patch.object(compiled_circuit_module, 'COMPILED_CIRCUITS_CACHE_DIR', cache_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache_filepath = f'{cache_dir.name}/{self.system.structure_sha256}.{COMPILED_CIRCUIT_FILE_EXTENSION}'
+        self.expected = CompiledCircuit.from_system(self.system)
+        CompiledCircuit.forget(self.system)
+        self.addCleanup(CompiledCircuit.forget, self.system)
+
+    def compile_again(self) -> CompiledCircuit:
+        """ Compiles the circuit of the system as a new process would """
+        CompiledCircuit.forget(self.system)
+        return CompiledCircuit.for_system(self.system)
+
+    def assert_compiled(self, circuit: CompiledCircuit):
+        self.assertEqual(circuit.structure_sha256, self.expected.structure_sha256)
+        self.assertEqual(circuit.gate_keys, self.expected.gate_keys)
+        observation = api.system_observations(self.system).first()
+        self.assertEqual(circuit.predict(observation.input_vector, frozenset({1, 3})),
+                         self.expected.predict(observation.input_vector, frozenset({1, 3})))
+
+    def test_the_parsed_hash_is_the_hash_of_the_compiled_circuit(self):
+        self.assertEqual(self.system.structure_sha256, self.expected.structure_sha256)
+
+    def test_hit_loads_without_compiling_or_queries(self):
+        self.compile_again()
+        self.assertTrue(os.path.isfile(self.cache_filepath))
+        with mock.patch.object(CompiledCircuit, 'from_system', side_effect=AssertionError('compiled on a hit')):
+            with assert_max_queries(0):
+                circuit = self.compile_again()
+            # the keys of the gates are queried only when they are used
+            self.assert_compiled(circuit)
+
+    def test_cached_circuit_of_another_structure_is_compiled_again(self):
+        other_system_filepath = f'{DATA_SYSTEMS_DIR}/74182.{SYS_FILE_EXTENSION}'
+        CompiledCircuit.from_parsed(*System.read_file(other_system_filepath)).save(self.cache_filepath)
+        with mock.patch.object(CompiledCircuit, 'from_system', wraps=CompiledCircuit.from_system) as from_system:
+            self.assert_compiled(self.compile_again())
+            self.assertEqual(from_system.call_count, 1)
+            # the circuit of the system replaced the other circuit in the cache
+            self.assert_compiled(self.compile_again())
+            self.assertEqual(from_system.call_count, 1)
+
+    def test_system_without_a_hash_gets_the_hash_of_its_compiled_circuit(self):
+        System.objects.filter(pk=self.system.pk).update(structure_sha256=None)
+        self.system.refresh_from_db()
+        self.assert_compiled(self.compile_again())
+        self.assertEqual(System.objects.get(pk=self.system.pk).structure_sha256, self.expected.structure_sha256)
@@ -0,0 +1,50 @@
+from importlib.util import find_spec
+from unittest import mock
+
+from django.test import TestCase
+
+from .utils import parse_example, gates_names
+from .. import api
+from ..config import MAX_FAULTY_COMPONENTS
+from ..consts import BFS_ENGINE, CONFLICT_DIRECTED_ENGINE, SAT_ENGINE, BUILTIN_SAT_SOLVER, PYSAT_SAT_SOLVER
+from ..engines import uncertain_engines
+from ..engines import sat as sat_module
+
+
+class EnginesTest(TestCase):
+    """ Every diagnosis engine finds the same minimal diagnoses as the BFS """
+    SYSTEMS = {'c17': 10, '74182': 3}  # value: amount of the first observations to diagnose
+    ENGINES = (CONFLICT_DIRECTED_ENGINE, SAT_ENGINE)
+    SAT_SOLVERS = (BUILTIN_SAT_SOLVER, PYSAT_SAT_SOLVER) if find_spec('pysat') else (BUILTIN_SAT_SOLVER,)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.observations = [
+            obs
+            for system_name, observations_num in cls.SYSTEMS.items()
+            for obs in api.system_observations(parse_example(system_name)).order_by('pk')[:observations_num]
+        ]
+
+    def test_engines_match_the_bfs(self):
+        for obs in self.observations:
+            expected = gates_names(obs.diagnose(BFS_ENGINE))
+            for engine in self.ENGINES:
+                with self.subTest(observation=f'{obs.system.name}/{obs.obs_name}', engine=engine):
+                    self.assertEqual(gates_names(obs.diagnose(engine)), expected)
+
+    def test_uncertain_engines_match_the_shared_bfs(self):
+        for obs in self.observations:
+            uncertain_observations = api.create_uncertain_observations(obs)
+            expected = obs.find_uncertain_diagnoses(uncertain_observations)
+            output_vectors = [uncertain_obs.output_vector for uncertain_obs in uncertain_observations]
+            for engine, find_uncertain_diagnoses in uncertain_engines.items():
+                for sat_solver in self.SAT_SOLVERS if engine == SAT_ENGINE else (None,):
+                    with mock.patch.object(sat_module, 'SAT_SOLVER', sat_solver):
+                        outputs_diagnoses = find_uncertain_diagnoses(obs, output_vectors, MAX_FAULTY_COMPONENTS)
+                    for uncertain_obs in uncertain_observations:
+                        with self.subTest(observation=f'{obs.system.name}/{obs.obs_name}', engine=engine,
+                                          sat_solver=sat_solver, flip_mask=uncertain_obs.flip_mask):
+                            self.assertEqual(
+                                gates_names(obs.gates_of(outputs_diagnoses[uncertain_obs.output_vector])),
+                                gates_names(expected[uncertain_obs])
+                            )
@@ -0,0 +1,95 @@
+import importlib
+import shutil
+import tempfile
+from unittest import mock
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+from .. import migrations
+from ..config import DATA_SYSTEMS_DIR, DATA_OBSERVATIONS_DIR
+from ..consts import SYS_FILE_EXTENSION, OBS_FILE_EXTENSION
+
+
+class MigrationsTest(TransactionTestCase):
+    """ The migrations, from the models that they start from (the test DB is created from the current models,
+    see TEST in settings.py, so the migrations are only run here)
+    """
+    app = 'circuits_parser'
+
+    def migrate(self, migration_name):
+        """ Migrates the app to the given migration (None to unapply all of them), and returns the models at it """
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([(self.app, migration_name)])
+        return executor.loader.project_state((self.app, migration_name) if migration_name else ()).apps
+
+    def setUp(self):
+        # the test DB has the schema of the last migration, without the records of the applied migrations
+        executor = MigrationExecutor(connection)
+        for key in executor.loader.graph.leaf_nodes(self.app):
+            for applied_key in executor.loader.graph.forwards_plan(key):
+                executor.recorder.record_applied(*applied_key)
+        self.latest = executor.loader.graph.leaf_nodes(self.app)[0][1]
+
+    def tearDown(self):
+        self.migrate(self.latest)
+
+    def test_migrates_from_scratch(self):
+        # the data migration parses only c17
+        data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        shutil.copy(f'{DATA_SYSTEMS_DIR}/c17.{SYS_FILE_EXTENSION}', data_dir.name)
+        shutil.copy(f'{DATA_OBSERVATIONS_DIR}/c17_iscas85.{OBS_FILE_EXTENSION}', data_dir.name)
+        parse_migration = importlib.import_module(f'{migrations.__name__}.0003_parse_systems_and_observations')
+        with mock.patch.object(parse_migration, 'DATA_SYSTEMS_DIR', data_dir.name), \
+                mock.patch.object(parse_migration, 'DATA_OBSERVATIONS_DIR', data_dir.name):
+            self.migrate(None)
+            apps = self.migrate('0007_diagnosisprogress')
+        System, Gate = apps.get_model(self.app, 'System'), apps.get_model(self.app, 'Gate')
+        system = System.objects.get()
+        self.assertEqual((system.name, system.gates.count(), system.inputs.count(), system.outputs.count()),
+                         ('c17', 6, 5, 2))
+        self.assertTrue(all(Gate.objects.values_list('is_healthy', flat=True)))
+        self.assertEqual(system.observations.count(), 63)
+        self.assertTrue(all(obs.inputs.count() == 5 and obs.outputs.count() == 2
+                            for obs in system.observations.all()))
+
+        apps = self.migrate('0008_remove_gate_is_healthy')
+        self.assertEqual(apps.get_model(self.app, 'Gate').objects.count(), 6)
+        apps = self.migrate(self.latest)
+        self.assertEqual(apps.get_model(self.app, 'Observation').objects.count(), 63)
+
+    def test_0006_moves_the_diagnoses_to_the_parent_observations(self):
+        migrate_from, migrate_to = '0005_diagnosis_gates_key_probability', '0006_diagnosis_observation_flip_mask'
+        apps = self.migrate(migrate_from)
+        System, IO, Observation, Diagnosis = (apps.get_model(self.app, name)
+                                              for name in ('System', 'IO', 'Observation', 'Diagnosis'))
+        system = System.objects.create(name='s')
+        parent = Observation.objects.create(system=system, obs_name='1')
+        uncertain_obs = Observation.objects.create(system=system, obs_name='u1')
+        # the outputs are ordered by their names in the flip mask, o2 is flipped
+        for obs, values in ((parent, (True, False, True)), (uncertain_obs, (True, True, True))):
+            obs.outputs.set([IO.objects.create(name=f'o{i + 1}', value=value) for i, value in enumerate(values)])
+        Diagnosis.objects.create(uncertain_observation=uncertain_obs, gates_key='1', probability=0.5)
+        Diagnosis.objects.create(uncertain_observation=parent, gates_key='2', probability=0.25)
+
+        apps = self.migrate(migrate_to)
+        IO, Observation, Diagnosis = (apps.get_model(self.app, name) for name in ('IO', 'Observation', 'Diagnosis'))
+        self.assertEqual(list(Observation.objects.values_list('obs_name', flat=True)), ['1'])
+        # the output IOs of the uncertain observation are deleted with it
+        self.assertEqual(IO.objects.count(), 3)
+        self.assertEqual(
+            sorted(Diagnosis.objects.values_list('observation__obs_name', 'flip_mask', 'gates_key', 'probability')),
+            [('1', '0', '2', 0.25), ('1', '2', '1', 0.5)]
+        )
+
+        # and back, where the diagnoses stay with the parent observation
+        apps = self.migrate(migrate_from)
+        Diagnosis = apps.get_model(self.app, 'Diagnosis')
+        self.assertEqual(sorted(Diagnosis.objects.values_list('uncertain_observation__obs_name', 'gates_key')),
+                         [('1', '1'), ('1', '2')])
+        apps = self.migrate(migrate_to)
+        Diagnosis = apps.get_model(self.app, 'Diagnosis')
+        self.assertEqual(sorted(Diagnosis.objects.values_list('flip_mask', 'gates_key')), [('0', '1'), ('0', '2')])
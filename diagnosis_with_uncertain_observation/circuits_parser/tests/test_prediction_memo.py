@@ -0,0 +1,48 @@
+from django.test import SimpleTestCase
+
+from ..simulation import PredictionMemo
+
+
+class PredictionMemoTest(SimpleTestCase):
+    """ The memo predicts each (input vector, fault set) once, as long as it is one of the most recent ones """
+
+    @staticmethod
+    def predict(fault_sets):
+        return [tuple(i in fault_set for i in range(3)) for fault_set in fault_sets]
+
+    def test_predicts_only_the_missing_fault_sets(self):
+        memo = PredictionMemo(maxsize=10)
+        predicted = []
+
+        def predict(fault_sets):
+            predicted.append(fault_sets)
+            return self.predict(fault_sets)
+
+        input_vector = [True, False]
+        fault_sets = [frozenset({0}), frozenset({1, 2})]
+        self.assertEqual(memo.predict_many(input_vector, fault_sets, predict), self.predict(fault_sets))
+        fault_sets.append(frozenset({2}))
+        self.assertEqual(memo.predict_many(input_vector, fault_sets, predict), self.predict(fault_sets))
+        self.assertEqual(predicted, [fault_sets[:2], [frozenset({2})]])
+        self.assertEqual(memo.cache_info(), (2, 3, 10, 3))
+
+        # the same fault sets of other inputs are other predictions
+        memo.predict_many([False, False], fault_sets[:1], predict)
+        self.assertEqual(memo.cache_info().misses, 4)
+
+    def test_evicts_the_least_recently_used_prediction(self):
+        memo = PredictionMemo(maxsize=2)
+        for faulty in ({0}, {1}, {0}, {2}):
+            memo.predict([True], frozenset(faulty), lambda fault_set: self.predict([fault_set])[0])
+        self.assertEqual(memo.cache_info().currsize, 2)
+        hits = memo.hits
+        memo.predict([True], frozenset({0}), lambda fault_set: self.predict([fault_set])[0])
+        self.assertEqual(memo.hits, hits + 1)
+        memo.predict([True], frozenset({1}), lambda fault_set: self.predict([fault_set])[0])
+        self.assertEqual(memo.hits, hits + 1)
+
+    def test_disabled_memo_predicts_every_time(self):
+        memo = PredictionMemo(maxsize=0)
+        for _ in range(2):
+            memo.predict_many([True], [frozenset({0})], self.predict)
+        self.assertEqual(memo.cache_info(), (0, 2, 0, 0))
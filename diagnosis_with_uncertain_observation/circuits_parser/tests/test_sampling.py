@@ -0,0 +1,121 @@
+import math
+from statistics import NormalDist
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from .utils import parse_example, isolate_results
+from .. import api
+from ..config import SINGLE_GATE_FAULTY_PROB, SINGLE_OUTPUT_UNCERTAINTY_PROB
+from ..engines import sampling
+from ..models import Observation
+
+
+class SamplingEstimatesTest(SimpleTestCase):
+    """ The estimates are the means of the samples of the flip masks by their prior, with normal confidence intervals
+    """
+    SAMPLES = 2000
+    CONFIDENCE = 0.95
+    # an observation with a single output, whose flip mask is diagnosed by a gate, and the flipped one by two gates
+    MASKS_DIAGNOSES = {0: [frozenset({0})], 1: [frozenset({1, 2})]}
+
+    def estimate(self, observations_num=1, **kwargs):
+        diagnosed = []
+
+        def diagnose(obs, flip_masks, predictions):
+            diagnosed.append(flip_masks)
+            return {flip_mask: self.MASKS_DIAGNOSES[flip_mask] for flip_mask in flip_masks}
+
+        observations = [SimpleNamespace(output_vector=(True,)) for _ in range(observations_num)]
+        kwargs = {'samples': self.SAMPLES, 'confidence': self.CONFIDENCE, 'seed': 0, **kwargs}
+        return sampling.estimate_diagnoses_probs(observations, {0, 1}, diagnose, **kwargs), diagnosed
+
+    def test_estimates_and_confidence_intervals(self):
+        estimates, _ = self.estimate()
+        z = NormalDist().inv_cdf((1 + self.CONFIDENCE) / 2)
+        for diagnosis, flip_prob in ((frozenset({0}), 1 - SINGLE_OUTPUT_UNCERTAINTY_PROB),
+                                     (frozenset({1, 2}), SINGLE_OUTPUT_UNCERTAINTY_PROB)):
+            with self.subTest(diagnosis=diagnosis):
+                value = SINGLE_GATE_FAULTY_PROB ** len(diagnosis)
+                p, ci_low, ci_high = estimates[diagnosis]
+                # the value of a sample is the value of the diagnosis when the sample is its flip mask, and 0 otherwise
+                sampled_ratio = p / value
+                self.assertAlmostEqual(sampled_ratio * self.SAMPLES, round(sampled_ratio * self.SAMPLES))
+                half_width = z * value * math.sqrt(sampled_ratio * (1 - sampled_ratio) / (self.SAMPLES - 1))
+                self.assertAlmostEqual(ci_high - p, half_width)
+                self.assertAlmostEqual(p - ci_low, min(half_width, p))
+                self.assertLessEqual(ci_low, value * flip_prob)
+                self.assertLessEqual(value * flip_prob, ci_high)
+
+    def test_observations_estimates_are_summed(self):
+        estimates, _ = self.estimate()
+        summed_estimates, _ = self.estimate(observations_num=3, seed=1)
+        # the observations are sampled independently, so the intervals narrow relative to the estimates
+        for diagnosis, (p, ci_low, ci_high) in estimates.items():
+            summed_p, summed_ci_low, summed_ci_high = summed_estimates[diagnosis]
+            self.assertLess(abs(summed_p - 3 * p), 3 * (ci_high - ci_low))
+            self.assertLess((summed_ci_high - summed_ci_low) / summed_p, (ci_high - ci_low) / p)
+
+    def test_each_flip_mask_is_diagnosed_once(self):
+        _, diagnosed = self.estimate()
+        self.assertEqual(sorted(flip_mask for flip_masks in diagnosed for flip_mask in flip_masks), [0, 1])
+
+    def test_flip_masks_out_of_the_cutoffs_are_not_diagnosed(self):
+        diagnosed = []
+
+        def diagnose(obs, flip_masks, predictions):
+            diagnosed.extend(flip_masks)
+            return {flip_mask: self.MASKS_DIAGNOSES[flip_mask] for flip_mask in flip_masks}
+
+        estimates = sampling.estimate_diagnoses_probs([SimpleNamespace(output_vector=(True,))], {0}, diagnose,
+                                                      samples=self.SAMPLES, seed=0)
+        self.assertEqual(diagnosed, [0])
+        self.assertEqual(list(estimates), [frozenset({0})])
+        self.assertLess(estimates[frozenset({0})].p, SINGLE_GATE_FAULTY_PROB)
+
+    def test_time_budget_samples_a_round_of_every_observation(self):
+        estimates, diagnosed = self.estimate(observations_num=3, time_budget=0)
+        self.assertEqual(len(diagnosed), 3)
+        self.assertIn(frozenset({0}), estimates)
+
+
+class EstimateDiagnosesProbsTest(TestCase):
+    """ The estimates of the diagnoses of a system match the probabilities of diagnosing all of its uncertain
+    observations
+    """
+    SYSTEM_NAME = 'c17'
+    TOP_N = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.system = parse_example(cls.SYSTEM_NAME)
+
+    def setUp(self):
+        isolate_results(self)
+
+    def test_intervals_contain_the_probabilities(self):
+        estimates = api.estimate_diagnoses_probs(self.SYSTEM_NAME, self.TOP_N, samples=500, seed=0)
+        api.find_diagnosis(workers=1)
+        probs = api.diagnoses_probs(self.SYSTEM_NAME)
+        self.assertEqual(len(estimates), self.TOP_N)
+        for gates_key, (p, ci_low, ci_high) in estimates.items():
+            with self.subTest(gates_key=gates_key):
+                self.assertLessEqual(ci_low, probs[gates_key])
+                self.assertLessEqual(probs[gates_key], ci_high)
+                self.assertLess(ci_low, p)
+
+    def test_each_candidate_is_predicted_once_per_observation(self):
+        predicted = []
+        predict_fault_sets = Observation.predict_fault_sets
+
+        def record_predictions(obs, fault_sets):
+            predicted.extend((obs.pk, fault_set) for fault_set in fault_sets)
+            return predict_fault_sets(obs, fault_sets)
+
+        # many rounds, where most of the candidates of the new flip masks were predicted by former rounds
+        with mock.patch.object(sampling, 'SAMPLING_BATCH_SIZE', 10), \
+                mock.patch.object(Observation, 'predict_fault_sets', record_predictions):
+            api.estimate_diagnoses_probs(self.SYSTEM_NAME, samples=200, seed=0)
+        self.assertTrue(predicted)
+        self.assertEqual(len(predicted), len(set(predicted)))
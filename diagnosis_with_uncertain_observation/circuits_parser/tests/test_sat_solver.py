@@ -0,0 +1,74 @@
+import itertools
+import random
+from importlib.util import find_spec
+from unittest import skipUnless
+
+from django.test import SimpleTestCase
+
+from ..consts import BUILTIN_SAT_SOLVER, PYSAT_SAT_SOLVER
+from ..engines.sat.solver import solvers
+
+
+class BuiltinSolverTest(SimpleTestCase):
+    """ The solutions of the solver match a brute force over all the assignments """
+    SAT_SOLVER = BUILTIN_SAT_SOLVER
+
+    @staticmethod
+    def satisfiable(vars_num, clauses, assumptions) -> bool:
+        return any(
+            all(any((literal > 0) == values[abs(literal) - 1] for literal in clause) for clause in clauses) and
+            all((literal > 0) == values[abs(literal) - 1] for literal in assumptions)
+            for values in itertools.product([False, True], repeat=vars_num)
+        )
+
+    def test_random_formulas_match_brute_force(self):
+        rng = random.Random(1)
+        for _ in range(300):
+            vars_num = rng.randint(3, 9)
+            solver = solvers[self.SAT_SOLVER]()
+            variables = [solver.new_var(phase=rng.random() < 0.5) for _ in range(vars_num)]
+            clauses = []
+            # clauses are added between the solutions, as the blocking clauses of the SAT engine
+            for _ in range(3):
+                for _ in range(rng.randint(1, 15)):
+                    clause = [rng.choice([1, -1]) * var for var in rng.sample(variables, rng.randint(1, 3))]
+                    clauses.append(clause)
+                    solver.add_clause(clause)
+                assumptions = [rng.choice([1, -1]) * var for var in rng.sample(variables, rng.randint(0, 2))]
+                expected = self.satisfiable(vars_num, clauses, assumptions)
+                self.assertEqual(solver.solve(assumptions), expected)
+                if expected:
+                    model = dict(zip(variables, solver.values(variables)))
+                    self.assertEqual(model, {var: solver.value(var) for var in variables})
+                    for clause in clauses:
+                        self.assertTrue(any((literal > 0) == model[abs(literal)] for literal in clause))
+                    for literal in assumptions:
+                        self.assertEqual(literal > 0, model[abs(literal)])
+
+    def test_enumerates_all_the_models_with_blocking_clauses(self):
+        solver = solvers[self.SAT_SOLVER]()
+        a, b, c = solver.new_var(), solver.new_var(), solver.new_var()
+        solver.add_clause([a, b, c])
+        models = set()
+        while solver.solve():
+            model = tuple(solver.values([a, b, c]))
+            models.add(model)
+            solver.add_clause([-var if value else var for var, value in zip((a, b, c), model)])
+        self.assertEqual(models, set(itertools.product([False, True], repeat=3)) - {(False, False, False)})
+
+    def test_variables_without_clauses(self):
+        solver = solvers[self.SAT_SOLVER]()
+        a, b = solver.new_var(), solver.new_var()
+        solver.add_clause([a])
+        self.assertTrue(solver.solve())
+        self.assertTrue(solver.value(a))
+        # unconstrained, with the phase that it was added with
+        phased = solver.new_var(phase=True)
+        self.assertTrue(solver.solve([b]))
+        self.assertEqual(solver.values([a, b]), [True, True])
+        self.assertIn(solver.value(phased), (False, True))
+
+
+@skipUnless(find_spec('pysat'), 'requires the python-sat package')
+class PysatSolverTest(BuiltinSolverTest):
+    SAT_SOLVER = PYSAT_SAT_SOLVER
@@ -0,0 +1,35 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from .utils import parse_example, gates_names
+from .. import api
+from ..config import MAX_FAULTY_COMPONENTS
+from ..consts import BFS_ENGINE
+from ..models import observation as observation_module
+
+
+class SharedSearchTest(TestCase):
+    """ The shared search of the uncertain observations finds the diagnoses that the BFS of each of them finds """
+    SYSTEMS = {'c17': 5, '74182': 2}  # value: amount of the first observations to diagnose
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.observations = [
+            obs
+            for system_name, observations_num in cls.SYSTEMS.items()
+            for obs in api.system_observations(parse_example(system_name)).order_by('pk')[:observations_num]
+        ]
+
+    def test_uncertain_diagnoses_match_the_diagnoses_of_each_uncertain_observation(self):
+        # a single faulty gate prunes the first layer too
+        for max_faulty_components in sorted({1, MAX_FAULTY_COMPONENTS}):
+            with mock.patch.object(observation_module, 'MAX_FAULTY_COMPONENTS', max_faulty_components):
+                for obs in self.observations:
+                    uncertain_observations = api.create_uncertain_observations(obs)
+                    uncertain_diagnoses = obs.find_uncertain_diagnoses(uncertain_observations)
+                    for uncertain_obs in uncertain_observations:
+                        with self.subTest(observation=f'{obs.system.name}/{obs.obs_name}',
+                                          flip_mask=uncertain_obs.flip_mask, max_faulty=max_faulty_components):
+                            self.assertEqual(gates_names(uncertain_diagnoses[uncertain_obs]),
+                                             gates_names(uncertain_obs.diagnose(BFS_ENGINE)))
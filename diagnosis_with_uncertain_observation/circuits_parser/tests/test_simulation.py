@@ -0,0 +1,73 @@
+import random
+from unittest import mock
+
+from django.test import TestCase
+
+from .utils import parse_example, gates_names
+from .. import api
+from ..consts import ORM_SIMULATION, COMPILED_SIMULATION, BIT_PARALLEL_SIMULATION, INCREMENTAL_SIMULATION
+from ..models import observation as observation_module
+from ..simulation import BitParallelSimulator, IncrementalSimulator
+
+
+class SimulationModesTest(TestCase):
+    """ Every simulation predicts and diagnoses as the baseline simulation through the DB rows """
+    OBSERVATIONS_NUM = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.system = parse_example('c17')
+        cls.observations = list(api.system_observations(cls.system).order_by('pk')[:cls.OBSERVATIONS_NUM])
+
+    def diagnose(self, simulation_mode):
+        """ The diagnoses of the first observations with the given simulation """
+        self.system.compiled.prediction_memo.cache_clear()
+        with mock.patch.object(observation_module, 'SIMULATION_MODE', simulation_mode):
+            return [gates_names(obs.find_diagnoses()) for obs in self.observations]
+
+    def test_compiled_predictions_match_the_orm(self):
+        gates = list(self.system.gates.all())
+        rng = random.Random(0)
+        for obs in self.observations:
+            for faulty_gates in [[]] + [rng.sample(gates, rng.randint(1, 3)) for _ in range(10)]:
+                predictions = [
+                    sorted((io.name, io.value) for io in self.system.predict_output(obs.input_ios(), faulty_gates,
+                                                                                     in_memory=in_memory))
+                    for in_memory in (False, True)
+                ]
+                self.assertEqual(*predictions)
+
+    def test_compiled_matches_the_orm(self):
+        expected = self.diagnose(ORM_SIMULATION)
+        self.assertTrue(any(expected))
+        self.assertEqual(self.diagnose(COMPILED_SIMULATION), expected)
+
+    def test_bit_parallel_predictions_match_the_compiled(self):
+        circuit = self.system.compiled
+        rng = random.Random(0)
+        # more candidates than lanes, so they are simulated in several passes
+        candidates = [frozenset(rng.sample(range(circuit.gates_num), rng.randint(0, 3))) for _ in range(20)]
+        simulator = BitParallelSimulator(circuit, lanes=8)
+        for obs in self.observations:
+            self.assertEqual(simulator.predict_candidates(obs.input_vector, candidates),
+                             [circuit.predict(obs.input_vector, candidate) for candidate in candidates])
+        input_vectors = [obs.input_vector for obs in self.observations] * 3
+        for candidate in candidates[:5]:
+            self.assertEqual(simulator.predict_inputs(input_vectors, candidate),
+                             [circuit.predict(input_vector, candidate) for input_vector in input_vectors])
+
+    def test_bit_parallel_matches_the_orm(self):
+        self.assertEqual(self.diagnose(BIT_PARALLEL_SIMULATION), self.diagnose(ORM_SIMULATION))
+
+    def test_incremental_predictions_match_the_compiled(self):
+        circuit = self.system.compiled
+        rng = random.Random(0)
+        for obs in self.observations:
+            # the same simulator predicts all the fault sets of the observation, from its healthy simulation
+            simulator = IncrementalSimulator(circuit, obs.input_vector)
+            for faulty in [frozenset()] + [frozenset(rng.sample(range(circuit.gates_num), rng.randint(1, 3)))
+                                           for _ in range(20)]:
+                self.assertEqual(simulator.predict(faulty), circuit.predict(obs.input_vector, faulty))
+
+    def test_incremental_matches_the_orm(self):
+        self.assertEqual(self.diagnose(INCREMENTAL_SIMULATION), self.diagnose(ORM_SIMULATION))
@@ -0,0 +1,26 @@
+import random
+
+from django.test import SimpleTestCase
+
+from ..subset_index import SubsetIndex
+
+
+class SubsetIndexTest(SimpleTestCase):
+    """ The index answers as a scan of all the stored sets """
+
+    def test_has_subset_of_matches_brute_force(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            stored = [frozenset(rng.sample(range(12), rng.randint(1, 4))) for _ in range(rng.randint(0, 15))]
+            index = SubsetIndex(stored)
+            self.assertEqual(len(index), len(set(stored)))
+            for _ in range(20):
+                query = frozenset(rng.sample(range(12), rng.randint(0, 8)))
+                self.assertEqual(index.has_subset_of(query), any(items <= query for items in stored))
+
+    def test_empty_set_is_a_subset_of_any_set(self):
+        index = SubsetIndex()
+        self.assertFalse(index.has_subset_of({1, 2}))
+        index.add(())
+        self.assertTrue(index.has_subset_of(()))
+        self.assertTrue(index.has_subset_of({1, 2}))
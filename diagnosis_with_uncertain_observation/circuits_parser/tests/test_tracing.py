@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+
+from django.test import SimpleTestCase, TestCase
+
+from .utils import parse_example, isolate_results
+from .. import api
+from ..models import Observation
+from ..tracing import Tracer, tracer
+
+
+def read_traces(filepath) -> list[dict]:
+    with open(filepath) as f:
+        return [json.loads(line) for line in f]
+
+
+class TracerTest(SimpleTestCase):
+    """ The tracer appends a JSON line per record, only while it is enabled """
+
+    def setUp(self):
+        traces_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(traces_dir.cleanup)
+        self.filepath = f'{traces_dir.name}/trace.jsonl'
+
+    def test_records_are_appended_while_enabled(self):
+        disabled_tracer = Tracer()
+        self.assertFalse(disabled_tracer.enabled)
+        disabled_tracer.emit('bfs_layer', layer=1)
+
+        for layer in (1, 2):
+            enabled_tracer = Tracer(self.filepath)
+            self.assertTrue(enabled_tracer.enabled)
+            enabled_tracer.emit('bfs_layer', system='c17', layer=layer)
+            enabled_tracer.disable()
+            enabled_tracer.emit('bfs_layer', system='c17', layer=layer)
+
+        traces = read_traces(self.filepath)
+        self.assertEqual([(trace['event'], trace['layer'], trace['pid']) for trace in traces],
+                         [('bfs_layer', 1, os.getpid()), ('bfs_layer', 2, os.getpid())])
+        self.assertLessEqual(traces[0]['time'], traces[1]['time'])
+
+
+class SearchTracesTest(TestCase):
+    """ The counters of the traces of the searches add up to the candidates of each layer """
+    SYSTEM_NAME = 'c17'
+    OBSERVATIONS_NUM = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.system = parse_example(cls.SYSTEM_NAME)
+
+    def setUp(self):
+        traces_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(traces_dir.cleanup)
+        self.filepath = f'{traces_dir.name}/trace.jsonl'
+        tracer.enable(self.filepath)
+        self.addCleanup(tracer.disable)
+        self.observations = list(api.system_observations(self.system).order_by('pk')[:self.OBSERVATIONS_NUM])
+
+    def traces(self, event) -> list[dict]:
+        return [trace for trace in read_traces(self.filepath) if trace['event'] == event]
+
+    def test_bfs_layers(self):
+        diagnoses_nums = {obs.obs_name: len(obs.find_diagnoses_masks()) for obs in self.observations}
+        traces = self.traces('bfs_layer')
+        self.assertEqual({trace['observation'] for trace in traces}, set(diagnoses_nums))
+        for obs_name, diagnoses_num in diagnoses_nums.items():
+            obs_traces = [trace for trace in traces if trace['observation'] == obs_name]
+            with self.subTest(observation=obs_name):
+                self.assertEqual([trace['layer'] for trace in obs_traces], list(range(1, len(obs_traces) + 1)))
+                self.assertEqual(obs_traces[0]['generated'], self.system.compiled.gates_num)
+                for trace in obs_traces:
+                    self.assertEqual(trace['deduplicated'], 0)
+                    self.assertEqual(trace['generated'],
+                                     trace['pruned_superset'] + trace['pruned_uncovered'] + trace['checked'])
+                    self.assertLessEqual(max(trace['accepted'], trace['memo_hits']), trace['checked'])
+                    self.assertGreaterEqual(trace['simulation_seconds'], 0)
+                    self.assertGreaterEqual(trace['bookkeeping_seconds'], 0)
+                self.assertEqual(sum(trace['accepted'] for trace in obs_traces), diagnoses_num)
+
+    def test_shared_bfs_layers(self):
+        for obs in self.observations:
+            uncertain_diagnoses = obs.find_uncertain_diagnoses(api.create_uncertain_observations(obs))
+            obs_traces = [trace for trace in self.traces('shared_bfs_layer') if trace['observation'] == obs.obs_name]
+            with self.subTest(observation=obs.obs_name):
+                self.assertTrue(obs_traces)
+                for trace in obs_traces:
+                    self.assertEqual(trace['generated'], trace['pruned_uncovered'] + trace['checked'])
+                    self.assertEqual(trace['checked'],
+                                     trace['unobserved'] + trace['pruned_superset'] + trace['accepted'])
+                self.assertEqual(sum(trace['accepted'] for trace in obs_traces),
+                                 sum(map(len, uncertain_diagnoses.values())))
+
+    def test_find_diagnosis(self):
+        isolate_results(self)
+        Observation.objects.filter(system=self.system) \
+            .exclude(pk__in=[obs.pk for obs in self.observations]).delete()
+        api.find_diagnosis(workers=1)
+        self.assertEqual(len(self.traces('search')), self.OBSERVATIONS_NUM)
+        saves = self.traces('save')
+        self.assertEqual(len(saves), self.OBSERVATIONS_NUM)
+        self.assertEqual(sum(trace['diagnoses'] for trace in saves),
+                         sum(trace['accepted'] for trace in self.traces('shared_bfs_layer')))
+        self.assertTrue(all(trace['persistence_seconds'] >= 0 for trace in saves))
@@ -0,0 +1,45 @@
+from math import comb
+
+from django.test import SimpleTestCase
+
+from ..models import UncertainObservation
+
+
+class FlipMasksLevelsTest(SimpleTestCase):
+    """ The levels of the flip masks pass the cutoffs, in descending probability order """
+    OUTPUTS_NUM = 5
+
+    def levels_masks(self, **cutoffs) -> list[tuple[int, list[int]]]:
+        return [
+            (flips_num, list(flip_masks))
+            for flips_num, flip_masks in UncertainObservation.flip_masks_levels(self.OUTPUTS_NUM, **cutoffs)
+        ]
+
+    def test_without_cutoffs_every_flip_mask_is_in_its_level(self):
+        levels = self.levels_masks(max_flips=None, min_prob=0)
+        # the probability of flipping an output is below a half, so the fewer flips the more probable
+        self.assertEqual([flips_num for flips_num, _ in levels], list(range(self.OUTPUTS_NUM + 1)))
+        self.assertEqual(sorted(mask for _, flip_masks in levels for mask in flip_masks),
+                         list(range(1 << self.OUTPUTS_NUM)))
+        for flips_num, flip_masks in levels:
+            self.assertEqual(len(flip_masks), comb(self.OUTPUTS_NUM, flips_num))
+            self.assertTrue(all(mask.bit_count() == flips_num for mask in flip_masks))
+
+    def test_max_flips(self):
+        levels = self.levels_masks(max_flips=2, min_prob=0)
+        self.assertEqual([flips_num for flips_num, _ in levels], [0, 1, 2])
+
+    def test_min_prob(self):
+        min_prob = UncertainObservation.prior(flips_num=1, outputs_num=self.OUTPUTS_NUM)
+        levels = self.levels_masks(max_flips=None, min_prob=min_prob)
+        self.assertEqual([flips_num for flips_num, _ in levels], [0, 1])
+        self.assertEqual(self.levels_masks(max_flips=None, min_prob=min_prob * 1.01), [(0, [0])])
+
+    def test_levels_mass(self):
+        levels = UncertainObservation.flip_masks_levels(self.OUTPUTS_NUM, max_flips=None, min_prob=0)
+        self.assertAlmostEqual(UncertainObservation.levels_mass(levels, self.OUTPUTS_NUM), 1)
+        self.assertAlmostEqual(
+            UncertainObservation.levels_mass(levels[1:], self.OUTPUTS_NUM),
+            1 - UncertainObservation.prior(flips_num=0, outputs_num=self.OUTPUTS_NUM)
+        )
+        self.assertEqual(UncertainObservation.levels_mass([], self.OUTPUTS_NUM), 0)
@@ -0,0 +1,48 @@
+import io
+import tempfile
+from unittest import mock
+
+from .. import api
+from ..config import DATA_SYSTEMS_DIR, DATA_OBSERVATIONS_DIR
+from ..consts import SYS_FILE_EXTENSION, OBS_FILE_EXTENSION
+from ..models import System
+from ..models.operators import OperatorType, operators
+from ..simulation import CompiledCircuit
+
+
+def parse_example(system_name):
+    """ Parses the system and the observations of an example (see DATA_SYSTEMS_DIR and DATA_OBSERVATIONS_DIR) """
+    create_operator_types()
+    api.parse_system(f'{DATA_SYSTEMS_DIR}/{system_name}.{SYS_FILE_EXTENSION}')
+    api.parse_observations(f'{DATA_OBSERVATIONS_DIR}/{system_name}_iscas85.{OBS_FILE_EXTENSION}')
+    system = System.objects.get(name=system_name)
+    # the pks of the rolled back systems of other tests may be reused
+    CompiledCircuit.forget(system)
+    return system
+
+
+def create_operator_types():
+    """ Creates the operator types, as the migration that creates them does (see 0002_create_possible_operators) """
+    OperatorType.objects.bulk_create([OperatorType(name=op_name) for op_name in operators], ignore_conflicts=True)
+
+
+def gates_names(diagnoses) -> list[tuple[str]]:
+    """ The diagnoses (each as a list of gates) as sorted tuples of the gates names, in a sorted list """
+    return sorted(tuple(sorted(gate.name for gate in diagnosis)) for diagnosis in diagnoses)
+
+
+def isolate_results(test_case):
+    """ Redirects the results files of the API calls to a temporary directory, and silences their progress prints,
+    until the end of the test
+    """
+    results_dir = tempfile.TemporaryDirectory()
+    test_case.addCleanup(results_dir.cleanup)
+    patchers = [
+        mock.patch.object(api, 'RESULTS_RUN_TIMES_DIR', results_dir.name),
+        mock.patch.object(api, 'RESULTS_DIAGNOSIS_PROBABILITIES_DIR', results_dir.name),
+        mock.patch('sys.stdout', new_callable=io.StringIO),
+    ]
+    for patcher in patchers:
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
+    return results_dir.name
@@ -0,0 +1,53 @@
+""" Structured traces of the diagnosis runs, as JSON lines.
+
+The searches count their candidates and time their simulations per BFS layer anyway (a few integers per layer),
+so the only cost of the traces when they are disabled is a single check per layer.
+Each record has an event name, the pid of the process that wrote it and a timestamp, e.g.:
+    {"event": "bfs_layer", "pid": 42, "time": 1700000000.0, "system": "c17", "observation": "1", "layer": 2, ...}
+"""
+import json
+import os
+import time
+
+from .config import TRACE_FILEPATH
+
+
+class Tracer:
+    """ Appends trace records to a JSON lines file (one record per line, so the records of many processes can be
+    appended to the same file).
+
+    Usage:
+        tracer.enable('trace.jsonl')
+        if tracer.enabled:
+            tracer.emit('bfs_layer', system='c17', layer=1, generated=6, ...)
+        tracer.disable()
+    """
+
+    def __init__(self, filepath: str = None):
+        """
+        Args:
+            filepath: path of the traces file (None to disable the traces)
+        """
+        self.enabled = False
+        self.__file = None
+        if filepath is not None:
+            self.enable(filepath)
+
+    def enable(self, filepath: str):
+        self.disable()
+        self.__file = open(filepath, 'a', buffering=1)  # line buffered, so every record is a single write
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def emit(self, event: str, **fields):
+        """ Writes a trace record (if the traces are enabled) """
+        if self.enabled:
+            self.__file.write(json.dumps({'event': event, 'pid': os.getpid(), 'time': time.time(), **fields}) + '\n')
+
+
+tracer = Tracer(TRACE_FILEPATH)
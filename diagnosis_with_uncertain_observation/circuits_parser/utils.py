@@ -1,4 +1,5 @@
 import itertools
+import math
 
 
 def flatten(nested_list: list[list]):
@@ -36,29 +37,61 @@ def tuplize(items):
     return [(i, i) for i in items]
 
 
-def clone_django_object(obj):
-    obj.pk = None
-    obj.save()
-    return obj
+def mean(l):
+    return sum(l) / len(l)
 
 
-def is_superset(superset, subset):
-    return all(item in superset for item in subset)
+def percentile(l, q):
+    """ Returns the q-th percentile of the values (by the nearest rank).
+     E.g.:
+        percentile([4, 1, 3, 2], 50)  ->  2
+     """
+    values = sorted(l)
+    return values[max(math.ceil(q / 100 * len(values)), 1) - 1]
 
 
-def remove_subset(superset, subset):
-    assert is_superset(superset, subset)
-    for item in subset:
-        superset.remove(item)
-    return superset
+def booleans_to_num(booleans) -> int:
+    """ Packs booleans into an int, the first one as the most significant bit.
+     E.g.:
+        [True, False, True, True]  ->  0b1011
+     """
+    num = 0
+    for value in booleans:
+        num = (num << 1) | bool(value)
+    return num
 
 
-def mean(l):
-    return sum(l) / len(l)
+def indices_mask(indices) -> int:
+    """ The inverse of mask_indices.
+     E.g.:
+        {1, 3}  ->  0b1010
+     """
+    mask = 0
+    for i in indices:
+        mask |= 1 << i
+    return mask
+
+
+def mask_indices(mask: int) -> frozenset[int]:
+    """ Returns the indices of the set bits of the mask.
+     E.g.:
+        0b1010  ->  frozenset({1, 3})
+     """
+    indices = []
+    while mask:
+        low_bit = mask & -mask
+        indices.append(low_bit.bit_length() - 1)
+        mask ^= low_bit
+    return frozenset(indices)
 
 
-def num_to_booleans(num, length) -> list[bool]:
-    return [
-        bool(eval(bit_str))
-        for bit_str in format(num, f'0{length}b')
-    ]
+def minimal_masks(masks) -> list[int]:
+    """ Returns the distinct masks that contain no other of the given masks (as sets of bits).
+     E.g.:
+        [0b110, 0b010, 0b011, 0b010]  ->  [0b010]
+     """
+    minimal = []
+    for mask in sorted(set(masks), key=int.bit_count):
+        if all(other & ~mask for other in minimal):
+            minimal.append(mask)
+    return minimal
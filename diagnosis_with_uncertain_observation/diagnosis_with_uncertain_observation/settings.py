@@ -78,6 +78,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # the test DB is created from the models, since the migrations parse all the data files into the DB
+        # (~90 seconds). The migrations are tested from scratch on a part of the data, see
+        # circuits_parser/tests/test_migrations.py. The test DB is a file so the processes of the diagnosis pools
+        # can open it.
+        'TEST': {'MIGRATE': False, 'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 